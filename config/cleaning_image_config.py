@@ -9,4 +9,14 @@ FEATURES_PATH = "features.csv"
 SAMPLE_PROB = 0.02
 
 PDF_PATH = "cleared_images"
-TEMP_PATH = "temp_images"
\ No newline at end of file
+TEMP_PATH = "temp_images"
+
+# build_features пишет признаки .npy шардами сюда (FEATURES_PATH - прежний CSV)
+FEATURES_DIR = "features"
+FEATURES_SEED = 42
+SHARD_ROWS = 1_000_000
+
+# тайловый денойзер (image_processing/tiled_denoise.py): сторона тайла и число
+# процессов, None - все ядра
+DENOISE_TILE_SIZE = 512
+DENOISE_WORKERS = None
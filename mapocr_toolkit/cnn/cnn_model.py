@@ -1,11 +1,14 @@
 from tensorflow import keras
 from keras.models import Sequential
-from keras.layers import Conv2D, MaxPooling2D, Flatten, Dense, Dropout
+from keras.layers import Conv2D, MaxPooling2D, Flatten, Dense, Dropout, Rescaling
 
 def create_cnn_model(input_shape=(60, 200, 3), num_classes=6):
     model = Sequential()
 
-    model.add(Conv2D(32, (3, 3), activation='relu', input_shape=input_shape))
+    # на вход идут кропы uint8 0..255, нормализация внутри модели - датасет в 4 раза меньше float32
+    model.add(Rescaling(1.0 / 255, input_shape=input_shape, name='rescale'))
+
+    model.add(Conv2D(32, (3, 3), activation='relu'))
     model.add(MaxPooling2D(pool_size=(2, 2)))
 
     model.add(Conv2D(64, (3, 3), activation='relu'))
@@ -2,14 +2,17 @@ import tensorflow as tf
 from keras.models import Model
 from keras.layers import (
     Input, Conv2D, MaxPooling2D, BatchNormalization,
-    Bidirectional, LSTM, Dense, Dropout, Lambda,
+    Bidirectional, LSTM, Dense, Dropout, Lambda, Rescaling,
 )
 
 
 def create_crnn_model(input_shape=(60, 200, 3), num_classes=5):
     inputs = Input(shape=input_shape, name='input')
-    
-    x = Conv2D(32, (3, 3), activation='relu', padding='same', name='conv1')(inputs)
+
+    # кропы приходят в uint8, как у CNN - деление на 255 внутри модели
+    x = Rescaling(1.0 / 255, name='rescale')(inputs)
+
+    x = Conv2D(32, (3, 3), activation='relu', padding='same', name='conv1')(x)
     x = MaxPooling2D(pool_size=(2, 2), name='pool1')(x)
 
     x = Conv2D(64, (3, 3), activation='relu', padding='same', name='conv2')(x)
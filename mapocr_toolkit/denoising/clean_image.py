@@ -1,5 +1,6 @@
 from config import cleaning_image_config as config
 from image_processing.blur_and_threshold import blur_and_threshold
+from image_processing.patches import predict_patches
 from imutils import paths
 import pickle
 import random
@@ -19,14 +20,9 @@ def process_image(image, model):
     gray = cv2.copyMakeBorder(gray, 2, 2, 2, 2, cv2.BORDER_REPLICATE)
     gray = blur_and_threshold(gray)
 
-    roi_features = [
-        gray[y:y + 5, x:x + 5].flatten()
-        for y in range(gray.shape[0] - 4)
-        for x in range(gray.shape[1] - 4)
-    ]
-
-    pixels = model.predict(roi_features)
-    output = (pixels.reshape(orig.shape) * 255).astype("uint8") # Преобразование одномерного в двумерный массив
+    # окна 5x5 - view, predict полосами строк (image_processing/patches.py)
+    pixels = predict_patches(model, gray)
+    output = (pixels * 255).astype("uint8")
 
     return orig, output
 
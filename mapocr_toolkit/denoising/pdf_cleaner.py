@@ -1,10 +1,10 @@
 import os
 from config import cleaning_image_config as config
-from clean_image import load_model, process_image
+from clean_image import load_model
 import cv2
 import fitz
 import numpy as np
-from work_on_blocks.blocks_smash import split_into_blocks, merge_into_image
+from image_processing.tiled_denoise import denoise_tiled
 
 
 
@@ -36,15 +36,11 @@ def process_pdf_pages(image_paths, model, output_folder):
     for image_path in image_paths:
         print(f"[INFO] Processing {image_path}")
         image = cv2.imread(image_path)
-        left_top_block, right_top_block, left_bottom_block, right_bottom_block = split_into_blocks(image)
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
-        # Очищаем изображение
-        processed_left_top = process_image(left_top_block, model)[1]
-        processed_right_top = process_image(right_top_block, model)[1]
-        processed_left_bottom = process_image(left_bottom_block, model)[1]
-        processed_right_bottom = process_image(right_bottom_block, model)[1]
-
-        final_image = merge_into_image(processed_left_top, processed_right_top, processed_left_bottom, processed_right_bottom, image.shape[:2])
+        # Очищаем изображение: тайлы с halo в пуле процессов, без швов на стыках
+        final_image = denoise_tiled(gray, model, tile_size=config.DENOISE_TILE_SIZE,
+                                    workers=config.DENOISE_WORKERS)
 
         # Проверка данных
         print(f"[DEBUG] output.shape: {final_image.shape}, output.dtype: {final_image.dtype}")
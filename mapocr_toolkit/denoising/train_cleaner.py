@@ -3,35 +3,82 @@ from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_squared_error
 from sklearn.model_selection import train_test_split
 import numpy as np
+from features.shards import CHUNK_ROWS, load_shards, shard_paths
+import argparse
+import resource
 import pickle
+import sys
+import time
 
-print("[INFO] Загрузка датасета...")
-features= []
-targets=[]
 
-for row in open(config.FEATURES_PATH):
-    row = row.strip().split(",")
-    row = [float(x) for x in row]
-    target = row[0]
-    pixels = row[1:]
+def peak_rss_mb():
+    # ru_maxrss: килобайты на Linux, байты на macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
 
-    features.append(pixels)
-    targets.append(target)
 
-features = np.array(features,dtype = "float")
-target = np.array(targets,dtype = "float")
+def load_csv_features(path):
+    # прежний формат build_features: target,25 признаков - построчно через списки Python
+    features = []
+    targets = []
 
-(trainX,testX,trainY,testY) = train_test_split(features, target,
-                                             test_size = 0.25, random_state = 42)
+    for row in open(path):
+        row = row.strip().split(",")
+        row = [float(x) for x in row]
+        targets.append(row[0])
+        features.append(row[1:])
 
-print("[INFO] Тренировка модели...")
-model = RandomForestRegressor(n_estimators=10)
-model.fit(trainX, trainY)
+    return np.array(features, dtype="float"), np.array(targets, dtype="float")
 
-print("[INFO] Оценка модели...")
-preds = model.predict(testX)
-rmse = np.sqrt(mean_squared_error(testY, preds))
-print(f"[INFO] RMSE: {rmse}")
 
-with open(config.MODEL_PATH, "wb") as f:
-    f.write(pickle.dumps(model))
\ No newline at end of file
+def main():
+    parser = argparse.ArgumentParser(description="Обучение RandomForest-денойзера")
+    parser.add_argument("--source", choices=["shards", "csv"], default="shards",
+                        help="shards - .npy шарды build_features (memmap), csv - прежний features.csv")
+    parser.add_argument("--features-dir", default=config.FEATURES_DIR)
+    parser.add_argument("--csv", default=config.FEATURES_PATH)
+    parser.add_argument("--subset", type=int, default=None,
+                        help="обучать на равномерной выборке из стольких строк (reservoir), читаются только они")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--load-only", action="store_true", help="только загрузить и напечатать время / RSS")
+    args = parser.parse_args()
+
+    print("[INFO] Загрузка датасета...")
+    start = time.perf_counter()
+    if args.source == "csv":
+        features, target = load_csv_features(args.csv)
+        if args.subset is not None and args.subset < len(target):
+            keep = np.sort(np.random.default_rng(args.seed).choice(len(target), args.subset, replace=False))
+            features, target = features[keep], target[keep]
+    else:
+        shards = shard_paths(args.features_dir)
+        if not shards:
+            raise SystemExit(f"[ERROR] Нет шардов признаков в {args.features_dir}, сначала build_features")
+        features, target = load_shards(args.features_dir, subset=args.subset, seed=args.seed,
+                                       chunk_rows=args.chunk_rows)
+        print(f"[INFO] шардов: {len(shards)}")
+
+    print(f"[INFO] {args.source}: {len(target)} строк, {features.nbytes / 2**20:.1f} MB признаков "
+          f"({features.dtype}), загрузка {time.perf_counter() - start:.2f} s, пик RSS {peak_rss_mb():.1f} MB")
+    if args.load_only:
+        return
+
+    (trainX, testX, trainY, testY) = train_test_split(features, target,
+                                                      test_size=0.25, random_state=42)
+
+    print("[INFO] Тренировка модели...")
+    model = RandomForestRegressor(n_estimators=10)
+    model.fit(trainX, trainY)
+
+    print("[INFO] Оценка модели...")
+    preds = model.predict(testX)
+    rmse = np.sqrt(mean_squared_error(testY, preds))
+    print(f"[INFO] RMSE: {rmse}")
+
+    with open(config.MODEL_PATH, "wb") as f:
+        f.write(pickle.dumps(model))
+
+
+if __name__ == "__main__":
+    main()
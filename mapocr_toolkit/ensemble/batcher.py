@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Sequence, Union
+
+import numpy as np
+
+# Микробатчинг запросов: мелкие запросы из разных потоков склеиваются в один
+# вызов модели, но первый запрос ждёт не дольше max_wait_ms
+
+DEFAULT_MAX_BATCH = 256
+DEFAULT_MAX_WAIT_MS = 10.0
+
+# по скольким последним запросам / батчам считаются перцентили в stats()
+STATS_WINDOW = 10_000
+
+BatchFn = Callable[[Sequence[dict]], dict]
+
+
+class MicroBatcher:
+    """
+    fn(items) -> dict массивов длины len(items). submit() из любого потока
+    возвращает Future с dict только для своих элементов. батч закрывается,
+    когда набрано max_batch элементов или с первого запроса прошло max_wait_ms
+    (уже ждущие в очереди запросы забираются и после дедлайна, так что при
+    max_wait_ms=0 батч - всё, что накопилось за предыдущий вызов);
+    запрос больше max_batch идёт целиком одним вызовом.
+
+    вместо одной fn можно передать несколько веток (например CNN и RNN):
+    каждая получает тот же батч в своём потоке, их dict объединяются
+    """
+
+    def __init__(self, fn: Union[BatchFn, Sequence[BatchFn]],
+                 max_batch: int = DEFAULT_MAX_BATCH, max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+                 stats_window: int = STATS_WINDOW):
+        self.branches = [fn] if callable(fn) else list(fn)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.items = 0
+        self.requests = 0
+
+        self._latencies: deque = deque(maxlen=stats_window)
+        self._batch_sizes: deque = deque(maxlen=stats_window)
+        self._batch_times: deque = deque(maxlen=stats_window)
+        self._stats_lock = threading.Lock()
+
+        self._pool = None
+        if len(self.branches) > 1:
+            self._pool = ThreadPoolExecutor(max_workers=len(self.branches), thread_name_prefix='batcher-branch')
+
+        self._queue: queue.Queue = queue.Queue()
+        self._carry = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, items: Sequence[dict]) -> Future:
+        future: Future = Future()
+        if self._closed:
+            future.set_exception(RuntimeError('MicroBatcher закрыт'))
+            return future
+        if not items:
+            # пустой запрос считается сразу, но ошибка ветки всё равно уходит во Future
+            try:
+                future.set_result(self._run([]))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        self._queue.put((list(items), future, time.perf_counter()))
+        return future
+
+    def close(self) -> None:
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        if self._pool is not None:
+            self._pool.shutdown()
+
+    def stats(self) -> dict:
+        """перцентили задержки запроса (ожидание в очереди + батч) и фактический размер батча"""
+        with self._stats_lock:
+            latencies = np.array(self._latencies, dtype=np.float64) * 1000
+            sizes = np.array(self._batch_sizes, dtype=np.float64)
+            times = np.array(self._batch_times, dtype=np.float64) * 1000
+            counters = {'requests': self.requests, 'batches': self.batches, 'items': self.items}
+
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (0.0, 0.0, 0.0)
+        return {
+            **counters,
+            'latency_ms': {'p50': round(float(p50), 3), 'p95': round(float(p95), 3), 'p99': round(float(p99), 3)},
+            'batch_size': {
+                'mean': round(float(sizes.mean()), 2) if len(sizes) else 0.0,
+                'p50': float(np.percentile(sizes, 50)) if len(sizes) else 0.0,
+                'max': int(sizes.max()) if len(sizes) else 0,
+            },
+            'batch_ms_mean': round(float(times.mean()), 3) if len(times) else 0.0,
+        }
+
+    def _run(self, items: list) -> dict:
+        if self._pool is None:
+            return self.branches[0](items)
+        futures = [self._pool.submit(branch, items) for branch in self.branches]
+        result: dict = {}
+        for future in futures:
+            result.update(future.result())
+        return result
+
+    def _collect(self) -> list:
+        first = self._carry if self._carry is not None else self._queue.get()
+        self._carry = None
+        if first is None:
+            return []
+
+        pending = [first]
+        size = len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                # после дедлайна забираем только то, что уже стоит в очереди
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None)
+                break
+            if size + len(request[0]) > self.max_batch:
+                # не влезает - открывает следующий батч
+                self._carry = request
+                break
+            pending.append(request)
+            size += len(request[0])
+        return pending
+
+    def _loop(self) -> None:
+        while True:
+            pending = self._collect()
+            if not pending:
+                return
+
+            items = [item for request_items, _, _ in pending for item in request_items]
+            start = time.perf_counter()
+            try:
+                result = self._run(items)
+            except Exception as e:
+                for _, future, _ in pending:
+                    future.set_exception(e)
+                continue
+            batch_time = time.perf_counter() - start
+
+            done = time.perf_counter()
+            with self._stats_lock:
+                self.batches += 1
+                self.items += len(items)
+                self.requests += len(pending)
+                self._batch_sizes.append(len(items))
+                self._batch_times.append(batch_time)
+                self._latencies.extend(done - submitted for _, _, submitted in pending)
+
+            offset = 0
+            for request_items, future, _ in pending:
+                stop = offset + len(request_items)
+                future.set_result({key: np.asarray(value)[offset:stop] for key, value in result.items()})
+                offset = stop
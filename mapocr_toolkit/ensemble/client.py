@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import json
+import os
+import urllib.error
+import urllib.request
+from typing import Optional, Sequence
+
+import numpy as np
+
+# Клиент сервера ансамбля (scripts/ensemble_server.py): только stdlib и numpy,
+# TensorFlow в процесс клиента не загружается
+
+DEFAULT_URL = 'http://127.0.0.1:8766'
+
+# элементов в одном HTTP-запросе; сервер сам склеивает запросы в батчи модели
+CHUNK_SIZE = 256
+
+
+class EnsembleClient:
+    def __init__(self, url: str = DEFAULT_URL, timeout: float = 300.0):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def _request(self, path: str, payload: Optional[dict] = None) -> dict:
+        data = None if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        request = urllib.request.Request(self.url + path, data=data,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            detail = e.read().decode('utf-8', errors='replace')
+            raise RuntimeError(f'Сервер ансамбля вернул {e.code}: {detail}') from e
+        except urllib.error.URLError as e:
+            raise ConnectionError(f'Сервер ансамбля недоступен по {self.url}: {e.reason}. '
+                                  f'Запуск: python scripts/ensemble_server.py') from e
+
+    def health(self) -> dict:
+        return self._request('/health')
+
+    def predict(self, paths: Sequence[Optional[str]], texts: Sequence[str],
+                chunk_size: int = CHUNK_SIZE) -> tuple[np.ndarray, np.ndarray, np.ndarray, list[str]]:
+        """
+        (p_cnn, cnn_ok, p_rnn, classes) по путям к кропам и OCR-текстам.
+        пути отправляются абсолютными - сервер может быть запущен из другой папки
+        """
+        if len(paths) != len(texts):
+            raise ValueError('paths и texts должны быть одной длины')
+
+        items = [
+            {'path': os.path.abspath(str(path)) if path else None, 'ocr_text': str(text)}
+            for path, text in zip(paths, texts)
+        ]
+        p_cnn, cnn_ok, p_rnn = [], [], []
+        classes: list[str] = []
+        for start in range(0, len(items), chunk_size):
+            response = self._request('/predict', {'items': items[start:start + chunk_size]})
+            classes = response['classes']
+            p_cnn.append(np.asarray(response['cnn'], dtype=np.float32).reshape(-1, len(classes)))
+            cnn_ok.append(np.asarray(response['cnn_ok'], dtype=bool))
+            p_rnn.append(np.asarray(response['rnn'], dtype=np.float32).reshape(-1, len(classes)))
+
+        if not items:
+            classes = self.health()['classes']
+            empty = np.zeros((0, len(classes)), dtype=np.float32)
+            return empty, np.zeros(0, dtype=bool), empty, classes
+        return np.concatenate(p_cnn), np.concatenate(cnn_ok), np.concatenate(p_rnn), classes
+
+
+def reorder_columns(probs: np.ndarray, classes: Sequence[str], class_names: Sequence[str]) -> np.ndarray:
+    """столбцы вероятностей из порядка классов сервера в порядок class_names"""
+    missing = set(class_names) - set(classes)
+    if missing:
+        raise ValueError(f'У моделей на сервере нет классов: {sorted(missing)}')
+    return probs[:, [list(classes).index(name) for name in class_names]]
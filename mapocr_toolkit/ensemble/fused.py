@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import json
+import os
+from typing import Sequence
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+from mapocr_toolkit.ensemble.predictor import DEFAULT_BATCH_SIZE, EnsemblePredictor
+from mapocr_toolkit.ensemble.voting import DEFAULT_CNN_WEIGHT, STRATEGIES
+from mapocr_toolkit.utils.cnn_preprocessor import RESCALE_IN_MODEL_KEY
+from mapocr_toolkit.utils.rnn_batching import batch_length, sequence_lengths
+from mapocr_toolkit.utils.rnn_preprocessor import INPUT_MODE_INDEX, INPUT_MODE_ONE_HOT, encode_for_rnn
+
+# Один граф на весь ансамбль: вход (кроп uint8, индексы символов, cnn_ok),
+# внутри обе подмодели и голосование, выход - вероятности ансамбля.
+# сохраняется одним SavedModel, inference - один вызов графа, ветки CNN и RNN
+# независимы и рантайм TF сам раскладывает их по потокам
+
+FUSED_INFO_FILE = 'fused_processing_info.json'
+
+
+class ImageToFloat(keras.layers.Layer):
+    """uint8 -> float32 с масштабом: 1/255 для старых моделей без Rescaling внутри, иначе 1"""
+
+    def __init__(self, scale: float = 1.0, **kwargs):
+        super().__init__(**kwargs)
+        self.scale = float(scale)
+
+    def call(self, inputs):
+        return tf.cast(inputs, tf.float32) * self.scale
+
+    def get_config(self):
+        return {**super().get_config(), 'scale': self.scale}
+
+
+class OneHotChars(keras.layers.Layer):
+    """индексы символов -> one-hot для RNN, обученной на старом входе"""
+
+    def __init__(self, depth: int, **kwargs):
+        super().__init__(**kwargs)
+        self.depth = int(depth)
+
+    def call(self, inputs):
+        return tf.one_hot(tf.cast(inputs, tf.int32), self.depth, dtype=tf.float32)
+
+    def get_config(self):
+        return {**super().get_config(), 'depth': self.depth}
+
+
+class MaskFailedCrops(keras.layers.Layer):
+    """там, где кроп не прочитан (cnn_ok = 0), p_cnn заменяется равномерным prior"""
+
+    def call(self, inputs):
+        p_cnn, cnn_ok = inputs
+        num_classes = tf.cast(tf.shape(p_cnn)[-1], p_cnn.dtype)
+        return cnn_ok * p_cnn + (1.0 - cnn_ok) / num_classes
+
+
+class EnsembleVoting(keras.layers.Layer):
+    """стратегии из ensemble/voting.py в виде слоя; cnn_weight зашит в граф"""
+
+    def __init__(self, strategy: str = 'weighted', cnn_weight: float = DEFAULT_CNN_WEIGHT, **kwargs):
+        super().__init__(**kwargs)
+        if strategy not in STRATEGIES:
+            raise ValueError(f'неизвестная стратегия {strategy!r}, доступны: {STRATEGIES}')
+        self.strategy = strategy
+        self.cnn_weight = float(cnn_weight)
+
+    def call(self, inputs):
+        p_cnn, p_rnn = inputs
+        if self.strategy == 'soft':
+            return (p_cnn + p_rnn) / 2.0
+        if self.strategy == 'weighted':
+            return self.cnn_weight * p_cnn + (1.0 - self.cnn_weight) * p_rnn
+        cnn_wins = tf.reduce_max(p_cnn, axis=-1, keepdims=True) >= tf.reduce_max(p_rnn, axis=-1, keepdims=True)
+        return tf.where(cnn_wins, p_cnn, p_rnn)
+
+    def get_config(self):
+        return {**super().get_config(), 'strategy': self.strategy, 'cnn_weight': self.cnn_weight}
+
+
+def _class_list(info: dict) -> list[str]:
+    int_to_class = {int(k): v for k, v in info['int_to_class'].items()}
+    return [int_to_class[i] for i in range(len(int_to_class))]
+
+
+def text_length(rnn_info: dict):
+    """None для RNN без фиксированной длины (dynamic_length), иначе max_seq_len"""
+    return None if rnn_info.get('dynamic_length') else int(rnn_info['max_seq_len'])
+
+
+def build_fused_model(cnn_model, rnn_model, cnn_info: dict, rnn_info: dict,
+                      strategy: str = 'weighted', cnn_weight: float = DEFAULT_CNN_WEIGHT) -> keras.Model:
+    """
+    входы: image (N, H, W, 3) uint8, text (N, L) int32 индексы, cnn_ok (N, 1) float32.
+    выходы: {'ensemble', 'cnn', 'rnn'} - (N, C) каждый
+    """
+    classes = _class_list(cnn_info)
+    if _class_list(rnn_info) != classes:
+        raise ValueError(f'порядок классов CNN и RNN различается: {classes} / {_class_list(rnn_info)}')
+
+    target_size = tuple(cnn_info.get('target_size', (60, 200)))
+    image = keras.Input(shape=target_size + (3,), dtype='uint8', name='image')
+    text = keras.Input(shape=(text_length(rnn_info),), dtype='int32', name='text')
+    cnn_ok = keras.Input(shape=(1,), dtype='float32', name='cnn_ok')
+
+    scale = 1.0 if cnn_info.get(RESCALE_IN_MODEL_KEY) else 1.0 / 255
+    p_cnn = cnn_model(ImageToFloat(scale, name='image_to_float')(image))
+    p_cnn = MaskFailedCrops(name='cnn')([p_cnn, cnn_ok])
+
+    x_text = text
+    if rnn_info.get('input_mode', INPUT_MODE_ONE_HOT) != INPUT_MODE_INDEX:
+        x_text = OneHotChars(rnn_info['num_chars_vocab'], name='one_hot_chars')(text)
+    p_rnn = rnn_model(x_text)
+
+    p_ensemble = EnsembleVoting(strategy, cnn_weight, name='ensemble')([p_cnn, p_rnn])
+    return keras.Model(inputs=[image, text, cnn_ok],
+                       outputs={'ensemble': p_ensemble, 'cnn': p_cnn, 'rnn': p_rnn},
+                       name=f'fused_ensemble_{strategy}')
+
+
+def export_fused_model(model: keras.Model, export_dir, cnn_info: dict, rnn_info: dict,
+                       strategy: str, cnn_weight: float) -> None:
+    """
+    SavedModel с сигнатурой serve(image, text, cnn_ok) через tf.Module - не зависит
+    от того, Keras 2 или 3 стоит; рядом JSON с обеими processing_info
+    """
+    image_spec, text_spec, ok_spec = [
+        tf.TensorSpec(shape=tensor.shape, dtype=tensor.dtype, name=tensor.name.split(':')[0])
+        for tensor in model.inputs
+    ]
+
+    module = tf.Module()
+    module.model = model
+    module.serve = tf.function(
+        lambda image, text, cnn_ok: model([image, text, cnn_ok], training=False),
+        input_signature=[image_spec, text_spec, ok_spec],
+    )
+    tf.saved_model.save(module, str(export_dir), signatures={'serving_default': module.serve})
+
+    info = {
+        'strategy': strategy,
+        'cnn_weight': cnn_weight,
+        'classes': _class_list(cnn_info),
+        'cnn_info': cnn_info,
+        'rnn_info': rnn_info,
+    }
+    with open(os.path.join(str(export_dir), FUSED_INFO_FILE), 'w', encoding='utf-8') as f:
+        json.dump(info, f, ensure_ascii=False, indent=4)
+
+
+class FusedEnsemblePredictor(EnsemblePredictor):
+    """
+    тот же интерфейс, что у EnsemblePredictor, но обе модели и голосование -
+    один SavedModel. в результате есть ещё 'ensemble' - вероятности после голосования
+    """
+
+    def __init__(self, serve_fn, info: dict, batch_size: int = DEFAULT_BATCH_SIZE):
+        super().__init__(None, None, info['cnn_info'], info['rnn_info'], batch_size)
+        self.serve_fn = serve_fn
+        self.strategy = info['strategy']
+        self.cnn_weight = info['cnn_weight']
+        self.text_info = dict(self.rnn_info, input_mode=INPUT_MODE_INDEX)
+
+    @classmethod
+    def from_dir(cls, export_dir, batch_size: int = DEFAULT_BATCH_SIZE) -> 'FusedEnsemblePredictor':
+        with open(os.path.join(str(export_dir), FUSED_INFO_FILE), 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        loaded = tf.saved_model.load(str(export_dir))
+        predictor = cls(loaded.serve, info, batch_size)
+        predictor._loaded = loaded  # функции SavedModel живут, пока жив объект
+        return predictor
+
+    @property
+    def branches(self) -> tuple:
+        # ветки уже параллельны внутри графа
+        return (self.predict,)
+
+    def predict_cnn(self, items: Sequence[dict]) -> dict:
+        result = self.predict(items)
+        return {'cnn': result['cnn'], 'cnn_ok': result['cnn_ok']}
+
+    def predict_rnn(self, items: Sequence[dict]) -> dict:
+        return {'rnn': self.predict(items)['rnn']}
+
+    def predict(self, items: Sequence[dict]) -> dict:
+        """{'ensemble', 'cnn', 'cnn_ok', 'rnn'} за один вызов графа на батч"""
+        num_classes = len(self.classes)
+        crops, cnn_ok = self.decode_batch(items)
+        outputs = {key: np.zeros((len(items), num_classes), dtype=np.float32) for key in ('ensemble', 'cnn', 'rnn')}
+        if not items:
+            return {**outputs, 'cnn_ok': cnn_ok}
+
+        text = encode_for_rnn([item.get('ocr_text', '') for item in items], self.text_info)
+        ok = cnn_ok.astype(np.float32)[:, None]
+        dynamic = self.rnn_info.get('dynamic_length', False)
+        for start in range(0, len(items), self.batch_size):
+            stop = start + self.batch_size
+            text_batch = text[start:stop]
+            if dynamic:
+                # паддинг до самой длинной строки батча, а не до max_seq_len
+                text_batch = text_batch[:, :batch_length(sequence_lengths(text_batch), text.shape[1])]
+            result = self.serve_fn(crops[start:stop], text_batch, ok[start:stop])
+            for key in outputs:
+                outputs[key][start:stop] = result[key].numpy()
+        return {**outputs, 'cnn_ok': cnn_ok}
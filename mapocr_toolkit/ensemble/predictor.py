@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import base64
+import io
+import json
+from typing import Optional, Sequence
+
+import numpy as np
+
+from mapocr_toolkit.utils.cnn_preprocessor import to_model_input
+from mapocr_toolkit.utils.crop_cache import decode_crop
+from mapocr_toolkit.utils.rnn_preprocessor import encode_for_rnn
+from mapocr_toolkit.utils.tflite_backend import load_classifier
+
+# Ансамбль CNN+RNN, загруженный один раз: вероятности обеих моделей по батчу (кроп, текст)
+
+DEFAULT_BATCH_SIZE = 64
+
+
+def _load_json(path) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class EnsemblePredictor:
+    """
+    держит обе модели и их processing_info. элемент запроса - dict с
+    ocr_text и кропом: path (путь к файлу) или image_b64 (байты файла).
+    нечитаемый кроп даёт cnn_ok=False и равномерный prior вместо p_cnn
+    """
+
+    def __init__(self, cnn_model, rnn_model, cnn_info: dict, rnn_info: dict,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        self.cnn_model = cnn_model
+        self.rnn_model = rnn_model
+        self.cnn_info = cnn_info
+        self.rnn_info = rnn_info
+        self.batch_size = batch_size
+
+        int_to_class = {int(k): v for k, v in cnn_info['int_to_class'].items()}
+        self.classes = [int_to_class[i] for i in range(len(int_to_class))]
+        self.target_size = tuple(cnn_info.get('target_size', (60, 200)))
+
+    @classmethod
+    def from_paths(cls, cnn_model_path, cnn_info_path, rnn_model_path, rnn_info_path,
+                   batch_size: int = DEFAULT_BATCH_SIZE) -> 'EnsemblePredictor':
+        # .keras или квантованные .tflite из scripts/quantize_models.py
+        cnn_model = load_classifier(cnn_model_path)
+        rnn_model = load_classifier(rnn_model_path)
+        return cls(cnn_model, rnn_model, _load_json(cnn_info_path), _load_json(rnn_info_path), batch_size)
+
+    def _decode(self, item: dict) -> Optional[np.ndarray]:
+        try:
+            if item.get('image_b64'):
+                return decode_crop(io.BytesIO(base64.b64decode(item['image_b64'])), self.target_size)
+            if item.get('path'):
+                return decode_crop(item['path'], self.target_size)
+        except Exception as e:
+            print(f"[WARNING] Не удалось загрузить кроп {item.get('path', '<bytes>')}: {e}")
+        return None
+
+    def decode_batch(self, items: Sequence[dict]) -> tuple[np.ndarray, np.ndarray]:
+        """(crops uint8 (N, H, W, 3), cnn_ok (N,)); нечитаемые кропы остаются нулевыми"""
+        crops = np.zeros((len(items),) + self.target_size + (3,), dtype=np.uint8)
+        cnn_ok = np.zeros(len(items), dtype=bool)
+        for i, item in enumerate(items):
+            crop = self._decode(item)
+            if crop is not None:
+                crops[i] = crop
+                cnn_ok[i] = True
+        return crops, cnn_ok
+
+    def predict_cnn(self, items: Sequence[dict]) -> dict:
+        """{'cnn': (N, C), 'cnn_ok': (N,)} - ветка CNN, декодирование кропов + predict"""
+        num_classes = len(self.classes)
+        p_cnn = np.full((len(items), num_classes), 1.0 / num_classes, dtype=np.float32)
+        crops, cnn_ok = self.decode_batch(items)
+
+        if cnn_ok.any():
+            x = to_model_input(crops[cnn_ok], self.cnn_info)
+            p_cnn[cnn_ok] = self.cnn_model.predict(x, batch_size=self.batch_size, verbose=0)
+        return {'cnn': p_cnn, 'cnn_ok': cnn_ok}
+
+    def predict_rnn(self, items: Sequence[dict]) -> dict:
+        """{'rnn': (N, C)} - ветка RNN, кодирование текстов + predict"""
+        if not items:
+            return {'rnn': np.zeros((0, len(self.classes)), dtype=np.float32)}
+        x = encode_for_rnn([item.get('ocr_text', '') for item in items], self.rnn_info)
+        if self.rnn_info.get('dynamic_length'):
+            from mapocr_toolkit.utils.rnn_batching import predict_bucketed
+            return {'rnn': predict_bucketed(self.rnn_model, x, batch_size=self.batch_size)}
+        return {'rnn': self.rnn_model.predict(x, batch_size=self.batch_size, verbose=0)}
+
+    @property
+    def branches(self) -> tuple:
+        """ветки для MicroBatcher: CNN и RNN независимы и могут идти в разных потоках"""
+        return self.predict_cnn, self.predict_rnn
+
+    def predict(self, items: Sequence[dict]) -> dict:
+        """{'cnn': (N, C), 'cnn_ok': (N,), 'rnn': (N, C)} - смешивание по стратегии делает клиент"""
+        return {**self.predict_cnn(items), **self.predict_rnn(items)}
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import numpy as np
+
+# Стратегии голосования ансамбля поверх вероятностей CNN и RNN (N, C).
+# Те же формулы слоем EnsembleVoting зашиты в fused-граф (ensemble/fused.py)
+
+STRATEGIES = ('soft', 'weighted', 'max_confidence')
+DEFAULT_CNN_WEIGHT = 0.65
+
+
+def soft_voting(p_cnn: np.ndarray, p_rnn: np.ndarray) -> np.ndarray:
+    """
+    Обе модели выдают вектор вероятностей длиной N_классов.
+    Складываем и делим на 2 — победитель тот класс, у которого
+    суммарная вероятность выше.
+    """
+    return (p_cnn + p_rnn) / 2.0
+
+
+def weighted_voting(p_cnn: np.ndarray, p_rnn: np.ndarray,
+                    cnn_weight: float) -> np.ndarray:
+    """
+    Взвешенное среднее CNN получает больший вес, потому что
+    у неё macro F1 = 0.58 против 0.35 у RNN
+    """
+    rnn_weight = 1.0 - cnn_weight
+    return cnn_weight * p_cnn + rnn_weight * p_rnn
+
+
+def max_confidence(p_cnn: np.ndarray, p_rnn: np.ndarray) -> np.ndarray:
+    """
+    Для каждого примера побеждает та модель, у которой
+    максимальная вероятность выше
+    """
+    # np.max по axis=1 — максимум по классам для каждого примера
+    cnn_conf = np.max(p_cnn, axis=1)  # shape: (N,)
+    rnn_conf = np.max(p_rnn, axis=1)  # shape: (N,)
+
+    # для каждого примера выбираем строку из той модели, где уверенность выше
+    cnn_wins = (cnn_conf >= rnn_conf)
+
+    result = np.where(
+        cnn_wins[:, np.newaxis],  # нужна ось чтобы broadcasting сработал по классам
+        p_cnn,
+        p_rnn
+    )
+    return result
+
+
+def apply_voting(strategy: str, p_cnn: np.ndarray, p_rnn: np.ndarray,
+                 cnn_weight: float = DEFAULT_CNN_WEIGHT) -> np.ndarray:
+    if strategy == 'soft':
+        return soft_voting(p_cnn, p_rnn)
+    if strategy == 'weighted':
+        return weighted_voting(p_cnn, p_rnn, cnn_weight)
+    if strategy == 'max_confidence':
+        return max_confidence(p_cnn, p_rnn)
+    raise ValueError(f'неизвестная стратегия {strategy!r}, доступны: {STRATEGIES}')
@@ -1,53 +1,65 @@
 from config import cleaning_image_config as config
 from image_processing import blur_and_threshold
+from image_processing.patches import pad_replicate, sample_mask, sampled_rows
+from features.shards import ShardWriter, quantize_patches
 from imutils import paths
+import numpy as np
 import progressbar
-import random
+import argparse
 import cv2
 
 
+# окна 5x5 всех пикселей берутся одним view (sliding_window_view), выборка - маской
+# из одного вызова RNG, строки пишутся бинарными .npy шардами вместо текстового CSV.
+# строки те же, что давали циклы по y / x: порядок обхода, окно, центр чистого пикселя
 
-trainPaths = sorted(list(paths.list_images(config.TRAIN_PATH)))
-cleanedPaths = sorted(list(paths.list_images(config.CLEANED_PATH)))
 
-widgets = ["Создание признаков:", progressbar.Percentage(), "",
-progressbar.Bar(), "", progressbar.ETA()]
-pbar = progressbar.ProgressBar(maxval=len(trainPaths), widgets=widgets).start()
+def build_features(train_paths, cleaned_paths, writer, sample_prob, rng, pbar=None, dtype="float32"):
+    for (i, (trainPath, cleanedPath)) in enumerate(zip(train_paths, cleaned_paths)):
+        trainImage = cv2.imread(trainPath)
+        cleanImage = cv2.imread(cleanedPath)
+        trainImage = cv2.cvtColor(trainImage, cv2.COLOR_BGR2GRAY)
+        cleanImage = cv2.cvtColor(cleanImage, cv2.COLOR_BGR2GRAY)
 
-imagePaths = zip(trainPaths, cleanedPaths)
-csv = open(config.FEATURES_PATH, "w")
+        trainImage = blur_and_threshold.blur_and_threshold(pad_replicate(trainImage))
+        cleanImage = cleanImage.astype("float") / 255.0
 
-for (i, (trainPath, cleanedPath)) in enumerate(imagePaths):
-    trainImage = cv2.imread(trainPath)
-    cleanImage = cv2.imread(cleanedPath)
-    trainImage = cv2.cvtColor(trainImage, cv2.COLOR_BGR2GRAY)
-    cleanImage = cv2.cvtColor(cleanImage, cv2.COLOR_BGR2GRAY)
+        mask = sample_mask(cleanImage.shape, sample_prob, rng)
+        features, targets = sampled_rows(trainImage, cleanImage, mask)
+        if dtype == "uint8":
+            features = quantize_patches(features)
+        writer.add(features, targets)
 
-    trainImage = cv2.copyMakeBorder(trainImage, 2, 2, 2, 2, cv2.BORDER_REPLICATE)
-    cleanImage = cv2.copyMakeBorder(cleanImage, 2, 2, 2, 2, cv2.BORDER_REPLICATE)
+        if pbar is not None:
+            pbar.update(i)
 
-    trainImage = blur_and_threshold.blur_and_threshold(trainImage)
 
-    cleanImage = cleanImage.astype("float") / 255.0
+def main():
+    parser = argparse.ArgumentParser(description="Признаки 5x5 для RandomForest-денойзера")
+    parser.add_argument("--out", default=config.FEATURES_DIR, help="папка для .npy шардов")
+    parser.add_argument("--sample-prob", type=float, default=config.SAMPLE_PROB)
+    parser.add_argument("--seed", type=int, default=config.FEATURES_SEED)
+    parser.add_argument("--shard-rows", type=int, default=config.SHARD_ROWS)
+    parser.add_argument("--dtype", choices=["float32", "uint8"], default="float32",
+                        help="uint8 - шарды в 4 раза меньше, но признаки округляются до 1/255 "
+                             "(ошибка до ~2e-3, при inference признаки точные)")
+    args = parser.parse_args()
 
-    for y in range(0, trainImage.shape[0]):
-        for x in range(0, trainImage.shape[1]):
-            trainROI = trainImage[y:y + 5, x:x + 5]
-            cleanROI = cleanImage[y:y + 5, x:x + 5]
-            (rH, rW) = trainROI.shape[:2]
+    trainPaths = sorted(list(paths.list_images(config.TRAIN_PATH)))
+    cleanedPaths = sorted(list(paths.list_images(config.CLEANED_PATH)))
 
-            if rW != 5 or rH != 5:
-                continue
+    widgets = ["Создание признаков:", progressbar.Percentage(), "",
+    progressbar.Bar(), "", progressbar.ETA()]
+    pbar = progressbar.ProgressBar(maxval=len(trainPaths), widgets=widgets).start()
 
-            features = trainROI.flatten()
-            target = cleanROI[2, 2]
+    writer = ShardWriter(args.out, args.shard_rows)
+    build_features(trainPaths, cleanedPaths, writer, args.sample_prob,
+                   np.random.default_rng(args.seed), pbar, args.dtype)
+    writer.close()
+    pbar.finish()
 
-            if random.random() <= config.SAMPLE_PROB:
-                features = [str(x) for x in features]
-                row = [str(target)] + features
-                row = ",".join(row)
-                csv.write("{}\n".format(row))
-    pbar.update(i)
+    print(f"[INFO] {writer.rows} строк, {writer.shards} шардов в {args.out}")
 
-pbar.finish()
-csv.close()
\ No newline at end of file
+
+if __name__ == "__main__":
+    main()
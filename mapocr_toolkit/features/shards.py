@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import glob
+import os
+from typing import Optional
+
+import numpy as np
+
+# Признаки денойзера на диске: пары features_XXXXX.npy (n, 25) float32 или uint8 и
+# targets_XXXXX.npy (n,) float64. .npy, а не .npz - шард открывается как memmap
+# и читается кусками, целиком в память не поднимается
+
+SHARD_ROWS = 1_000_000
+
+# строк за один проход по memmap при загрузке
+CHUNK_ROWS = 262_144
+
+# uint8-признаки: в 4 раза меньше float32 на диске, но с потерей. blur_and_threshold
+# нормирует по (max - min) своей страницы, шаг значений - 1/(max - min), а не 1/255,
+# и округление до 1/255 даёт ошибку до 1/510 (~2e-3) на признак. лес учится на
+# округлённых признаках, а clean_image предсказывает по точным float
+UINT8_SCALE = 255.0
+FEATURES_PREFIX = 'features_'
+TARGETS_PREFIX = 'targets_'
+
+
+class ShardWriter:
+    """копит строки и сбрасывает их на диск шардами по shard_rows"""
+
+    def __init__(self, out_dir: str, shard_rows: int = SHARD_ROWS):
+        self.out_dir = out_dir
+        self.shard_rows = shard_rows
+        self.shards = 0
+        self.rows = 0
+        self._x: list[np.ndarray] = []
+        self._y: list[np.ndarray] = []
+        self._pending = 0
+
+        os.makedirs(out_dir, exist_ok=True)
+        # старые шарды от прошлого запуска иначе смешаются с новыми
+        for path in shard_paths(out_dir):
+            os.remove(path[0])
+            os.remove(path[1])
+
+    def add(self, x: np.ndarray, y: np.ndarray) -> None:
+        if not len(x):
+            return
+        self._x.append(x)
+        self._y.append(y)
+        self._pending += len(x)
+        self.rows += len(x)
+        while self._pending >= self.shard_rows:
+            self._flush(self.shard_rows)
+
+    def close(self) -> None:
+        if self._pending:
+            self._flush(self._pending)
+
+    def _flush(self, rows: int) -> None:
+        x = np.concatenate(self._x)
+        y = np.concatenate(self._y)
+        name = f'{self.shards:05d}.npy'
+        np.save(os.path.join(self.out_dir, FEATURES_PREFIX + name), x[:rows])
+        np.save(os.path.join(self.out_dir, TARGETS_PREFIX + name), y[:rows])
+        self.shards += 1
+        self._x, self._y = ([x[rows:]], [y[rows:]]) if rows < len(x) else ([], [])
+        self._pending = len(x) - rows
+
+
+def shard_paths(out_dir: str) -> list[tuple[str, str]]:
+    """[(features.npy, targets.npy), ...] по порядку номеров"""
+    pairs = []
+    for features_path in sorted(glob.glob(os.path.join(out_dir, FEATURES_PREFIX + '*.npy'))):
+        name = os.path.basename(features_path)[len(FEATURES_PREFIX):]
+        targets_path = os.path.join(out_dir, TARGETS_PREFIX + name)
+        if os.path.exists(targets_path):
+            pairs.append((features_path, targets_path))
+    return pairs
+
+
+def quantize_patches(x: np.ndarray) -> np.ndarray:
+    """[0, 1] float -> uint8 с шагом 1/255; ошибка до 0.5/255, см. UINT8_SCALE"""
+    return np.clip(np.rint(np.asarray(x) * UINT8_SCALE), 0, 255).astype(np.uint8)
+
+
+def _as_float32(x: np.ndarray) -> np.ndarray:
+    if x.dtype == np.uint8:
+        return x.astype(np.float32) / np.float32(UINT8_SCALE)
+    return np.asarray(x, dtype=np.float32)
+
+
+def open_shards(out_dir: str) -> list[tuple[np.ndarray, np.ndarray]]:
+    """memmap всех шардов; данные читаются с диска только при обращении"""
+    return [(np.load(f, mmap_mode='r'), np.load(t, mmap_mode='r')) for f, t in shard_paths(out_dir)]
+
+
+def iter_chunks(shards, chunk_rows: int = CHUNK_ROWS):
+    """(x float32 (n, 25), y (n,)) кусками не больше chunk_rows - для обработки вне памяти"""
+    for x, y in shards:
+        for start in range(0, len(y), chunk_rows):
+            yield _as_float32(x[start:start + chunk_rows]), np.asarray(y[start:start + chunk_rows])
+
+
+def reservoir_indices(total: int, k: int, rng: np.random.Generator,
+                      chunk_rows: int = CHUNK_ROWS) -> np.ndarray:
+    """
+    k равномерно выбранных без возвращения номеров строк из total, по возрастанию.
+    у каждой строки случайный ключ, остаются k наименьших: ключи генерируются
+    кусками, в памяти только текущий кусок и k лучших
+    """
+    if k >= total:
+        return np.arange(total)
+    best_keys = np.empty(0)
+    best_idx = np.empty(0, dtype=np.int64)
+    for start in range(0, total, chunk_rows):
+        stop = min(total, start + chunk_rows)
+        keys = np.concatenate([best_keys, rng.random(stop - start)])
+        idx = np.concatenate([best_idx, np.arange(start, stop)])
+        if len(keys) > k:
+            keep = np.argpartition(keys, k - 1)[:k]
+            keys, idx = keys[keep], idx[keep]
+        best_keys, best_idx = keys, idx
+    return np.sort(best_idx)
+
+
+def load_shards(out_dir: str, subset: Optional[int] = None, seed: int = 42,
+                chunk_rows: int = CHUNK_ROWS) -> tuple[np.ndarray, np.ndarray]:
+    """
+    X float32 (n, 25) и y (n,) в заранее выделенные массивы, по шарду и по
+    куску за раз - без списка копий и concatenate. subset - reservoir-выборка
+    subset строк, читаются только они
+    """
+    shards = open_shards(out_dir)
+    counts = [len(y) for _, y in shards]
+    total = sum(counts)
+    width = shards[0][0].shape[1] if shards else 0
+
+    selected = None
+    if subset is not None and subset < total:
+        selected = reservoir_indices(total, subset, np.random.default_rng(seed), chunk_rows)
+
+    rows = total if selected is None else len(selected)
+    x_out = np.empty((rows, width), dtype=np.float32)
+    y_out = np.empty(rows, dtype=np.float64)
+
+    pos, offset = 0, 0
+    for (x, y), count in zip(shards, counts):
+        if selected is None:
+            local = None
+        else:
+            lo, hi = np.searchsorted(selected, [offset, offset + count])
+            local = selected[lo:hi] - offset
+        n = count if local is None else len(local)
+        for start in range(0, n, chunk_rows):
+            stop = min(n, start + chunk_rows)
+            part = slice(start, stop) if local is None else local[start:stop]
+            x_out[pos:pos + stop - start] = _as_float32(x[part])
+            y_out[pos:pos + stop - start] = y[part]
+            pos += stop - start
+        offset += count
+    return x_out, y_out
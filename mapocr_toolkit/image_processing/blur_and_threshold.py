@@ -1,14 +1,37 @@
 import numpy as np
 import cv2
 
-def blur_and_threshold(image, eps=1e-7):
+def dark_foreground(image):
+    # тёмнее медианного фона 5x5 - отрицательные значения, остальное 0.
+    # отдельно от нормировки: тайловый денойзер собирает min / max по всему листу
     blur = cv2.medianBlur(image, 5)
     foreground = image.astype("float") - blur
 
     foreground[foreground > 0] = 0
+    return foreground
+
+def blur_and_threshold(image, eps=1e-7):
+    foreground = dark_foreground(image)
 
     min_val = np.min(foreground)
     max_val = np.max(foreground)
     foreground = (foreground - min_val) / (max_val - min_val + eps)
 
-    return foreground
\ No newline at end of file
+    return foreground
+
+def ink_density(image, scale=0.25, contrast=25):
+    # доля "чернильных" пикселей окна: тот же фон через медианный блюр, что и в
+    # blur_and_threshold, но без нормировки min/max - она раздувает шум бумаги
+    # на пустом окне до полного диапазона. считается на уменьшенной копии
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+
+    if scale < 1:
+        h, w = image.shape[:2]
+        image = cv2.resize(image, (max(1, int(w * scale)), max(1, int(h * scale))),
+                           interpolation=cv2.INTER_AREA)
+
+    blur = cv2.medianBlur(image, 5)
+    ink = blur.astype(np.int16) - image.astype(np.int16)
+
+    return float(np.count_nonzero(ink > contrast)) / ink.size
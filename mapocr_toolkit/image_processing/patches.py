@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Окна 5x5 вокруг каждого пикселя для RandomForest-денойзера: признаки -
+# 25 значений blur_and_threshold окна, цель - чистый пиксель в центре.
+# все окна берутся одним view без копирования, вместо циклов по y / x
+
+PATCH_SIZE = 5
+PAD = PATCH_SIZE // 2
+
+# сколько пикселей (строк признаков) уходит в один model.predict: полоса строк
+# изображения копируется в непрерывный float32 (n, 25), память не растёт с листом
+BAND_PIXELS = 262_144
+
+
+def pad_replicate(image: np.ndarray, pad: int = PAD) -> np.ndarray:
+    """то же, что cv2.copyMakeBorder(..., BORDER_REPLICATE) со всех сторон"""
+    return np.pad(image, pad, mode='edge')
+
+
+def patch_view(padded: np.ndarray, size: int = PATCH_SIZE) -> np.ndarray:
+    """(H, W, size, size) view на окна дополненного изображения; H, W - размер исходного"""
+    return sliding_window_view(padded, (size, size))
+
+
+def sample_mask(shape: tuple, prob: float, rng: np.random.Generator) -> np.ndarray:
+    """какие пиксели идут в выборку: одно обращение к RNG на всё изображение"""
+    return rng.random(shape) <= prob
+
+
+def sampled_rows(
+    features_padded: np.ndarray,
+    target: np.ndarray,
+    mask: Optional[np.ndarray] = None,
+    size: int = PATCH_SIZE,
+    dtype=np.float32,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    строки обучающей выборки в порядке обхода по строкам (как прежние циклы):
+    X (n, size*size) - окна features_padded, y (n,) - target в центре окна.
+    без mask - все пиксели
+    """
+    windows = patch_view(features_padded, size)
+    if mask is None:
+        x = windows.reshape(-1, size * size)
+        y = np.asarray(target).reshape(-1)
+    else:
+        x = windows[mask].reshape(-1, size * size)
+        y = np.asarray(target)[mask]
+    return x.astype(dtype, copy=False), y.astype(np.float64, copy=False)
+
+
+def predict_patches(model, features_padded: np.ndarray, band_pixels: int = BAND_PIXELS,
+                    size: int = PATCH_SIZE) -> np.ndarray:
+    """
+    предсказание регрессора для каждого пикселя: (H, W) по дополненному на
+    size // 2 изображению признаков. окна - view, в predict идёт полоса строк
+    одним непрерывным массивом float32 (sklearn-деревья всё равно приводят X
+    к float32, так что результат тот же, что у списка окон float64)
+    """
+    windows = patch_view(features_padded, size)
+    height, width = windows.shape[:2]
+    out = np.empty((height, width), dtype=np.float64)
+    band_rows = max(1, band_pixels // max(1, width))
+    for top in range(0, height, band_rows):
+        bottom = min(height, top + band_rows)
+        x = np.ascontiguousarray(windows[top:bottom], dtype=np.float32).reshape(-1, size * size)
+        out[top:bottom] = np.asarray(model.predict(x)).reshape(bottom - top, width)
+    return out
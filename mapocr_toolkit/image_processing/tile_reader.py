@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+import re
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+# Оконное чтение больших TIF-карт: в памяти только текущее окно, а не весь лист
+
+DEFAULT_CACHE_DIR = os.path.join('data', '.tile_cache')
+
+# сколько строк растра конвертируется за раз при построении кэша и уменьшенной копии
+BAND_ROWS = 2048
+# радиус ядра LANCZOS в пикселях результата: столько строк листа (в его масштабе)
+# полоса read_scaled берёт сверху и снизу, чтобы на стыках полос не было швов
+LANCZOS_SUPPORT = 3
+# предел raw-кэша на диске; при переполнении уходят давно не открытые листы
+DEFAULT_CACHE_MAX_MB = 32768
+
+
+class TileReader:
+    """
+    окно (x0, y0, x1, y1) листа в RGB uint8 без декодирования всего листа.
+
+    бэкенды по порядку:
+      1. tifffile.memmap - несжатый TIF отображается в память как есть
+      2. tifffile + zarr - тайловый/полосовой TIF читается лениво по тайлам
+      3. raw-кэш - лист один раз декодируется через PIL в .npy на диске,
+         дальше окна читаются из memory-mapped файла
+
+    tifffile и zarr необязательны, без них всегда работает вариант 3
+    """
+
+    def __init__(self, path, cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                 cache_max_mb: float = DEFAULT_CACHE_MAX_MB):
+        self.path = Path(path)
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.cache_max_mb = cache_max_mb
+        self.backend = ''
+        self._array = None
+        self._gray = False
+        self._open()
+        self.height, self.width = self._array.shape[:2]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        self._array = None
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        return self.height, self.width, 3
+
+    def read(self, x0: int, y0: int, x1: int, y1: int) -> np.ndarray:
+        """окно листа (y1 - y0, x1 - x0, 3) uint8, непрерывный массив"""
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(self.width, x1), min(self.height, y1)
+        region = np.asarray(self._array[y0:y1, x0:x1])
+
+        if self._gray:
+            region = np.repeat(region[..., None], 3, axis=2)
+        elif region.shape[2] > 3:
+            region = region[..., :3]
+        return np.ascontiguousarray(region, dtype=np.uint8)
+
+    def read_scaled(self, scale: float) -> np.ndarray:
+        """
+        уменьшенная копия всего листа, собирается полосами по ~BAND_ROWS строк листа.
+        полоса читается с запасом под ядро LANCZOS и масштабируется через box, поэтому
+        результат совпадает с resize целого листа (до 1 уровня из-за округления)
+        """
+        new_w = max(1, int(self.width * scale))
+        new_h = max(1, int(self.height * scale))
+        out = np.empty((new_h, new_w, 3), dtype=np.uint8)
+
+        step = self.height / new_h
+        margin = math.ceil(LANCZOS_SUPPORT * max(step, 1.0)) + 1
+        out_rows = max(1, int(BAND_ROWS / step))
+
+        for oy0 in range(0, new_h, out_rows):
+            oy1 = min(new_h, oy0 + out_rows)
+            by0, by1 = oy0 * step, oy1 * step
+            y0 = max(0, math.floor(by0) - margin)
+            y1 = min(self.height, math.ceil(by1) + margin)
+
+            band = Image.fromarray(self.read(0, y0, self.width, y1))
+            box = (0, by0 - y0, self.width, by1 - y0)
+            out[oy0:oy1] = np.asarray(band.resize((new_w, oy1 - oy0), Image.LANCZOS, box=box))
+
+        return out
+
+    # ── бэкенды ──────────────────────────────────────────────────────────────
+
+    def _open(self) -> None:
+        for opener in (self._open_tiff_memmap, self._open_tiff_zarr):
+            try:
+                if opener():
+                    return
+            except Exception:
+                continue
+        self._open_raw_cache()
+
+    def _accept(self, array, backend: str) -> bool:
+        # принимаем только uint8 RGB(A) или grayscale, остальное декодирует PIL
+        if array.dtype != np.uint8:
+            return False
+        if array.ndim == 2:
+            self._gray = True
+        elif not (array.ndim == 3 and array.shape[2] in (3, 4)):
+            return False
+
+        self._array = array
+        self.backend = backend
+        return True
+
+    def _is_plain_tiff(self) -> bool:
+        # палитру, CMYK и раздельные плоскости проще отдать PIL
+        if self.path.suffix.lower() not in ('.tif', '.tiff'):
+            return False
+        import tifffile
+
+        with tifffile.TiffFile(str(self.path)) as tif:
+            page = tif.pages[0]
+            return (page.photometric in (tifffile.PHOTOMETRIC.RGB, tifffile.PHOTOMETRIC.MINISBLACK)
+                    and page.planarconfig != tifffile.PLANARCONFIG.SEPARATE)
+
+    def _open_tiff_memmap(self) -> bool:
+        if not self._is_plain_tiff():
+            return False
+        import tifffile
+        return self._accept(tifffile.memmap(str(self.path), mode='r'), 'tifffile.memmap')
+
+    def _open_tiff_zarr(self) -> bool:
+        if not self._is_plain_tiff():
+            return False
+        import tifffile
+        import zarr
+
+        store = tifffile.imread(str(self.path), aszarr=True, level=0)
+        array = zarr.open(store, mode='r')
+        # без нужного кодека (imagecodecs) ошибка вылезет только на чтении, проверяем сразу
+        np.asarray(array[:1, :1])
+        return self._accept(array, 'tifffile+zarr')
+
+    def _cache_path(self) -> Path:
+        stat = self.path.stat()
+        cache_dir = self.cache_dir or self.path.parent
+        return cache_dir / f'{self._cache_stem()}_{stat.st_size}_{stat.st_mtime_ns}.rgb.npy'
+
+    def _cache_stem(self) -> str:
+        # хэш полного пути: одноимённые листы из разных папок не делят кэш и не удаляют чужой
+        digest = hashlib.blake2b(str(self.path.resolve()).encode('utf-8'), digest_size=6).hexdigest()
+        return f'{self.path.stem}_{digest}'
+
+    def _evict_raw_cache(self, keep: Path) -> None:
+        """
+        удаляет кэши этого листа от прежних версий файла (другие размер / mtime),
+        потом давно не открытые кэши любых листов, пока папка не влезет в cache_max_mb
+        """
+        stale = re.compile(re.escape(self._cache_stem()) + r'_\d+_\d+\.rgb\.npy')
+        entries = []
+        for path in keep.parent.glob('*.rgb.npy'):
+            if path == keep:
+                continue
+            try:
+                if stale.fullmatch(path.name):
+                    path.unlink()
+                    continue
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = keep.stat().st_size + sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.cache_max_mb * 2**20:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+
+    def _open_raw_cache(self) -> None:
+        cache_path = self._cache_path()
+
+        if cache_path.exists():
+            os.utime(cache_path)  # отметка для вытеснения давно не открытых листов
+        else:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix('.part')
+
+            Image.MAX_IMAGE_PIXELS = None
+            with Image.open(self.path) as img:
+                w, h = img.size
+                img.load()
+                out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8, shape=(h, w, 3))
+                # конвертация полосами: в RAM декодированный лист + одна полоса,
+                # а не две полные копии (PIL RGB и numpy)
+                for y0 in range(0, h, BAND_ROWS):
+                    y1 = min(h, y0 + BAND_ROWS)
+                    out[y0:y1] = np.asarray(img.crop((0, y0, w, y1)).convert('RGB'))
+                out.flush()
+                del out
+
+            os.replace(tmp_path, cache_path)
+            self._evict_raw_cache(cache_path)
+
+        self._array = np.load(cache_path, mmap_mode='r')
+        self.backend = 'raw-cache'
+
+
+def open_tile_reader(path, cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                     cache_max_mb: float = DEFAULT_CACHE_MAX_MB) -> TileReader:
+    return TileReader(path, cache_dir=cache_dir, cache_max_mb=cache_max_mb)
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+from typing import Optional
+
+import numpy as np
+
+# относительные импорты: модуль грузится и как mapocr_toolkit.image_processing,
+# и как image_processing из скриптов denoising/
+from .blur_and_threshold import dark_foreground
+from .patches import BAND_PIXELS, PAD, predict_patches
+
+# Тайловый RandomForest-денойзер для страниц и листов карт: N x M тайлов в пуле
+# процессов, результат совпадает с clean_image.process_image на всём изображении.
+#
+# halo тайла - 4 пикселя, а не 2: окну 5x5 нужны 2 пикселя вокруг, но значения
+# в окне - это blur_and_threshold, а medianBlur 5x5 сам смотрит ещё на 2 пикселя.
+# с halo 2 медиана на краю тайла считалась бы по отражённому краю тайла - шов.
+# нормировка blur_and_threshold глобальная (min / max по всему листу), поэтому
+# два прохода: сначала min / max по тайлам, потом нормировка и predict
+
+BLUR_RADIUS = 2
+HALO = PAD + BLUR_RADIUS
+DEFAULT_TILE_SIZE = 512
+EPS = 1e-7
+
+# модель и изображение воркеров: при fork наследуются без pickle (copy-on-write)
+_STATE: dict = {}
+
+
+def tile_grid(height: int, width: int, tile_size: int = DEFAULT_TILE_SIZE) -> list[tuple[int, int, int, int]]:
+    """(y0, y1, x0, x1) тайлов, покрывающих изображение без перекрытия"""
+    return [
+        (y0, min(height, y0 + tile_size), x0, min(width, x0 + tile_size))
+        for y0 in range(0, height, tile_size)
+        for x0 in range(0, width, tile_size)
+    ]
+
+
+def _axis_crop(start: int, stop: int, size: int) -> tuple[np.ndarray, int]:
+    """
+    индексы исходного изображения для куска pad_replicate(image, PAD) вдоль оси:
+    окна выходных пикселей [start, stop) плюс BLUR_RADIUS для медианы.
+    второе значение - где внутри куска начинаются нужные окнам пиксели
+    """
+    padded_size = size + 2 * PAD
+    lo = max(0, start - BLUR_RADIUS)
+    hi = min(padded_size, stop + 2 * PAD + BLUR_RADIUS)
+    # pad_replicate: i-й пиксель дополненного изображения - clip(i - PAD) исходного
+    return np.clip(np.arange(lo, hi) - PAD, 0, size - 1), start - lo
+
+
+def tile_foreground(gray: np.ndarray, tile: tuple[int, int, int, int]) -> np.ndarray:
+    """dark_foreground дополненного изображения под окна тайла: (h + 2*PAD, w + 2*PAD)"""
+    y0, y1, x0, x1 = tile
+    rows, top = _axis_crop(y0, y1, gray.shape[0])
+    cols, left = _axis_crop(x0, x1, gray.shape[1])
+    # на краю листа кусок кончается там же, где дополненное изображение, и
+    # BORDER_REPLICATE медианы совпадает с тем, что было бы на целом листе
+    crop = np.ascontiguousarray(gray[rows[:, None], cols[None, :]])
+    foreground = dark_foreground(crop)
+    return foreground[top:top + (y1 - y0) + 2 * PAD, left:left + (x1 - x0) + 2 * PAD]
+
+
+def _init_worker(model, gray: np.ndarray, band_pixels: int) -> None:
+    _STATE['model'] = model
+    _STATE['gray'] = gray
+    _STATE['band_pixels'] = band_pixels
+
+
+def _tile_range(tile):
+    foreground = tile_foreground(_STATE['gray'], tile)
+    return float(foreground.min()), float(foreground.max())
+
+
+def _tile_denoise(task):
+    tile, min_val, max_val = task
+    foreground = tile_foreground(_STATE['gray'], tile)
+    features = (foreground - min_val) / (max_val - min_val + EPS)
+    pixels = predict_patches(_STATE['model'], features, _STATE['band_pixels'])
+    return tile, (pixels * 255).astype('uint8')
+
+
+def _run(map_fn, tiles: list, gray: np.ndarray) -> np.ndarray:
+    ranges = list(map_fn(_tile_range, tiles))
+    min_val = min(lo for lo, _ in ranges)
+    max_val = max(hi for _, hi in ranges)
+
+    out = np.empty(gray.shape[:2], dtype=np.uint8)
+    for (y0, y1, x0, x1), pixels in map_fn(_tile_denoise, [(tile, min_val, max_val) for tile in tiles]):
+        out[y0:y1, x0:x1] = pixels
+    return out
+
+
+def denoise_tiled(
+    gray: np.ndarray,
+    model,
+    tile_size: int = DEFAULT_TILE_SIZE,
+    workers: Optional[int] = None,
+    band_pixels: int = BAND_PIXELS,
+) -> np.ndarray:
+    """
+    очищенное изображение uint8 того же размера, что gray (uint8, 2D; можно memmap).
+    workers - процессы пула (по умолчанию все ядра), 1 - без пула в этом процессе.
+    на Linux пул создаётся через fork: модель и изображение не копируются в воркеры,
+    между процессами ходят только координаты тайлов и готовые тайлы
+    """
+    if gray.ndim != 2 or gray.size == 0:
+        raise ValueError(f'ожидается непустое 2D изображение, получено {gray.shape}')
+
+    tiles = tile_grid(gray.shape[0], gray.shape[1], tile_size)
+    workers = min(len(tiles), workers or os.cpu_count() or 1)
+
+    if workers <= 1:
+        _init_worker(model, gray, band_pixels)
+        try:
+            return _run(map, tiles, gray)
+        finally:
+            _STATE.clear()
+
+    methods = mp.get_all_start_methods()
+    ctx = mp.get_context('fork' if 'fork' in methods else None)
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(model, gray, band_pixels)) as pool:
+        return _run(lambda fn, tasks: pool.imap_unordered(fn, tasks), tiles, gray)
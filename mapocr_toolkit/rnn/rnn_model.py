@@ -1,6 +1,6 @@
 from tensorflow import keras
 from keras.models import Sequential
-from keras.layers import LSTM, Dense, Dropout, TimeDistributed
+from keras.layers import LSTM, Dense, Dropout, Embedding, TimeDistributed
 from keras.utils import to_categorical
 import numpy as np
 
@@ -17,6 +17,23 @@ def create_char_level_lstm_model(max_sequence_length, num_chars, num_classes=6):
                   metrics=['accuracy'])
     return model
 
+def create_char_level_embedding_lstm_model(max_sequence_length, num_chars, num_classes=6, embedding_dim=32):
+    # вход - int32 индексы символов (input_mode='index'), 0 - паддинг.
+    # mask_zero: LSTM не шагает по паддингу, выход не зависит от max_sequence_length.
+    # max_sequence_length=None - длина входа любая, для батчей с паддингом по батчу
+    model = Sequential()
+
+    model.add(Embedding(num_chars, embedding_dim, mask_zero=True, input_shape=(max_sequence_length,)))
+    model.add(LSTM(128))
+    model.add(Dense(64, activation='relu'))
+    model.add(Dropout(0.5))
+    model.add(Dense(num_classes, activation='softmax'))
+
+    model.compile(optimizer='adam',
+                  loss='categorical_crossentropy',
+                  metrics=['accuracy'])
+    return model
+
 if __name__ == '__main__':
     example_max_seq_len = 20
     example_num_chars = 35
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from typing import Any, Iterable
+
+import numpy as np
+
+# Разбор global_box целой колонкой за один проход
+
+# разделитель строк в склеенной колонке; \x00 в тексте CSV не встречается
+_ROW_SEP = '\x00'
+_POW10 = 10 ** np.arange(19, dtype=np.int64)
+
+
+def _is_word_byte(b: np.ndarray) -> np.ndarray:
+    lower = b | 0x20
+    return ((lower >= ord('a')) & (lower <= ord('z'))) | (b == ord('_'))
+
+
+def parse_boxes(values: Iterable[Any]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    колонка global_box -> ((N, 4) int64 [x1, y1, x2, y2], маска валидных).
+
+    понимает [[x1, y1], [x2, y2]], [x1, y1, x2, y2], обёртки np.int32(...)
+    и дробные координаты (отбрасывается дробная часть, как int()).
+    строка валидна, если в ней ровно четыре числа и нет экспоненты (1e3 -
+    невалидна, а не 1); невалидные остаются нулями.
+
+    строки разбираются не по одной: вся колонка склеивается через разделитель
+    в один буфер байтов, числа собираются из серий цифр векторно в numpy,
+    а номер строки у числа - по позициям разделителей
+    """
+    values = list(values)
+    n = len(values)
+    boxes = np.zeros((n, 4), dtype=np.int64)
+    valid = np.zeros(n, dtype=bool)
+
+    str_idx = []
+    for i, v in enumerate(values):
+        if isinstance(v, str):
+            str_idx.append(i)
+        elif isinstance(v, (list, tuple, np.ndarray)):
+            # уже разобранные боксы из записей в памяти
+            try:
+                flat = np.asarray(v, dtype=np.float64).ravel()
+            except (TypeError, ValueError):
+                continue
+            if flat.size == 4 and np.isfinite(flat).all():
+                boxes[i] = flat.astype(np.int64)
+                valid[i] = True
+
+    if not str_idx:
+        return boxes, valid
+
+    data = np.frombuffer((_ROW_SEP.join(values[i] for i in str_idx) + _ROW_SEP).encode('utf-8'), dtype=np.uint8)
+
+    # серии цифр: начало, конец и байт перед серией
+    is_digit = (data >= ord('0')) & (data <= ord('9'))
+    before = np.concatenate(([False], is_digit[:-1]))
+    after = np.concatenate((is_digit[1:], [False]))
+    run_start = np.flatnonzero(is_digit & ~before)
+    run_end = np.flatnonzero(is_digit & ~after)
+    prev = np.where(run_start > 0, data[run_start - 1], 0)
+
+    # не координаты: цифры внутри слова (np.int32 -> "32") и дробная часть
+    # после точки (отбрасывается, как int()); минус перед серией - знак
+    is_number = ~_is_word_byte(prev) & (prev != ord('.')) & (run_end - run_start < 18)
+    sign = np.where(prev == ord('-'), -1, 1)
+
+    # значение серии: сумма цифр на степени десяти от конца серии
+    digit_pos = np.flatnonzero(is_digit)
+    run_of_digit = np.cumsum(is_digit & ~before)[digit_pos] - 1
+    exp = np.minimum(run_end[run_of_digit] - digit_pos, 18)
+    weighted = (data[digit_pos].astype(np.int64) - ord('0')) * _POW10[exp]
+    offsets = np.concatenate(([0], np.cumsum(run_end - run_start + 1)[:-1]))
+    run_value = np.add.reduceat(weighted, offsets) * sign if len(digit_pos) else np.zeros(0, np.int64)
+
+    # строка колонки для каждого числа: сколько разделителей стоит до него
+    sep_pos = np.flatnonzero(data == 0)
+    number_row = np.searchsorted(sep_pos, run_start[is_number])
+    numbers = run_value[is_number]
+
+    counts = np.bincount(number_row, minlength=len(str_idx))
+    # серия цифр перед e/E - мантисса экспоненты, строку не угадываем
+    has_exp = (data[run_end + 1] | 0x20) == ord('e')
+    exp_rows = np.zeros(len(str_idx), dtype=bool)
+    exp_rows[np.searchsorted(sep_pos, run_start[has_exp])] = True
+    good = (counts == 4) & ~exp_rows
+
+    str_idx = np.asarray(str_idx)
+    boxes[str_idx[good]] = numbers[good[number_row]].reshape(-1, 4)
+    valid[str_idx[good]] = True
+    return boxes, valid
+
+
+def parse_box(raw: Any) -> tuple[int, int, int, int] | None:
+    """один global_box -> (x1, y1, x2, y2) или None"""
+    boxes, valid = parse_boxes([raw])
+    if not valid[0]:
+        return None
+    x1, y1, x2, y2 = boxes[0].tolist()
+    return x1, y1, x2, y2
@@ -1,57 +1,95 @@
 import numpy as np
-from tensorflow import keras
-from keras.preprocessing.image import load_img, img_to_array
-from keras.utils import to_categorical
 from sklearn.model_selection import train_test_split
-import os
-
-def prepare_cnn_data(data_items, class_to_int_map, target_size=(60, 200), val_split_size=0.35, random_state_value=42):
-
-    images = []
-    raw_class_labels = []
-
-    for img_path, _, str_label in data_items:
-        if not os.path.exists(img_path):
-            print(f"[WARNING] Image file not found: {img_path}")
-            continue
-        try:
-            img = load_img(img_path, target_size=target_size)
-            
-            img_array = img_to_array(img)
-            
-            img_array = img_array / 255.0
-            
-            images.append(img_array)
-            raw_class_labels.append(str_label)
-        except Exception as e:
-            print(f"[ERROR] Could not load or process image {img_path}: {e}")
-            continue
-    
-    if not images:
+
+from mapocr_toolkit.utils.crop_cache import DEFAULT_CACHE_DIR, load_crops
+
+# картинки хранятся в uint8, деление на 255 делает слой Rescaling внутри модели.
+# флаг пишется в processing_info, чтобы инференс знал, что подавать в модель
+RESCALE_IN_MODEL_KEY = 'rescale_in_model'
+
+
+def split_loaded(loaded, val_split_size=0.35, random_state_value=42):
+    """
+    номера data_items в train и val: делятся только прочитанные кропы, поэтому
+    один нечитаемый файл сдвигает всё разбиение относительно split_data_items
+    """
+    # делим индексы, а не массив: разбиение то же, что у train_test_split по картинкам
+    # (оно зависит только от числа примеров), а из кэша читается по одной копии uint8 на сплит
+    row_idx = np.flatnonzero(loaded)
+    train_pos, val_pos = train_test_split(np.arange(len(row_idx)),
+                                          test_size=val_split_size,
+                                          random_state=random_state_value,
+                                          ) # была стратификация
+    return row_idx[train_pos], row_idx[val_pos]
+
+
+def split_cnn_items(data_items, target_size=(60, 200), val_split_size=0.35, random_state_value=42,
+                    cache_dir=DEFAULT_CACHE_DIR):
+    """
+    (train_items, val_items) ровно как у prepare_cnn_data - для скриптов, которым
+    нужен настоящий val сет CNN без самих кропов (ensemble_eval --server,
+    quantize_models, export_fused_ensemble). с cache_dir повторный запуск
+    не декодирует кропы, а открывает кэш prepare_cnn_data
+    """
+    paths = [img_path for img_path, _, _ in data_items]
+    _, loaded = load_crops(paths, target_size=target_size, cache_dir=cache_dir)
+    if not loaded.any():
+        return [], []
+    train_rows, val_rows = split_loaded(loaded, val_split_size, random_state_value)
+    return [data_items[i] for i in train_rows], [data_items[i] for i in val_rows]
+
+
+def prepare_cnn_data(data_items, class_to_int_map, target_size=(60, 200), val_split_size=0.35, random_state_value=42,
+                     cache_dir=DEFAULT_CACHE_DIR):
+
+    # декодирование в потоках сразу в общий массив, при повторном запуске - memmap из кэша
+    paths = [img_path for img_path, _, _ in data_items]
+    crops, loaded = load_crops(paths, target_size=target_size, cache_dir=cache_dir)
+
+    if not loaded.any():
         empty_np_array = np.array([])
         return (empty_np_array, empty_np_array), (empty_np_array, empty_np_array), None
 
-    x_images_np = np.array(images)
-    
+    raw_class_labels = [item[2] for item, ok in zip(data_items, loaded) if ok]
+
     int_class_labels = [class_to_int_map[label] for label in raw_class_labels]
     
     num_classes_overall = len(class_to_int_map)
-    y_one_hot_labels = to_categorical(np.array(int_class_labels), num_classes=num_classes_overall)
+    # one-hot без keras: модуль нужен и клиенту сервера ансамбля, где TF не грузится
+    y_one_hot_labels = np.eye(num_classes_overall, dtype=np.float32)[np.array(int_class_labels)]
+
+    train_rows, val_rows = split_loaded(loaded, val_split_size, random_state_value)
+    x_train = np.asarray(crops[train_rows], dtype=np.uint8)
+    x_val = np.asarray(crops[val_rows], dtype=np.uint8)
+    # y_one_hot_labels - только по прочитанным: номер строки среди прочитанных
+    position = np.cumsum(loaded) - 1
+    y_train, y_val = y_one_hot_labels[position[train_rows]], y_one_hot_labels[position[val_rows]]
 
+    processing_info = cnn_processing_info(class_to_int_map, target_size)
+    
+    return (x_train, y_train), (x_val, y_val), processing_info
 
-    x_train, x_val, y_train, y_val = train_test_split(x_images_np, 
-                                                      y_one_hot_labels, 
-                                                      test_size=val_split_size, 
-                                                      random_state=random_state_value,
-                                                      ) # была стратификация
 
-    processing_info = {
+def cnn_processing_info(class_to_int_map, target_size=(60, 200)):
+    return {
         'target_size': target_size,
         'class_to_int_map': class_to_int_map,
-        'int_to_class_map': {int_label: str_label for str_label, int_label in class_to_int_map.items()}
+        'int_to_class_map': {int_label: str_label for str_label, int_label in class_to_int_map.items()},
+        'input_dtype': 'uint8',
+        RESCALE_IN_MODEL_KEY: True,
     }
-    
-    return (x_train, y_train), (x_val, y_val), processing_info
+
+
+def to_model_input(x, processing_info):
+    """
+    кропы uint8 в тот вид, который ждёт модель: как есть для моделей
+    с Rescaling внутри, float32 / 255 для моделей, обученных до этого
+    """
+    if processing_info and processing_info.get(RESCALE_IN_MODEL_KEY):
+        return x
+    x = np.asarray(x, dtype=np.float32)
+    return x / 255.0
+
 
 if __name__ == '__main__':
-    pass
\ No newline at end of file
+    pass
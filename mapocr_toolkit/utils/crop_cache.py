@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import glob
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Sequence
+
+import numpy as np
+from PIL import Image
+
+# Параллельное декодирование кропов и кэш декодированного тензора на диске
+
+DEFAULT_CACHE_DIR = os.path.join('data', '.crop_cache')
+# предел кэша на диске: train, eval, сервер и калибровка держат свои наборы кропов
+# одного размера рядом, при переполнении уходят давно не читанные (LRU по mtime)
+DEFAULT_MAX_MB = 4096
+
+# PIL отпускает GIL на декодировании JPEG и resize, потоков можно больше ядер
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 4) * 2)
+# сколько кропов декодирует одна задача пула
+CHUNK_SIZE = 64
+
+
+def decode_crop(source, target_size=(60, 200)) -> np.ndarray:
+    """путь или файловый объект -> (h, w, 3) uint8; как keras load_img(target_size=...): RGB и resize NEAREST"""
+    height, width = target_size
+    with Image.open(source) as img:
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        if img.size != (width, height):
+            img = img.resize((width, height), Image.NEAREST)
+        return np.asarray(img)
+
+
+def _decode_into(out: np.ndarray, ok: np.ndarray, paths: Sequence[str], start: int, target_size) -> None:
+    for i in range(start, min(start + CHUNK_SIZE, len(paths))):
+        try:
+            out[i] = decode_crop(paths[i], target_size)
+            ok[i] = True
+        except Exception as e:
+            print(f"[ERROR] Could not load or process image {paths[i]}: {e}")
+
+
+def cache_key(paths: Sequence[str], target_size) -> str:
+    """хэш от путей, их mtime и размера: любой изменённый кроп даёт новый кэш"""
+    h = hashlib.blake2b(digest_size=12)
+    h.update(repr(tuple(target_size)).encode('utf-8'))
+    for path in paths:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = -1
+        h.update(f'{path}\0{mtime}\n'.encode('utf-8'))
+    return h.hexdigest()
+
+
+def _evict(cache_dir: str, max_bytes: float, keep: str) -> None:
+    """удаляет давно не читанные кэши, пока все вместе не влезут в max_bytes; keep не трогается"""
+    entries = []
+    for mask_path in glob.glob(os.path.join(glob.escape(cache_dir), 'crops_*.ok.npy')):
+        data_path = mask_path[:-len('.ok.npy')] + '.npy'
+        try:
+            size = os.path.getsize(mask_path) + os.path.getsize(data_path)
+            entries.append((os.path.getmtime(data_path), size, data_path, mask_path))
+        except OSError:
+            continue
+
+    total = sum(size for _, size, _, _ in entries)
+    for _, size, data_path, mask_path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if data_path == keep:
+            continue
+        for path in (data_path, mask_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        total -= size
+
+
+def load_crops(
+    paths: Sequence[str],
+    target_size=(60, 200),
+    cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+    workers: int = DEFAULT_WORKERS,
+    max_mb: float = DEFAULT_MAX_MB,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    кропы (N, h, w, 3) uint8 и маска успешно прочитанных.
+
+    декодирование идёт пулом потоков сразу в заранее выделенный массив -
+    без списка массивов и копии через np.array. с cache_dir массив пишется
+    в .npy и при следующем запуске с теми же файлами открывается как memmap
+    без декодирования. кэши других наборов кропов остаются, пока папка
+    не превысит max_mb
+    """
+    paths = list(paths)
+    height, width = target_size
+    shape = (len(paths), height, width, 3)
+    if not paths:
+        return np.zeros(shape, dtype=np.uint8), np.zeros(0, dtype=bool)
+
+    cache_path = None
+    if cache_dir:
+        prefix = os.path.join(cache_dir, f'crops_{height}x{width}_')
+        cache_path = prefix + cache_key(paths, target_size) + '.npy'
+        mask_path = cache_path[:-4] + '.ok.npy'
+
+        if os.path.exists(cache_path) and os.path.exists(mask_path):
+            os.utime(cache_path)  # отметка для LRU
+            return np.load(cache_path, mmap_mode='r'), np.load(mask_path)
+
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = cache_path + '.part'
+        out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8, shape=shape)
+    else:
+        out = np.zeros(shape, dtype=np.uint8)
+
+    ok = np.zeros(len(paths), dtype=bool)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        list(pool.map(lambda start: _decode_into(out, ok, paths, start, target_size),
+                      range(0, len(paths), CHUNK_SIZE)))
+
+    if cache_path is None:
+        return out, ok
+
+    out.flush()
+    del out
+    np.save(mask_path, ok)
+    os.replace(tmp_path, cache_path)
+
+    _evict(cache_dir, max_mb * 2**20, keep=cache_path)
+
+    return np.load(cache_path, mmap_mode='r'), ok
@@ -1,8 +1,10 @@
 import os
 from typing import List, Set, Tuple
 
-import pandas as pd
+import numpy as np
+from sklearn.model_selection import train_test_split
 
+from mapocr_toolkit.utils.dataset_io import read_dataset, sibling_parquet
 
 DEFAULT_LABELS_FILE_PATH = os.path.join('data', 'dataset_CLEANED.csv')
 RAW_IMAGES_DIR = os.path.join('data', 'dataset_crops_paddle')
@@ -17,33 +19,23 @@ def _resolve_labels_path() -> str:
     1) переменная окружения MAPOCR_LABELS_PATH
     2) data/dataset_CLEANED_v2_labeled.csv (новый формат после ручной разметки)
     3) data/dataset_CLEANED.csv (legacy)
+
+    Для 2-3 Parquet-версия рядом с CSV (тот же stem, .parquet) читается вместо него,
+    если она не старше CSV.
     """
     env_path = os.environ.get('MAPOCR_LABELS_PATH')
     if env_path:
         return env_path
 
-    v2_labeled = os.path.join('data', 'dataset_CLEANED_v2_labeled.csv')
+    v2_labeled = sibling_parquet(os.path.join('data', 'dataset_CLEANED_v2_labeled.csv'))
     if os.path.exists(v2_labeled):
         return v2_labeled
 
-    labeled = os.path.join('data', 'dataset_LABELED.csv')
+    labeled = sibling_parquet(os.path.join('data', 'dataset_LABELED.csv'))
     if os.path.exists(labeled):
         return labeled
 
-    return DEFAULT_LABELS_FILE_PATH
-
-
-def _read_dataset_csv(csv_path: str) -> pd.DataFrame:
-    """Читает CSV с поддержкой `;` и `,`, а также BOM."""
-    for sep in (';', ','):
-        try:
-            df = pd.read_csv(csv_path, sep=sep, encoding='utf-8-sig')
-            if len(df.columns) > 1:
-                return df
-        except Exception:
-            continue
-
-    raise ValueError(f'Не удалось прочитать CSV файл: {csv_path}')
+    return sibling_parquet(DEFAULT_LABELS_FILE_PATH)
 
 
 def load_raw_data_paths_and_labels() -> Tuple[List[Tuple[str, str, str]], Set[str]]:
@@ -57,12 +49,15 @@ def load_raw_data_paths_and_labels() -> Tuple[List[Tuple[str, str, str]], Set[st
         return [], class_labels_set
 
     try:
-        df = _read_dataset_csv(labels_file_path)
+        df = read_dataset(labels_file_path, columns=['filename', 'label', 'ocr_text'])
 
         if not REQUIRED_COLUMNS.issubset(df.columns):
             print('[ERROR] В CSV нет нужных колонок (filename, label, ocr_text)')
             return [], class_labels_set
 
+        # один listdir вместо os.path.exists на каждую строку
+        existing = set(os.listdir(RAW_IMAGES_DIR)) if os.path.isdir(RAW_IMAGES_DIR) else set()
+
         for _, row in df.iterrows():
             filename = str(row['filename']).strip()
             ocr_text = str(row['ocr_text'])
@@ -80,7 +75,7 @@ def load_raw_data_paths_and_labels() -> Tuple[List[Tuple[str, str, str]], Set[st
 
             image_full_path = os.path.join(RAW_IMAGES_DIR, filename)
 
-            if os.path.exists(image_full_path):
+            if filename in existing or (os.sep in filename and os.path.exists(image_full_path)):
                 data_items.append((image_full_path, ocr_text, label))
                 class_labels_set.add(label)
             else:
@@ -103,3 +98,16 @@ def create_class_maps(class_labels_set: Set[str]):
         int_to_class_map[i] = label
 
     return class_to_int_map, int_to_class_map
+
+
+def split_data_items(data_items, val_split_size=0.35, random_state_value=42):
+    """
+    train/val по всему списку data_items - то же разбиение, что у prepare_rnn_data
+    (train_test_split зависит только от числа примеров). у prepare_cnn_data оно
+    совпадает, только если прочитались все кропы: CNN делит лишь прочитанные,
+    её настоящий val сет - cnn_preprocessor.split_cnn_items
+    """
+    train_pos, val_pos = train_test_split(np.arange(len(data_items)),
+                                          test_size=val_split_size,
+                                          random_state=random_state_value)
+    return [data_items[i] for i in train_pos], [data_items[i] for i in val_pos]
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import os
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from mapocr_toolkit.utils.boxes import parse_boxes
+# Чтение и запись датасета фрагментов: типизированный Parquet и CSV для экспорта
+
+# в Parquet бокс хранится целочисленными колонками вместо строки global_box
+BOX_COLUMNS = ['x1', 'y1', 'x2', 'y2']
+CATEGORY_COLUMNS = ['label', 'source_map']
+
+CSV_SEP = ';'
+CSV_ENCODING = 'utf-8-sig'  # utf-8-sig чтобы Excel открыл нормально
+
+# фильтры в стиле pyarrow: [('source_map', '==', 'a.tif'), ('confidence', '>=', 0.8)]
+_FILTER_OPS = {
+    '==': lambda s, v: s == v,
+    '=': lambda s, v: s == v,
+    '!=': lambda s, v: s != v,
+    '>': lambda s, v: s > v,
+    '>=': lambda s, v: s >= v,
+    '<': lambda s, v: s < v,
+    '<=': lambda s, v: s <= v,
+    'in': lambda s, v: s.isin(list(v)),
+    'not in': lambda s, v: ~s.isin(list(v)),
+}
+
+
+def is_parquet(path) -> bool:
+    return str(path).lower().endswith(('.parquet', '.pq'))
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError('Для Parquet нужен pyarrow: pip install pyarrow (или сохраняйте в .csv)') from e
+
+
+def _read_csv(path) -> pd.DataFrame:
+    """CSV с `;` или `,`, с BOM или без"""
+    for sep in (CSV_SEP, ','):
+        try:
+            df = pd.read_csv(path, sep=sep, encoding=CSV_ENCODING)
+            if len(df.columns) > 1:
+                return df
+        except Exception:
+            continue
+    raise ValueError(f'Не удалось прочитать CSV файл: {path}')
+
+
+def _apply_filters(df: pd.DataFrame, filters) -> pd.DataFrame:
+    mask = np.ones(len(df), dtype=bool)
+    for column, op, value in filters:
+        if op not in _FILTER_OPS:
+            raise ValueError(f'Неизвестная операция фильтра: {op!r}')
+        mask &= _FILTER_OPS[op](df[column], value).to_numpy(dtype=bool, na_value=False)
+    return df[mask].reset_index(drop=True)
+
+
+def box_array(df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (N, 4) int64 боксов и маска валидных: из колонок x1..y2, если они есть,
+    иначе разбором строк global_box
+    """
+    if set(BOX_COLUMNS).issubset(df.columns):
+        raw = df[BOX_COLUMNS]
+        valid = raw.notna().all(axis=1).to_numpy()
+        return raw.fillna(0).to_numpy(dtype=np.int64), valid
+
+    if 'global_box' not in df.columns:
+        return np.zeros((len(df), 4), dtype=np.int64), np.zeros(len(df), dtype=bool)
+    return parse_boxes(df['global_box'])
+
+
+def to_typed(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    типизированная таблица: x1..y2 (Int32, пусто для невалидного бокса) вместо
+    global_box, float32 confidence, категориальные label и source_map
+    """
+    df = df.copy()
+
+    if 'global_box' in df.columns or set(BOX_COLUMNS).issubset(df.columns):
+        boxes, valid = box_array(df)
+        for i, col in enumerate(BOX_COLUMNS):
+            values = pd.array(boxes[:, i], dtype='Int32')
+            values[~valid] = pd.NA
+            df[col] = values
+        df = df.drop(columns=['global_box'], errors='ignore')
+
+    if 'confidence' in df.columns:
+        df['confidence'] = pd.to_numeric(df['confidence'], errors='coerce').astype('float32')
+
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+
+    return df
+
+
+def to_export(df: pd.DataFrame) -> pd.DataFrame:
+    """обратно к виду старых CSV: строка global_box [[x1, y1], [x2, y2]] вместо x1..y2"""
+    if not set(BOX_COLUMNS).issubset(df.columns):
+        return df
+
+    df = df.copy()
+    boxes, valid = box_array(df)
+    df.insert(df.columns.get_loc('x1'), 'global_box', [
+        f'[[{b[0]}, {b[1]}], [{b[2]}, {b[3]}]]' if ok else ''
+        for b, ok in zip(boxes.tolist(), valid)
+    ])
+    return df.drop(columns=BOX_COLUMNS)
+
+
+def read_dataset(
+    path,
+    columns: Optional[Iterable[str]] = None,
+    filters: Optional[list[tuple]] = None,
+    categorical: bool = True,
+) -> pd.DataFrame:
+    """
+    читает датасет фрагментов по расширению файла.
+
+    Parquet читается колонками без разбора строк, filters уходят в pyarrow
+    (читаются только подходящие row group). CSV разбирается как раньше,
+    фильтры применяются после чтения.
+
+    categorical=False возвращает label/source_map обычными строками - нужно
+    скриптам, которые дописывают новые значения (разметка)
+    """
+    columns = list(columns) if columns is not None else None
+
+    if is_parquet(path):
+        _require_pyarrow()
+        df = pd.read_parquet(path, columns=columns, filters=filters or None)
+    else:
+        df = _read_csv(path)
+        if filters:
+            df = _apply_filters(df, filters)
+        if columns is not None:
+            df = df[[c for c in columns if c in df.columns]]
+
+    if not categorical:
+        for col in CATEGORY_COLUMNS:
+            if col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype(object)
+
+    return df
+
+
+def write_dataset(df: pd.DataFrame, path) -> None:
+    """Parquet - типизированная таблица, CSV - экспорт в прежнем формате (`;`, utf-8-sig)"""
+    os.makedirs(os.path.dirname(str(path)) or '.', exist_ok=True)
+
+    if is_parquet(path):
+        _require_pyarrow()
+        to_typed(df).to_parquet(path, index=False)
+    else:
+        to_export(df).to_csv(path, index=False, sep=CSV_SEP, encoding=CSV_ENCODING)
+
+
+def sibling_parquet(path: str) -> str:
+    """
+    путь к Parquet-версии CSV, если она лежит рядом и не старше CSV, иначе сам path.
+    CSV, пересобранный без --parquet, новее забытой копии - тогда читается CSV
+    """
+    stem, ext = os.path.splitext(path)
+    candidate = stem + '.parquet'
+    if ext.lower() != '.csv' or not os.path.exists(candidate):
+        return path
+    if os.path.exists(path) and os.path.getmtime(candidate) < os.path.getmtime(path):
+        print(f'[WARNING] {candidate} старше {path}, читается CSV')
+        return path
+    return candidate
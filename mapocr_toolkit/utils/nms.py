@@ -1,35 +1,15 @@
 from __future__ import annotations
 
-import ast
-import re
-from typing import Any
+import numpy as np
 
-# Non-Maximum Suppression для устранения дублей боксов
-
-def _parse_box(raw: Any) -> tuple[int, int, int, int] | None:
-    try:
-        # если уже список, работаем напрямую
-        if isinstance(raw, (list, tuple)):
-            p1, p2 = raw[0], raw[1]
-            return int(p1[0]), int(p1[1]), int(p2[0]), int(p2[1])
-
-        if isinstance(raw, str):
-            # убираем артефакты numpy с np.int32(123) в 123
-            cleaned = re.sub(r'np\.\w+\((-?\d+)\)', r'\1', raw)
-            parsed = ast.literal_eval(cleaned)
-            p1, p2 = parsed[0], parsed[1]
-            return int(p1[0]), int(p1[1]), int(p2[0]), int(p2[1])
-
-    except Exception:
-        pass
-
-    return None
+from mapocr_toolkit.utils.boxes import parse_box, parse_boxes
 
+# Non-Maximum Suppression для устранения дублей боксов
 
 def _iou(a: tuple, b: tuple) -> float:
 
     # считает intersection over union
-    
+
     ax1, ay1, ax2, ay2 = a
     bx1, by1, bx2, by2 = b
 
@@ -54,22 +34,46 @@ def _iou(a: tuple, b: tuple) -> float:
     return intersection / union if union > 0 else 0.0
 
 
-def nms_filter(
-    records: list[dict],
-    iou_threshold: float = 0.5,
-) -> list[dict]:
+def _boxes_array(records: list[dict]) -> tuple[np.ndarray, np.ndarray]:
     """
-    1. сортируем боксы по убыванию confidence и лучшие первые
-    2. берём лучший бокс и добавляем в результат
-    3. все боксы у которых IoU с лучшим > iou_threshold, то удаляем как дубли
-    4. повторяем с оставшимися
+    парсим global_box всех записей один раз в массив (N, 4) int32
+    невалидные боксы остаются нулями и помечаются в маске valid
     """
-    if not records:
-        return []
+    boxes, valid = parse_boxes([r.get('global_box') for r in records])
+    return boxes.astype(np.int32), valid
+
+
+def _confidence_order(records: list[dict]) -> np.ndarray:
+    # стабильная сортировка по убыванию confidence, как sorted(..., reverse=True)
+    conf = np.array([float(r.get('confidence', 0.0)) for r in records], dtype=np.float64)
+    return np.argsort(-conf, kind='stable')
+
+
+def _iou_one_to_many(box: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """IoU одного бокса (4,) со всеми боксами (M, 4) за одну операцию"""
+    # int64, чтобы площади больших боксов на карте не переполняли int32
+    box = box.astype(np.int64)
+    others = others.astype(np.int64)
+
+    iw = np.clip(np.minimum(box[2], others[:, 2]) - np.maximum(box[0], others[:, 0]), 0, None)
+    ih = np.clip(np.minimum(box[3], others[:, 3]) - np.maximum(box[1], others[:, 1]), 0, None)
+    intersection = iw * ih
+
+    area_a = max(0, box[2] - box[0]) * max(0, box[3] - box[1])
+    area_b = (np.clip(others[:, 2] - others[:, 0], 0, None)
+              * np.clip(others[:, 3] - others[:, 1], 0, None))
+    union = area_a + area_b - intersection
+
+    iou = np.zeros(len(others), dtype=np.float64)
+    mask = (intersection > 0) & (union > 0)
+    iou[mask] = intersection[mask] / union[mask]
+    return iou
 
-    boxes = [_parse_box(r.get('global_box')) for r in records]
 
-    # сортируем индексы по убыванию confidence
+def _nms_python(records: list[dict], iou_threshold: float) -> list[int]:
+    # исходный попарный вариант, оставлен как эталон для тестов и бенчмарка
+    boxes = [parse_box(r.get('global_box')) for r in records]
+
     order = sorted(
         range(len(records)),
         key=lambda i: float(records[i].get('confidence', 0.0)),
@@ -84,7 +88,6 @@ def nms_filter(
         if boxes[best] is None:
             continue
 
-        # убираем все оставшиеся боксы которые сильно перекрываются с лучшим вариантом
         surviving = []
         for idx in order:
             if boxes[idx] is None:
@@ -94,4 +97,135 @@ def nms_filter(
                 surviving.append(idx)
         order = surviving
 
-    return [records[i] for i in kept]
\ No newline at end of file
+    return kept
+
+
+def _nms_vectorized(records: list[dict], iou_threshold: float) -> list[int]:
+    boxes, valid = _boxes_array(records)
+    order = _confidence_order(records)
+
+    kept = []
+    while order.size:
+        best = order[0]
+        kept.append(int(best))
+        rest = order[1:]
+
+        if not valid[best]:
+            order = rest
+            continue
+
+        # IoU лучшего бокса сразу со всеми оставшимися
+        iou = _iou_one_to_many(boxes[best], boxes[rest])
+        order = rest[(iou <= iou_threshold) | ~valid[rest]]
+
+    return kept
+
+
+def _nms_grid(records: list[dict], iou_threshold: float) -> list[int]:
+    """
+    тот же жадный NMS, но кандидаты ищутся через равномерную сетку:
+    размер ячейки = медианный бокс, каждый бокс лежит во всех ячейках,
+    которые он накрывает, и сравнивается только с соседями по этим ячейкам
+    """
+    # при отрицательном пороге дублями считаются и непересекающиеся боксы,
+    # сетка тут не поможет
+    if iou_threshold < 0:
+        return _nms_vectorized(records, iou_threshold)
+
+    boxes, valid = _boxes_array(records)
+    order = _confidence_order(records)
+    n = len(records)
+
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+
+    b = boxes.astype(np.int64)
+    w = b[:, 2] - b[:, 0]
+    h = b[:, 3] - b[:, 1]
+
+    # IoU > 0 возможен только у боксов с ненулевой площадью
+    indexed = np.flatnonzero(valid & (w > 0) & (h > 0))
+    if indexed.size == 0:
+        return order.tolist()
+
+    cell_w = max(1, int(np.median(w[indexed])))
+    cell_h = max(1, int(np.median(h[indexed])))
+
+    # пересекающиеся боксы имеют общий пиксель, а значит и общую ячейку
+    bi = b[indexed]
+    gx0, gx1 = bi[:, 0] // cell_w, (bi[:, 2] - 1) // cell_w
+    gy0, gy1 = bi[:, 1] // cell_h, (bi[:, 3] - 1) // cell_h
+    nx = gx1 - gx0 + 1
+    counts = nx * (gy1 - gy0 + 1)
+    box_start = np.cumsum(counts) - counts
+
+    # разворачиваем каждый бокс в список его ячеек
+    owner = np.repeat(np.arange(indexed.size), counts)
+    local = np.arange(counts.sum()) - np.repeat(box_start, counts)
+    cx = gx0[owner] + local % nx[owner] - gx0.min()
+    cy = gy0[owner] + local // nx[owner] - gy0.min()
+    cell_keys = cy * (gx1.max() - gx0.min() + 1) + cx
+
+    # ячейка -> отрезок в отсортированном массиве участников
+    by_cell = np.argsort(cell_keys, kind='stable')
+    members = indexed[owner[by_cell]]
+    uniq_keys, starts = np.unique(cell_keys[by_cell], return_index=True)
+    ends = np.append(starts[1:], members.size)
+
+    owner_of = np.full(n, -1, dtype=np.int64)
+    owner_of[indexed] = np.arange(indexed.size)
+
+    suppressed = np.zeros(n, dtype=bool)
+    for best in order:
+        if suppressed[best] or owner_of[best] < 0:
+            continue
+
+        o = owner_of[best]
+        keys = cell_keys[box_start[o]:box_start[o] + counts[o]]
+        pos = np.searchsorted(uniq_keys, keys)
+        cand = np.concatenate([members[starts[p]:ends[p]] for p in pos])
+
+        # только боксы ниже по confidence, которые ещё не выкинуты
+        cand = cand[(rank[cand] > rank[best]) & ~suppressed[cand]]
+        if cand.size == 0:
+            continue
+
+        iou = _iou_one_to_many(boxes[best], boxes[cand])
+        suppressed[cand[iou > iou_threshold]] = True
+
+    return [int(i) for i in order if not suppressed[i]]
+
+
+NMS_METHODS = {
+    'python': _nms_python,
+    'vectorized': _nms_vectorized,
+    'grid': _nms_grid,
+}
+
+
+def nms_filter(
+    records: list[dict],
+    iou_threshold: float = 0.5,
+    method: str = 'vectorized',
+) -> list[dict]:
+    """
+    1. сортируем боксы по убыванию confidence и лучшие первые
+    2. берём лучший бокс и добавляем в результат
+    3. все боксы у которых IoU с лучшим > iou_threshold, то удаляем как дубли
+    4. повторяем с оставшимися
+
+    method:
+      'vectorized' - IoU лучшего бокса векторно против всех оставшихся
+      'grid'       - сравнение только с соседями по ячейкам сетки, для целых листов
+      'python'     - исходный попарный цикл
+    результат у всех методов одинаковый
+    """
+    if method not in NMS_METHODS:
+        raise ValueError(f'Неизвестный метод NMS: {method!r}. '
+                         f'Доступны: {sorted(NMS_METHODS)}')
+
+    if not records:
+        return []
+
+    kept = NMS_METHODS[method](records, iou_threshold)
+    return [records[i] for i in kept]
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Optional
+
+import numpy as np
+
+# Кэш сырых ответов OCR по содержимому окна: SQLite с вытеснением по LRU
+
+DEFAULT_CACHE_PATH = os.path.join('data', '.ocr_cache.sqlite')
+DEFAULT_MAX_MB = 512
+
+# при переполнении чистим с запасом, чтобы не вытеснять на каждой записи
+EVICT_TO = 0.9
+
+
+def window_key(pixels: np.ndarray, ocr_config: dict) -> bytes:
+    """blake2b от пикселей окна и настроек движка: те же пиксели с другим OCR - другой ключ"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps(ocr_config, sort_keys=True).encode('utf-8'))
+    h.update(str((pixels.shape, pixels.dtype.str)).encode('utf-8'))
+    h.update(np.ascontiguousarray(pixels).data)
+    return h.digest()
+
+
+class OcrCache:
+    """
+    ответы движка (boxes, texts, scores) по ключу window_key. постфильтры
+    (порог уверенности, отступы, длина текста) применяются уже после кэша,
+    поэтому при их смене прогон идёт без OCR.
+
+    размер ограничен max_mb: при переполнении удаляются записи, к которым
+    дольше всего не обращались
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_mb: float = DEFAULT_MAX_MB):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # кэш можно потерять без вреда, fsync на каждую запись не нужен
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS ocr_cache ('
+            ' key BLOB PRIMARY KEY, value BLOB NOT NULL,'
+            ' size INTEGER NOT NULL, last_used REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS ocr_cache_last_used ON ocr_cache (last_used)')
+        self._total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM ocr_cache').fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    @property
+    def size_bytes(self) -> int:
+        return self._total
+
+    def get(self, key: bytes, touch: bool = True) -> Optional[tuple[list, list, list]]:
+        """
+        touch=False - только чтение, без счётчиков и отметки LRU: так ищут воркеры
+        slice_paddle, а попадание отмечает процесс-владелец через record_lookup
+        """
+        row = self._conn.execute('SELECT value FROM ocr_cache WHERE key = ?', (key,)).fetchone()
+        if touch:
+            self.record_lookup(key, row is not None)
+        if row is None:
+            return None
+        boxes, texts, scores = json.loads(row[0])
+        return boxes, texts, scores
+
+    def record_lookup(self, key: bytes, hit: bool) -> None:
+        """учёт поиска, сделанного в другом процессе: счётчики и last_used для LRU"""
+        if not hit:
+            self.misses += 1
+            return
+        self.hits += 1
+        self._conn.execute('UPDATE ocr_cache SET last_used = ? WHERE key = ?', (time.time(), key))
+
+    def put(self, key: bytes, value: tuple[list, list, list]) -> None:
+        blob = json.dumps(list(value), ensure_ascii=False).encode('utf-8')
+        old = self._conn.execute('SELECT size FROM ocr_cache WHERE key = ?', (key,)).fetchone()
+        self._conn.execute(
+            'INSERT OR REPLACE INTO ocr_cache (key, value, size, last_used) VALUES (?, ?, ?, ?)',
+            (key, blob, len(blob), time.time()),
+        )
+        self._total += len(blob) - (old[0] if old else 0)
+
+        if self._total > self.max_bytes:
+            self._evict()
+
+    def _evict(self) -> None:
+        target = self.max_bytes * EVICT_TO
+        freed = 0
+        victims = []
+        for key, size in self._conn.execute('SELECT key, size FROM ocr_cache ORDER BY last_used'):
+            if self._total - freed <= target:
+                break
+            victims.append((key,))
+            freed += size
+
+        self._conn.executemany('DELETE FROM ocr_cache WHERE key = ?', victims)
+        self._total -= freed
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import glob
+import os
+from typing import Callable, Iterable, Optional, Sequence
+
+import numpy as np
+import tensorflow as tf
+
+from mapocr_toolkit.utils.crop_cache import load_crops
+
+# Post-training квантование в TFLite для CPU-машин разметки.
+# int8 - веса и активации int8, диапазоны активаций калибруются на реальных кропах;
+# dynamic - int8 только веса, активации float: для LSTM, у которой полный int8
+# в TFLite либо не собирается, либо заметно теряет точность на коротких строках
+
+QUANT_MODES = ('int8', 'dynamic')
+CALIBRATION_SIZE = 300
+CROP_EXTENSIONS = ('*.png', '*.jpg', '*.jpeg')
+
+
+def calibration_paths(crops_dir: str, limit: int = CALIBRATION_SIZE, seed: int = 42) -> list[str]:
+    """случайная выборка файлов кропов (по умолчанию data/dataset_crops_paddle)"""
+    paths = sorted(p for pattern in CROP_EXTENSIONS for p in glob.glob(os.path.join(crops_dir, pattern)))
+    if len(paths) > limit:
+        rng = np.random.default_rng(seed)
+        paths = [paths[i] for i in np.sort(rng.choice(len(paths), limit, replace=False))]
+    return paths
+
+
+def calibration_crops(paths: Sequence[str], target_size=(60, 200)) -> np.ndarray:
+    """uint8 (N, h, w, 3) только из прочитанных кропов"""
+    crops, ok = load_crops(paths, target_size, cache_dir=None)
+    return np.asarray(crops)[ok]
+
+
+def convert_to_tflite(
+    model,
+    input_shape: tuple,
+    mode: str = 'int8',
+    representative: Optional[Callable[[], Iterable[np.ndarray]]] = None,
+    input_dtype=tf.float32,
+) -> bytes:
+    """
+    модель -> байты .tflite. input_shape без батча; вход подаётся через
+    конкретную функцию с фиксированной длиной - LSTM без неё не сворачивается
+    в UnidirectionalSequenceLSTM.
+
+    int8 требует representative: функцию, отдающую батчи входа модели.
+    float-вход (кропы 0..255 или 0..1) становится uint8 с scale / zero_point
+    из калибровки, выход остаётся float32
+    """
+    if mode not in QUANT_MODES:
+        raise ValueError(f'неизвестный режим {mode!r}, доступны: {QUANT_MODES}')
+
+    signature = tf.TensorSpec((None,) + tuple(input_shape), input_dtype, name='input')
+    concrete = tf.function(lambda x: model(x, training=False), input_signature=[signature]).get_concrete_function()
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([concrete], model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if mode == 'int8':
+        if representative is None:
+            raise ValueError('для int8 нужны калибровочные данные (representative)')
+        dtype = input_dtype.as_numpy_dtype
+        converter.representative_dataset = lambda: ([np.asarray(batch, dtype=dtype)] for batch in representative())
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        if input_dtype.is_floating:
+            converter.inference_input_type = tf.uint8
+
+    try:
+        return converter.convert()
+    except Exception as e:
+        if mode != 'int8':
+            raise
+        # например, LSTM в CRNN: операции без int8-ядер остаются float, остальное int8
+        print(f'[WARNING] полный int8 не собрался ({type(e).__name__}), '
+              f'операции без int8-ядер останутся float')
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8, tf.lite.OpsSet.TFLITE_BUILTINS]
+        return converter.convert()
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import math
+from typing import Optional
+
+import numpy as np
+from tensorflow import keras
+
+# Батчи RNN по длине: последовательности похожей длины идут вместе,
+# паддинг - до самой длинной в батче, а не до максимума по датасету
+
+# длина батча округляется вверх до кратной PAD_MULTIPLE - меньше разных форм,
+# меньше перетрассировок графа
+PAD_MULTIPLE = 8
+
+# перемешанный датасет режется на куски по SORT_CHUNK батчей, сортировка по длине
+# внутри куска: батчи почти однородны по длине, но их состав меняется каждую эпоху
+SORT_CHUNK = 50
+
+
+def sequence_lengths(x: np.ndarray) -> np.ndarray:
+    """длина каждой строки (N, L) индексов: позиция последнего ненулевого + 1"""
+    nonzero = np.asarray(x) != 0
+    if nonzero.shape[1] == 0:
+        return np.zeros(len(nonzero), dtype=np.int64)
+    last = nonzero.shape[1] - np.argmax(nonzero[:, ::-1], axis=1)
+    return np.where(nonzero.any(axis=1), last, 0)
+
+
+def batch_length(lengths: np.ndarray, cap: int) -> int:
+    longest = int(lengths.max()) if len(lengths) else 0
+    return max(1, min(cap, math.ceil(longest / PAD_MULTIPLE) * PAD_MULTIPLE))
+
+
+def length_batches(
+    lengths: np.ndarray,
+    batch_size: int,
+    rng: Optional[np.random.Generator] = None,
+) -> list[np.ndarray]:
+    """
+    индексы батчей, сгруппированных по длине. без rng - детерминированно
+    (сортировка всего набора, для predict), с rng - перемешивание кусками
+    """
+    lengths = np.asarray(lengths)
+    if rng is None:
+        order = np.argsort(lengths, kind='stable')
+        return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+    perm = rng.permutation(len(lengths))
+    chunk = batch_size * SORT_CHUNK
+    batches = []
+    for start in range(0, len(perm), chunk):
+        part = perm[start:start + chunk]
+        part = part[np.argsort(lengths[part], kind='stable')]
+        batches.extend(part[i:i + batch_size] for i in range(0, len(part), batch_size))
+    rng.shuffle(batches)
+    return batches
+
+
+class BucketedSequence(keras.utils.Sequence):
+    """
+    вход для fit: батчи по длине, каждый обрезан до своей длины (x уже
+    дополнен нулями справа, так что обрезка = паддинг по батчу).
+    class_weight превращается в sample_weight - Sequence его иначе не понимает
+    """
+
+    def __init__(self, x, y, batch_size: int = 32, class_weight: Optional[dict] = None,
+                 shuffle: bool = True, seed: Optional[int] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.x = x
+        self.y = y
+        self.batch_size = batch_size
+        self.lengths = sequence_lengths(x)
+        self.rng = np.random.default_rng(seed) if shuffle else None
+
+        self.sample_weight = None
+        if class_weight:
+            weights = np.array([class_weight.get(i, 1.0) for i in range(y.shape[1])], dtype=np.float32)
+            self.sample_weight = weights[np.argmax(y, axis=1)]
+
+        self.batches = length_batches(self.lengths, batch_size, self.rng)
+
+    def __len__(self):
+        return len(self.batches)
+
+    def __getitem__(self, index):
+        idx = np.sort(self.batches[index])
+        length = batch_length(self.lengths[idx], self.x.shape[1])
+        batch = (self.x[idx, :length], self.y[idx])
+        if self.sample_weight is not None:
+            batch += (self.sample_weight[idx],)
+        return batch
+
+    def on_epoch_end(self):
+        if self.rng is not None:
+            self.batches = length_batches(self.lengths, self.batch_size, self.rng)
+
+
+def predict_bucketed(model, x: np.ndarray, batch_size: int = 64) -> np.ndarray:
+    """predict батчами по длине; результат в исходном порядке строк x"""
+    lengths = sequence_lengths(x)
+    out = None
+    for idx in length_batches(lengths, batch_size):
+        length = batch_length(lengths[idx], x.shape[1])
+        preds = np.asarray(model.predict_on_batch(x[idx, :length]))
+        if out is None:
+            out = np.empty((len(x),) + preds.shape[1:], dtype=preds.dtype)
+        out[idx] = preds
+    return out if out is not None else np.zeros((0,), dtype=np.float32)
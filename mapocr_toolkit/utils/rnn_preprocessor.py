@@ -1,10 +1,17 @@
 import numpy as np
-from tensorflow import keras
-from keras.utils import to_categorical
 from sklearn.model_selection import train_test_split
 
 PAD_CHAR = '\0'
 
+# сколько строк кодируется за раз: ограничивает временный массив <U{max_len}
+ENCODE_CHUNK = 65536
+
+# one_hot - (N, max_seq_len, num_chars) float32 для LSTM на one-hot входе (старые модели),
+# index - (N, max_seq_len) int32 индексов символов для модели с Embedding(mask_zero=True)
+INPUT_MODE_ONE_HOT = 'one_hot'
+INPUT_MODE_INDEX = 'index'
+INPUT_MODES = (INPUT_MODE_ONE_HOT, INPUT_MODE_INDEX)
+
 def create_char_vocabulary(text_list):
     all_chars = set()
     for text in text_list:
@@ -29,27 +36,60 @@ def get_max_seq_length(text_list):
     else:
         return 0
 
-def texts_to_padded_sequences(text_list, char_to_int_map, max_len):
-    sequences = []
+def build_char_lut(char_to_int_map):
+    """таблица код символа (Unicode code point) -> индекс; неизвестные символы - в паддинг"""
     pad_index = char_to_int_map[PAD_CHAR]
+    codes = {ord(char): index for char, index in char_to_int_map.items() if len(char) == 1}
+    lut = np.full(max(codes, default=0) + 1, pad_index, dtype=np.int32)
+    lut[list(codes)] = list(codes.values())
+    return lut
 
-    for text in text_list:
-        encoded_sequence = [char_to_int_map.get(char, pad_index) for char in text]
-        current_len = len(encoded_sequence)
-        if current_len > max_len:
-            padded_sequence_np = np.array(encoded_sequence[:max_len])
-        elif current_len < max_len:
-            padding_size = max_len - current_len
-            padded_sequence_np = np.pad(np.array(encoded_sequence), (0, padding_size), mode='constant', constant_values=pad_index)
-        else:
-            padded_sequence_np = np.array(encoded_sequence)
-        sequences.append(padded_sequence_np)
-    return np.array(sequences)
+def texts_to_padded_sequences(text_list, char_to_int_map, max_len, lut=None):
+    """
+    список строк -> (N, max_len) int32 индексов, длинные обрезаются, короткие
+    дополняются паддингом. без цикла по символам: строки ложатся в массив
+    <U{max_len} (numpy сам обрезает и дополняет нулями), его буфер - это
+    UTF-32 коды, и индексы берутся из таблицы build_char_lut одним обращением
+    """
+    pad_index = char_to_int_map[PAD_CHAR]
+    if lut is None:
+        lut = build_char_lut(char_to_int_map)
+
+    sequences = np.full((len(text_list), max_len), pad_index, dtype=np.int32)
+    if max_len <= 0:
+        return sequences
+
+    for start in range(0, len(text_list), ENCODE_CHUNK):
+        chunk = np.array(text_list[start:start + ENCODE_CHUNK], dtype=f'<U{max_len}')
+        codes = chunk.view(np.uint32).reshape(len(chunk), max_len)
+        known = codes < len(lut)
+        sequences[start:start + len(chunk)] = np.where(known, lut[np.where(known, codes, 0)], pad_index)
+    return sequences
 
 def one_hot_encode_padded_sequences(padded_sequences_array, num_chars_vocab):
-    return to_categorical(padded_sequences_array, num_classes=num_chars_vocab)
+    # строки единичной матрицы по индексам - без промежуточного float64 у to_categorical
+    return np.eye(num_chars_vocab, dtype=np.float32)[padded_sequences_array]
+
+def labels_to_one_hot(int_labels, num_classes):
+    return np.eye(num_classes, dtype=np.float32)[np.asarray(int_labels, dtype=np.int64)]
+
+def encode_for_rnn(text_list, processing_info):
+    """
+    тексты -> вход RNN в том виде, на котором она обучалась: по input_mode
+    из processing_info (нет ключа - старая модель на one-hot)
+    """
+    texts = [str(text).strip() for text in text_list]
+    sequences = texts_to_padded_sequences(texts, processing_info['char_to_int_map'],
+                                          int(processing_info['max_seq_len']))
+    if processing_info.get('input_mode', INPUT_MODE_ONE_HOT) == INPUT_MODE_INDEX:
+        return sequences
+    return one_hot_encode_padded_sequences(sequences, int(processing_info['num_chars_vocab']))
+
+def prepare_rnn_data(data_items, class_to_int_map, val_split_size=0.2, random_state_value=42,
+                     input_mode=INPUT_MODE_INDEX, max_seq_len_cap=None):
+    if input_mode not in INPUT_MODES:
+        raise ValueError(f'Неизвестный input_mode: {input_mode!r}, ожидается один из {INPUT_MODES}')
 
-def prepare_rnn_data(data_items, class_to_int_map, val_split_size=0.2, random_state_value=42):
     texts = []
     raw_class_labels = []
 
@@ -63,15 +103,20 @@ def prepare_rnn_data(data_items, class_to_int_map, val_split_size=0.2, random_st
     
     char_map, _, num_chars_dict = create_char_vocabulary(texts)
     max_len_seq = get_max_seq_length(texts)
+    if max_seq_len_cap:
+        # жёсткий потолок: одна длинная строка легенды не раздувает весь датасет
+        max_len_seq = min(max_len_seq, int(max_seq_len_cap))
 
-    padded_sequences_indexes = texts_to_padded_sequences(texts, char_map, max_len_seq)
-    x_one_hot_sequences = one_hot_encode_padded_sequences(padded_sequences_indexes, num_chars_dict)
+    # index: int32 (N, max_len) вместо float32 (N, max_len, num_chars) - в num_chars раз меньше
+    x_sequences = texts_to_padded_sequences(texts, char_map, max_len_seq)
+    if input_mode == INPUT_MODE_ONE_HOT:
+        x_sequences = one_hot_encode_padded_sequences(x_sequences, num_chars_dict)
 
     int_class_labels = [class_to_int_map[label] for label in raw_class_labels]
     num_classes_overall = len(class_to_int_map)
-    y_one_hot_labels = to_categorical(np.array(int_class_labels), num_classes=num_classes_overall)
+    y_one_hot_labels = labels_to_one_hot(int_class_labels, num_classes_overall)
 
-    x_train, x_val, y_train, y_val = train_test_split(x_one_hot_sequences,
+    x_train, x_val, y_train, y_val = train_test_split(x_sequences,
                                                       y_one_hot_labels,
                                                       test_size=val_split_size,
                                                       random_state=random_state_value,
@@ -79,6 +124,7 @@ def prepare_rnn_data(data_items, class_to_int_map, val_split_size=0.2, random_st
     processing_info = {'char_to_int_map': char_map,
                        'max_seq_len': max_len_seq,
                        'num_chars_vocab': num_chars_dict,
+                       'input_mode': input_mode,
                        'class_to_int_map': class_to_int_map,
                        'int_to_class_map': {int_label: str_label for str_label, int_label in class_to_int_map.items()}}
     
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import json
+import os
+from typing import Optional
+
+# Журнал прогона нарезки: append-only JSONL, по строке на законченное окно
+
+# строки журнала:
+#   {"config": {...}}                                            - первая строка, параметры прогона
+#   {"map": "a.tif", "window": 3, "records": [...], "counter": 17} - окно распознано
+#   {"map": "a.tif", "done": true, "width": 9000, "height": 7000}  - карта закончена
+
+
+class RunManifest:
+    """
+    журнал законченных окон, по которому перезапуск продолжает прогон с места
+    остановки: готовые окна и карты не распознаются заново, а их записи
+    проигрываются из журнала.
+
+    каждая строка дописывается и сбрасывается на диск сразу, поэтому при
+    падении теряется максимум недописанная последняя строка - она
+    пропускается при чтении
+    """
+
+    def __init__(self, path: str, config: dict, fresh: bool = False):
+        self.path = path
+        self.config = config
+        self.next_counter = 0
+        self._windows: dict[str, dict[int, list[dict]]] = {}
+        self._done_maps: dict[str, tuple[int, int]] = {}
+
+        if fresh and os.path.exists(path):
+            os.remove(path)
+
+        if os.path.exists(path):
+            self._load()
+        else:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self._append({'config': config})
+
+    @property
+    def finished_windows(self) -> int:
+        return sum(len(w) for w in self._windows.values())
+
+    def is_map_done(self, map_name: str) -> bool:
+        return map_name in self._done_maps
+
+    def map_size(self, map_name: str) -> tuple[int, int]:
+        """(width, height) законченной карты - чтобы проиграть её без чтения растра"""
+        return self._done_maps[map_name]
+
+    def map_windows(self, map_name: str) -> dict[int, list[dict]]:
+        """законченные окна карты: индекс окна -> записи"""
+        return self._windows.get(map_name, {})
+
+    def window_done(self, map_name: str, window_idx: int, records: list[dict], counter: int) -> None:
+        """
+        counter - значение сквозного счётчика кропов после этого окна, чтобы
+        имена файлов при перезапуске продолжались без повторов
+        """
+        self._append({'map': map_name, 'window': int(window_idx), 'records': records, 'counter': int(counter)})
+        self._windows.setdefault(map_name, {})[int(window_idx)] = records
+        self.next_counter = max(self.next_counter, int(counter))
+
+    def map_done(self, map_name: str, width: int, height: int) -> None:
+        self._append({'map': map_name, 'done': True, 'width': int(width), 'height': int(height)})
+        self._done_maps[map_name] = (int(width), int(height))
+
+    def _append(self, entry: dict) -> None:
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _load(self) -> None:
+        stored_config: Optional[dict] = None
+        broken = 0
+
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    broken += 1
+                    continue
+
+                if 'config' in entry:
+                    stored_config = entry['config']
+                elif entry.get('done'):
+                    self._done_maps[entry['map']] = (entry['width'], entry['height'])
+                elif 'window' in entry:
+                    self._windows.setdefault(entry['map'], {})[entry['window']] = entry['records']
+                    self.next_counter = max(self.next_counter, entry['counter'])
+
+        if broken:
+            print(f"[WARNING] {self.path}: пропущено повреждённых строк: {broken}")
+
+        # недописанная при падении строка без перевода строки склеилась бы со следующей
+        with open(self.path, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell():
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    f.write(b'\n')
+
+        if stored_config != self.config:
+            raise ValueError(
+                f"Журнал {self.path} записан с другими параметрами: {stored_config} != {self.config}. "
+                f"Запустите с --fresh, чтобы начать заново"
+            )
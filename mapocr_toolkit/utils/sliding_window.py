@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import math
+
+# Сетка окон скользящего окна по листу карты
+
+
+def compute_windows(
+    height: int,
+    width: int,
+    slice_size: int = 2000,
+    overlap: int = 400,
+) -> list[tuple[int, int, int, int]]:
+    """
+    окна (x_start, y_start, x_end, y_end) построчно, слева направо и сверху вниз.
+    последнее окно в строке/столбце прижимается к краю листа, чтобы не было
+    обрезанных фрагментов
+    """
+    stride = slice_size - overlap
+    y_steps = math.ceil((height - overlap) / stride) if height > slice_size else 1
+    x_steps = math.ceil((width - overlap) / stride) if width > slice_size else 1
+
+    windows = []
+    for y_idx in range(y_steps):
+        for x_idx in range(x_steps):
+            y_start = y_idx * stride
+            x_start = x_idx * stride
+
+            y_end = min(y_start + slice_size, height)
+            x_end = min(x_start + slice_size, width)
+
+            if (y_end - y_start) < slice_size and y_start > 0:
+                y_start = max(0, y_end - slice_size)
+            if (x_end - x_start) < slice_size and x_start > 0:
+                x_start = max(0, x_end - slice_size)
+
+            windows.append((x_start, y_start, x_end, y_end))
+
+    return windows
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import time
+from collections import Counter
+from typing import Optional
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+from mapocr_toolkit.utils.cnn_preprocessor import cnn_processing_info
+from mapocr_toolkit.utils.crop_cache import cache_key
+from mapocr_toolkit.utils.data_loader import split_data_items
+
+# Потоковый вход для обучения CNN/CRNN: кропы читаются и декодируются в tf.data,
+# весь датасет в памяти не собирается
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+# вес класса при выборке ~ count ** BALANCE_POWER: 1 - как в данных, 0 - все классы поровну.
+# 0.5 поднимает city_major (9 примеров) заметно, но не до четверти каждого батча
+BALANCE_POWER = 0.5
+
+# буфер перемешивания уже декодированных кропов (только при cache)
+SHUFFLE_BUFFER = 1024
+
+# те же диапазоны, что у ImageDataGenerator в train_cnn / train_crnn
+ROTATION_DEG = 5
+WIDTH_SHIFT = 0.08
+HEIGHT_SHIFT = 0.05
+BRIGHTNESS_RANGE = (0.8, 1.2)
+
+
+def decode_crop(path, target_size=(60, 200)):
+    """файл -> (h, w, 3) uint8; как load_img: RGB и resize NEAREST (dtype сохраняется)"""
+    img = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    img = tf.image.resize(img, target_size, method='nearest')
+    img.set_shape((target_size[0], target_size[1], 3))
+    return img
+
+
+def _items_dataset(items, class_to_int_map, target_size, num_classes):
+    paths = [path for path, _, _ in items]
+    labels = [class_to_int_map[label] for _, _, label in items]
+    ds = tf.data.Dataset.from_tensor_slices((paths, labels))
+    return ds, lambda p, y: (decode_crop(p, target_size), tf.one_hot(y, num_classes))
+
+
+def _with_cache(ds, cache: Optional[str], suffix: str, items, class_to_int_map, target_size):
+    # '' - кэш в памяти (uint8), путь - файловый кэш tf.data рядом с crop_cache.
+    # tf.data сам файловый кэш не проверяет, поэтому в имени - ключ от путей,
+    # их mtime, target_size и меток: другой датасет, сплит или карта классов
+    # пишут новый кэш, а не читают старые кропы
+    if cache is None:
+        return ds
+    if not cache:
+        return ds.cache('')
+    h = hashlib.blake2b(digest_size=12)
+    h.update(cache_key([path for path, _, _ in items], target_size).encode('utf-8'))
+    h.update(repr([class_to_int_map[label] for _, _, label in items]).encode('utf-8'))
+    h.update(repr(len(class_to_int_map)).encode('utf-8'))
+    return ds.cache(f'{cache}{suffix}_{h.hexdigest()}')
+
+
+def make_augmenter(seed: Optional[int] = None) -> keras.Sequential:
+    """аугментация целым батчем: поворот, сдвиг рамки, яркость. отражение вместо flip - текст"""
+    return keras.Sequential([
+        keras.layers.RandomRotation(ROTATION_DEG / 360.0, fill_mode='reflect', seed=seed),
+        keras.layers.RandomTranslation(HEIGHT_SHIFT, WIDTH_SHIFT, fill_mode='reflect', seed=seed),
+    ], name='batch_augment')
+
+
+def _augment_batch(augmenter, images, labels):
+    x = augmenter(tf.cast(images, tf.float32), training=True)
+    factor = tf.random.uniform((tf.shape(x)[0], 1, 1, 1), *BRIGHTNESS_RANGE)
+    # float32 0..255, деление на 255 всё равно делает Rescaling в модели
+    return tf.clip_by_value(x * factor, 0.0, 255.0), labels
+
+
+def make_train_dataset(
+    items,
+    class_to_int_map,
+    target_size=(60, 200),
+    batch_size: int = 32,
+    balance_power: float = BALANCE_POWER,
+    augment: bool = True,
+    cache: Optional[str] = None,
+    seed: Optional[int] = None,
+) -> tuple[tf.data.Dataset, int]:
+    """
+    бесконечный поток батчей для fit и число шагов на эпоху.
+
+    у каждого класса свой поток (перемешанные пути -> параллельное
+    декодирование -> repeat), sample_from_datasets смешивает их с весами
+    count ** balance_power - так редкие классы попадают в батчи без
+    class_weight и без заранее сгенерированных копий
+    """
+    num_classes = len(class_to_int_map)
+    counts = Counter(label for _, _, label in items)
+    classes = sorted(counts, key=class_to_int_map.get)
+
+    per_class = []
+    for label in classes:
+        class_items = [item for item in items if item[2] == label]
+        ds, decode = _items_dataset(class_items, class_to_int_map, target_size, num_classes)
+        if cache is None:
+            # перемешиваем строки путей, а не картинки - буфер ничего не весит
+            ds = ds.shuffle(len(class_items), seed=seed, reshuffle_each_iteration=True)
+            ds = ds.map(decode, num_parallel_calls=AUTOTUNE).ignore_errors()
+        else:
+            ds = ds.map(decode, num_parallel_calls=AUTOTUNE).ignore_errors()
+            ds = _with_cache(ds, cache, f'_{class_to_int_map[label]}', class_items, class_to_int_map, target_size)
+            ds = ds.shuffle(min(len(class_items), SHUFFLE_BUFFER), seed=seed, reshuffle_each_iteration=True)
+        per_class.append(ds.repeat())
+
+    weights = np.array([counts[label] for label in classes], dtype=np.float64) ** balance_power
+    weights /= weights.sum()
+    ds = tf.data.Dataset.sample_from_datasets(per_class, weights=weights.tolist(), seed=seed)
+
+    ds = ds.batch(batch_size, drop_remainder=True)
+    if augment:
+        augmenter = make_augmenter(seed)
+        ds = ds.map(lambda x, y: _augment_batch(augmenter, x, y), num_parallel_calls=AUTOTUNE)
+
+    steps_per_epoch = max(1, math.ceil(len(items) / batch_size))
+    return ds.prefetch(AUTOTUNE), steps_per_epoch
+
+
+def make_eval_dataset(
+    items,
+    class_to_int_map,
+    target_size=(60, 200),
+    batch_size: int = 32,
+    cache: Optional[str] = None,
+) -> tf.data.Dataset:
+    """val/test без перемешивания и аугментации, порядок как в items"""
+    ds, decode = _items_dataset(items, class_to_int_map, target_size, len(class_to_int_map))
+    ds = ds.map(decode, num_parallel_calls=AUTOTUNE, deterministic=True).ignore_errors()
+    ds = _with_cache(ds, cache, '_val', items, class_to_int_map, target_size)
+    return ds.batch(batch_size).prefetch(AUTOTUNE)
+
+
+def build_train_val(
+    data_items,
+    class_to_int_map,
+    target_size=(60, 200),
+    val_split_size=0.35,
+    random_state_value=42,
+    batch_size: int = 32,
+    cache: Optional[str] = None,
+):
+    """
+    потоковый аналог prepare_cnn_data:
+    ((train_ds, steps_per_epoch), val_ds, processing_info)
+    """
+    train_items, val_items = split_data_items(data_items, val_split_size, random_state_value)
+    train = make_train_dataset(train_items, class_to_int_map, target_size, batch_size,
+                               cache=cache, seed=random_state_value)
+    val_ds = make_eval_dataset(val_items, class_to_int_map, target_size, batch_size, cache=cache)
+    return train, val_ds, cnn_processing_info(class_to_int_map, target_size)
+
+
+def dataset_labels(ds: tf.data.Dataset) -> np.ndarray:
+    """целые метки eval-датасета в том же порядке, в каком по нему идёт predict"""
+    return np.concatenate([np.argmax(y, axis=1) for _, y in ds.as_numpy_iterator()])
+
+
+class ThroughputLogger(keras.callbacks.Callback):
+    """пишет samples/sec за каждую эпоху обучения (без времени валидации)"""
+
+    def __init__(self, batch_size: int, samples_per_epoch: Optional[int] = None):
+        super().__init__()
+        self.batch_size = batch_size
+        self.samples_per_epoch = samples_per_epoch
+        self.history: list[float] = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._steps = 0
+        self._train_time = 0.0
+        self._start = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        self._steps += 1
+        self._train_time = time.perf_counter() - self._start
+
+    def on_epoch_end(self, epoch, logs=None):
+        samples = self._steps * self.batch_size
+        if self.samples_per_epoch is not None:
+            samples = min(samples, self.samples_per_epoch)
+        rate = samples / max(self._train_time, 1e-9)
+        self.history.append(rate)
+        if logs is not None:
+            logs['samples_per_sec'] = rate
+        print(f'[INFO] epoch {epoch + 1}: {samples} samples in {self._train_time:.1f} s, {rate:.1f} samples/sec')
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+# Лёгкий CPU-бэкенд для квантованных моделей (scripts/quantize_models.py).
+# TFLiteClassifier повторяет predict / predict_on_batch у keras.Model, поэтому
+# EnsemblePredictor, ensemble_eval и predict_bucketed работают с ним без изменений.
+# tflite_runtime (без полного TF) берётся, если установлен, иначе tf.lite
+
+TFLITE_SUFFIX = '.tflite'
+QUANTIZED_SUFFIX = '_int8.tflite'
+
+
+def quantized_path(keras_path) -> Path:
+    """models/demo/cnn/cnn_model.keras -> models/demo/cnn/cnn_model_int8.tflite"""
+    keras_path = Path(keras_path)
+    return keras_path.with_name(keras_path.stem + QUANTIZED_SUFFIX)
+
+
+def _interpreter_class():
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        import tensorflow as tf
+        return tf.lite.Interpreter
+    except ImportError as e:
+        raise ImportError('для .tflite нужен tflite-runtime или tensorflow') from e
+
+
+class TFLiteClassifier:
+    """
+    один вход, один выход. квантованный вход (uint8/int8) заполняется по
+    scale / zero_point из модели, выход переводится обратно во float32.
+    входы короче фиксированной длины модели дополняются нулями справа
+    (батчи по длине из rnn_batching для RNN с паддингом 0)
+    """
+
+    def __init__(self, model_path, num_threads: Optional[int] = None):
+        self.model_path = str(model_path)
+        self.interpreter = _interpreter_class()(model_path=self.model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        # shape_signature: -1 там, где размер любой
+        self.input_shape = tuple(int(d) for d in self._input.get('shape_signature', self._input['shape']))
+        self._batch_shape = tuple(self._input['shape'])
+
+    @property
+    def size_bytes(self) -> int:
+        return Path(self.model_path).stat().st_size
+
+    def _quantize(self, x: np.ndarray) -> np.ndarray:
+        dtype = self._input['dtype']
+        scale, zero_point = self._input['quantization']
+        if dtype in (np.uint8, np.int8) and scale:
+            if x.dtype == dtype and scale == 1.0 and zero_point == 0:
+                return x
+            info = np.iinfo(dtype)
+            return np.clip(np.rint(x.astype(np.float32) / scale + zero_point), info.min, info.max).astype(dtype)
+        return x.astype(dtype, copy=False)
+
+    def _dequantize(self, y: np.ndarray) -> np.ndarray:
+        scale, zero_point = self._output['quantization']
+        if self._output['dtype'] in (np.uint8, np.int8) and scale:
+            return (y.astype(np.float32) - zero_point) * scale
+        return y.astype(np.float32, copy=False)
+
+    def _fit_length(self, x: np.ndarray) -> np.ndarray:
+        if x.ndim < 2 or len(self.input_shape) < 2 or self.input_shape[1] <= 0:
+            return x
+        missing = self.input_shape[1] - x.shape[1]
+        if missing <= 0:
+            return x
+        pad = [(0, 0), (0, missing)] + [(0, 0)] * (x.ndim - 2)
+        return np.pad(x, pad)
+
+    def predict_on_batch(self, x: np.ndarray) -> np.ndarray:
+        x = self._quantize(self._fit_length(np.asarray(x)))
+        if x.shape != self._batch_shape:
+            self.interpreter.resize_tensor_input(self._input['index'], x.shape)
+            self.interpreter.allocate_tensors()
+            self._batch_shape = x.shape
+        self.interpreter.set_tensor(self._input['index'], x)
+        self.interpreter.invoke()
+        return self._dequantize(self.interpreter.get_tensor(self._output['index']))
+
+    def predict(self, x: np.ndarray, batch_size: int = 64, verbose: int = 0) -> np.ndarray:
+        if len(x) == 0:
+            return np.zeros((0,) + tuple(self._output['shape'][1:]), dtype=np.float32)
+        return np.concatenate([self.predict_on_batch(x[start:start + batch_size])
+                               for start in range(0, len(x), batch_size)])
+
+
+def load_classifier(model_path, num_threads: Optional[int] = None):
+    """.tflite -> TFLiteClassifier, иначе keras.models.load_model"""
+    if str(model_path).endswith(TFLITE_SUFFIX):
+        return TFLiteClassifier(model_path, num_threads=num_threads)
+    import tensorflow as tf
+    return tf.keras.models.load_model(str(model_path))
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import numpy as np
+
+from mapocr_toolkit.utils.nms import _boxes_array, nms_filter
+
+# Потоковая дедупликация боксов по окнам одной карты
+
+
+# сколько новых боксов сравнивается с отложенными за одну матрицу IoU
+PAIR_CHUNK = 256
+
+
+def _overlap_pairs(new: np.ndarray, boxes: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """
+    пары (i, j), i из new, j из всех boxes, j < i, с IoU > iou_threshold - рёбра,
+    по которым жадный NMS может подавить один бокс другим
+    """
+    b = boxes.astype(np.int64)
+    area = np.clip(b[:, 2] - b[:, 0], 0, None) * np.clip(b[:, 3] - b[:, 1], 0, None)
+    pairs = []
+    for start in range(0, len(new), PAIR_CHUNK):
+        rows = new[start:start + PAIR_CHUNK]
+        r = b[rows]
+        iw = np.clip(np.minimum(r[:, None, 2], b[None, :, 2]) - np.maximum(r[:, None, 0], b[None, :, 0]), 0, None)
+        ih = np.clip(np.minimum(r[:, None, 3], b[None, :, 3]) - np.maximum(r[:, None, 1], b[None, :, 1]), 0, None)
+        inter = iw * ih
+        union = area[rows][:, None] + area[None, :] - inter
+        hit = (inter > 0) & (union > 0)
+        hit[hit] = inter[hit] / union[hit] > iou_threshold
+        hit &= np.arange(len(b))[None, :] < rows[:, None]
+        i, j = np.nonzero(hit)
+        pairs.append(np.stack([rows[i], j], axis=1))
+    return np.concatenate(pairs) if pairs else np.zeros((0, 2), dtype=np.int64)
+
+
+def _components(n: int, pairs: np.ndarray) -> np.ndarray:
+    """номер связной компоненты каждого из n боксов (минимальный индекс в ней)"""
+    labels = np.arange(n)
+    if not len(pairs):
+        return labels
+    a, b = pairs[:, 0], pairs[:, 1]
+    while True:
+        low = np.minimum(labels[a], labels[b])
+        new = labels.copy()
+        np.minimum.at(new, a, low)
+        np.minimum.at(new, b, low)
+        new = new[new]
+        if np.array_equal(new, labels):
+            return labels
+        labels = new
+
+
+class StreamingDeduplicator:
+    """
+    дубли появляются только в полосах перекрытия соседних окон, поэтому
+    глобальный NMS в конце прогона не нужен:
+
+    1. боксы с IoU > порога связаны; жадный NMS по всей карте распадается
+       на независимые NMS по связным компонентам этого графа
+    2. бокс нового окна может лежать только внутри своего окна, поэтому
+       компонента, ни один бокс которой не пересекает ещё не обработанное
+       окно, больше не изменится - по ней считается NMS и выжившие отдаются
+    3. остальные компоненты ждут целиком, вместе с уже подавленными боксами:
+       бокс, подавивший соседа, сам может быть подавлен следующим окном,
+       и тогда сосед выживает (как в глобальном NMS)
+    4. в памяти живут только боксы из полос перекрытия
+
+    windows - все окна карты в формате (x_start, y_start, x_end, y_end)
+    """
+
+    def __init__(
+        self,
+        windows: list[tuple[int, int, int, int]],
+        iou_threshold: float = 0.5,
+        method: str = 'vectorized',
+    ):
+        self.windows = np.asarray(windows, dtype=np.int64).reshape(-1, 4)
+        self.iou_threshold = iou_threshold
+        self.method = method
+
+        self.removed = 0
+        self._done = np.zeros(len(self.windows), dtype=bool)
+        # отложенные записи, их боксы (разобраны один раз) и рёбра IoU > порога
+        self._pending: list[dict] = []
+        self._boxes = np.zeros((0, 4), dtype=np.int64)
+        self._has_area = np.zeros(0, dtype=bool)
+        self._pairs = np.zeros((0, 2), dtype=np.int64)
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def add_window(self, window_idx: int, records: list[dict]) -> list[dict]:
+        """
+        принимает записи законченного окна (даже пустой список - окно всё равно
+        отмечается как обработанное) и возвращает записи, ставшие финальными
+        """
+        self._done[window_idx] = True
+
+        boxes, valid = _boxes_array(list(records))
+        boxes = boxes.astype(np.int64)
+        # вырожденные и невалидные боксы не подавляют и не подавляются
+        has_area = valid & (boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])
+
+        offset = len(self._pending)
+        self._pending = self._pending + list(records)
+        self._boxes = np.concatenate([self._boxes, boxes])
+        self._has_area = np.concatenate([self._has_area, has_area])
+
+        indexed = np.flatnonzero(self._has_area)
+        new = indexed[indexed >= offset]
+        if new.size:
+            pairs = _overlap_pairs(np.searchsorted(indexed, new), self._boxes[indexed], self.iou_threshold)
+            self._pairs = np.concatenate([self._pairs, indexed[pairs]])
+        return self._flush()
+
+    def finish(self) -> list[dict]:
+        """NMS по всему, что осталось (например при прерывании прогона)"""
+        return self._settle(np.ones(len(self._pending), dtype=bool))
+
+    def _settle(self, final: np.ndarray) -> list[dict]:
+        # порядок отложенных = порядок окон, как в общем списке для nms_filter
+        ready = [r for r, f in zip(self._pending, final) if f]
+        survivors = nms_filter(ready, self.iou_threshold, method=self.method)
+        self.removed += len(ready) - len(survivors)
+
+        # рёбра не выходят за компоненту: у ребра оба конца либо финальные, либо нет
+        keep = ~final
+        new_index = np.cumsum(keep) - 1
+        self._pending = [r for r, k in zip(self._pending, keep) if k]
+        self._boxes = self._boxes[keep]
+        self._has_area = self._has_area[keep]
+        self._pairs = new_index[self._pairs[keep[self._pairs[:, 0]]]]
+        return survivors
+
+    def _flush(self) -> list[dict]:
+        future = self.windows[~self._done]
+        pb = self._boxes
+        if not len(future):
+            return self._settle(np.ones(len(pb), dtype=bool))
+
+        # (боксы x будущие окна): пересекается ли бокс с окном по площади
+        hits = ((pb[:, None, 0] < future[None, :, 2]) & (pb[:, None, 2] > future[None, :, 0])
+                & (pb[:, None, 1] < future[None, :, 3]) & (pb[:, None, 3] > future[None, :, 1]))
+        open_box = hits.any(axis=1) & self._has_area
+
+        labels = _components(len(pb), self._pairs)
+        open_label = np.zeros(len(pb), dtype=bool)
+        open_label[labels[open_box]] = True
+        return self._settle(~open_label[labels])
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+scripts/bench_ensemble_batching.py
+генератор нагрузки для MicroBatcher: N клиентов в замкнутом цикле шлют
+мелкие запросы, для каждой пары (клиенты, max_wait_ms) печатается
+пропускная способность, p50/p95/p99 задержки и фактический размер батча -
+кривая компромисса throughput / latency.
+
+по умолчанию модели синтетические: ветка CNN и ветка RNN стоят
+overhead + per_item * n миллисекунд (time.sleep отпускает GIL, как и
+ядра TF), так что бенчмарк работает без TensorFlow. --models гоняет
+настоящий EnsemblePredictor на случайных кропах и текстах
+
+запуск из корня репозитория:
+    python scripts/bench_ensemble_batching.py
+    python scripts/bench_ensemble_batching.py --clients 1 8 32 --max-wait-ms 0 2 10 --sequential-branches
+    python scripts/bench_ensemble_batching.py --models --duration 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import io
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+SCRIPT_DIR   = Path(__file__).resolve().parent
+PROJECT_ROOT = SCRIPT_DIR.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from mapocr_toolkit.ensemble.batcher import MicroBatcher
+
+MODELS_DIR = PROJECT_ROOT / 'models' / 'demo'
+
+
+def synthetic_branch(key: str, overhead_ms: float, per_item_ms: float, num_classes: int = 6):
+    """ветка с фиксированной ценой вызова и линейной ценой элемента"""
+    def fn(items):
+        time.sleep((overhead_ms + per_item_ms * len(items)) / 1000.0)
+        return {key: np.full((len(items), num_classes), 1.0 / num_classes, dtype=np.float32)}
+    return fn
+
+
+def make_model_items(n: int, target_size: tuple, seed: int = 42) -> list[dict]:
+    """случайные кропы (PNG в base64) и тексты - только для замера задержки"""
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    items = []
+    for i in range(n):
+        buffer = io.BytesIO()
+        Image.fromarray(rng.integers(0, 256, target_size + (3,), dtype=np.uint8)).save(buffer, format='PNG')
+        items.append({'image_b64': base64.b64encode(buffer.getvalue()).decode('ascii'),
+                      'ocr_text': f'р. Ока {i}'})
+    return items
+
+
+def run_load(batcher: MicroBatcher, items: list[dict], clients: int, request_size: int,
+             duration: float) -> float:
+    """клиенты шлют запросы друг за другом duration секунд; возвращает элементов/с"""
+    stop_at = time.perf_counter() + duration
+    done = [0] * clients
+
+    def client(k):
+        offset = k * request_size
+        while time.perf_counter() < stop_at:
+            start = offset % max(1, len(items) - request_size)
+            batcher.submit(items[start:start + request_size]).result()
+            done[k] += request_size
+            offset += request_size
+
+    threads = [threading.Thread(target=client, args=(k,)) for k in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(done) / (time.perf_counter() - start)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description='Бенчмарк микробатчинга ансамбля: throughput против задержки',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16, 64],
+                        help='число одновременных клиентов')
+    parser.add_argument('--max-wait-ms', type=float, nargs='+', default=[0.0, 2.0, 10.0, 25.0])
+    parser.add_argument('--max-batch', type=int, default=256)
+    parser.add_argument('--request-size', type=int, default=1, help='элементов в одном запросе')
+    parser.add_argument('--duration', type=float, default=3.0, help='секунд на одну точку кривой')
+    parser.add_argument('--sequential-branches', action='store_true',
+                        help='дополнительно прогнать CNN и RNN по очереди в одном потоке')
+    parser.add_argument('--cnn-overhead-ms', type=float, default=8.0)
+    parser.add_argument('--cnn-per-item-ms', type=float, default=0.4)
+    parser.add_argument('--rnn-overhead-ms', type=float, default=5.0)
+    parser.add_argument('--rnn-per-item-ms', type=float, default=0.2)
+    parser.add_argument('--models', action='store_true',
+                        help='настоящие модели из models/demo вместо синтетических веток')
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+
+    if args.models:
+        from mapocr_toolkit.ensemble.predictor import EnsemblePredictor
+
+        predictor = EnsemblePredictor.from_paths(
+            MODELS_DIR / 'cnn' / 'cnn_model.keras', MODELS_DIR / 'cnn' / 'cnn_processing_info.json',
+            MODELS_DIR / 'rnn' / 'rnn_model.keras', MODELS_DIR / 'rnn' / 'rnn_processing_info.json',
+        )
+        items = make_model_items(512, predictor.target_size)
+        predictor.predict(items[:args.max_batch])  # прогрев графов
+        parallel, sequential = list(predictor.branches), predictor.predict
+        print(f'[INFO] модели models/demo, классы: {predictor.classes}')
+    else:
+        items = [{'ocr_text': f'подпись {i}'} for i in range(4096)]
+        parallel = [synthetic_branch('cnn', args.cnn_overhead_ms, args.cnn_per_item_ms),
+                    synthetic_branch('rnn', args.rnn_overhead_ms, args.rnn_per_item_ms)]
+        branch_fns = list(parallel)
+        sequential = lambda batch: {**branch_fns[0](batch), **branch_fns[1](batch)}  # noqa: E731
+        print(f'[INFO] синтетические ветки: CNN {args.cnn_overhead_ms} + {args.cnn_per_item_ms}*n ms, '
+              f'RNN {args.rnn_overhead_ms} + {args.rnn_per_item_ms}*n ms')
+
+    modes = [('parallel', parallel)]
+    if args.sequential_branches:
+        modes.append(('serial', sequential))
+
+    header = (f"{'ветки':>9} {'клиенты':>8} {'wait, ms':>9} {'элем./с':>9} "
+              f"{'p50, ms':>8} {'p95, ms':>8} {'p99, ms':>8} {'батч':>6}")
+    print(header)
+    print('-' * len(header))
+    for mode, fn in modes:
+        for clients in args.clients:
+            for wait_ms in args.max_wait_ms:
+                batcher = MicroBatcher(fn, max_batch=args.max_batch, max_wait_ms=wait_ms)
+                rate = run_load(batcher, items, clients, args.request_size, args.duration)
+                stats = batcher.stats()
+                batcher.close()
+                latency = stats['latency_ms']
+                print(f"{mode:>9} {clients:>8} {wait_ms:>9.1f} {rate:>9.0f} {latency['p50']:>8.2f} "
+                      f"{latency['p95']:>8.2f} {latency['p99']:>8.2f} {stats['batch_size']['mean']:>6.1f}")
+
+
+if __name__ == '__main__':
+    main()
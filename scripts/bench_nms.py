@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+scripts/bench_nms.py
+сравнивает скорость NMS: исходный попарный цикл на Python, векторный движок
+и индекс по равномерной сетке.
+
+боксы синтетические: надписи на листе карты + почти совпадающие дубли,
+как после перекрытия скользящего окна в slice_paddle.py
+
+запуск из корня репозитория:
+    python scripts/bench_nms.py
+    python scripts/bench_nms.py --sizes 1000 10000 100000 --max-reference 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+SCRIPT_DIR   = Path(__file__).resolve().parent
+PROJECT_ROOT = SCRIPT_DIR.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from mapocr_toolkit.utils.nms import _nms_grid, _nms_python, _nms_vectorized
+
+
+def make_records(n: int, seed: int = 42) -> list[dict]:
+    """n боксов на листе, примерно треть из них дубли со сдвигом в пару пикселей"""
+    rng = np.random.default_rng(seed)
+    n_base = max(1, int(n * 0.7))
+
+    # плотность как на реальной карте: ~1 надпись на 300x300 px
+    side = int(np.sqrt(n_base) * 300)
+    x1 = rng.integers(0, side, n_base)
+    y1 = rng.integers(0, side, n_base)
+    w = rng.integers(40, 300, n_base)
+    h = rng.integers(15, 60, n_base)
+    base = np.stack([x1, y1, x1 + w, y1 + h], axis=1)
+
+    dup_src = rng.integers(0, n_base, n - n_base)
+    jitter = rng.integers(-4, 5, (n - n_base, 4))
+    boxes = np.concatenate([base, base[dup_src] + jitter])
+    conf = rng.uniform(0.6, 1.0, n)
+
+    return [
+        {
+            'global_box': [[int(b[0]), int(b[1])], [int(b[2]), int(b[3])]],
+            'confidence': round(float(c), 4),
+        }
+        for b, c in zip(boxes, conf)
+    ]
+
+
+def _timed(func, records, iou_threshold):
+    start = time.perf_counter()
+    kept = func(records, iou_threshold)
+    return time.perf_counter() - start, kept
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description='Бенчмарк NMS: Python-цикл, векторный движок и сетка',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                        help='количество боксов в каждом прогоне')
+    parser.add_argument('--iou-threshold', type=float, default=0.5)
+    parser.add_argument('--max-reference', type=int, default=10_000,
+                        help='выше этого размера квадратичный Python-цикл не запускаем')
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+
+    print(f'{"боксов":>8} {"python, с":>11} {"vectorized, с":>14} {"grid, с":>9} '
+          f'{"ускорение vec":>14} {"ускорение grid":>15} {"осталось":>9}')
+    print('-' * 86)
+    for n in args.sizes:
+        records = make_records(n, seed=args.seed)
+        t_vec, kept_vec = _timed(_nms_vectorized, records, args.iou_threshold)
+        t_grid, kept_grid = _timed(_nms_grid, records, args.iou_threshold)
+        assert kept_grid == kept_vec, 'NMS по сетке разошёлся с векторным'
+
+        if n <= args.max_reference:
+            t_ref, kept_ref = _timed(_nms_python, records, args.iou_threshold)
+            assert kept_ref == kept_vec, 'векторный NMS разошёлся с эталоном'
+            ref_col = f'{t_ref:>11.3f}'
+            speedup_vec = f'{t_ref / t_vec:>13.1f}x'
+            speedup_grid = f'{t_ref / t_grid:>14.1f}x'
+        else:
+            # квадратичный цикл не ждём, сравниваем сетку с векторным движком
+            ref_col = f'{"—":>11}'
+            speedup_vec = f'{"—":>14}'
+            speedup_grid = f'{t_vec / t_grid:>10.1f}x vec'
+
+        print(f'{n:>8} {ref_col} {t_vec:>14.3f} {t_grid:>9.3f} '
+              f'{speedup_vec} {speedup_grid} {len(kept_vec):>9}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+scripts/bench_rnn_inputs.py
+сравнивает два вида входа RNN: плотный one-hot (N, max_seq_len, num_chars)
+float32 и int32 индексы (N, max_seq_len) для модели с Embedding(mask_zero=True).
+
+меряется память входного тензора, время кодирования текстов и задержка
+predict на случайно инициализированных моделях той же архитектуры.
+тексты синтетические: кириллица + латиница + цифры, длины как у OCR-подписей
+с редкими длинными строками
+
+запуск из корня репозитория:
+    python scripts/bench_rnn_inputs.py
+    python scripts/bench_rnn_inputs.py --sizes 10000 100000 --max-len 120
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+SCRIPT_DIR   = Path(__file__).resolve().parent
+PROJECT_ROOT = SCRIPT_DIR.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from mapocr_toolkit.utils.rnn_preprocessor import (
+    INPUT_MODE_INDEX, INPUT_MODE_ONE_HOT, create_char_vocabulary, encode_for_rnn,
+)
+
+ALPHABET = ('абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+            'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ'
+            'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+            '0123456789 .,-()«»"\'!?:;')
+
+
+def make_texts(n: int, max_len: int, seed: int = 42) -> list[str]:
+    """в основном короткие подписи (медиана ~10 символов), хвост до max_len"""
+    rng = np.random.default_rng(seed)
+    chars = np.array(list(ALPHABET))
+    lengths = np.clip(rng.lognormal(2.3, 0.6, n).astype(int), 1, max_len)
+    lengths[rng.integers(0, n, max(1, n // 1000))] = max_len
+    return [''.join(rng.choice(chars, size=length)) for length in lengths]
+
+
+def _timed(func, *args, repeat: int = 3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description='Бенчмарк входа RNN: one-hot против int32 индексов с Embedding',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                        help='количество текстов в каждом прогоне')
+    parser.add_argument('--max-len', type=int, default=80, help='максимальная длина текста')
+    parser.add_argument('--max-one-hot-mb', type=float, default=1024,
+                        help='больше этого one-hot не строим, только печатаем оценку размера')
+    parser.add_argument('--predict-size', type=int, default=2_000,
+                        help='на скольких текстах мерить задержку predict (0 - не мерить)')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+
+    vocab_texts = make_texts(2_000, args.max_len, args.seed)
+    char_to_int, _, num_chars = create_char_vocabulary(vocab_texts + [ALPHABET])
+    info = {'char_to_int_map': char_to_int, 'max_seq_len': args.max_len, 'num_chars_vocab': num_chars}
+    print(f'[INFO] словарь: {num_chars} символов, max_seq_len: {args.max_len}')
+
+    header = f"{'N':>8} {'режим':>8} {'память, MB':>12} {'кодирование, s':>16}"
+    print(header)
+    print('-' * len(header))
+    for n in args.sizes:
+        texts = make_texts(n, args.max_len, args.seed + n)
+        for mode in (INPUT_MODE_ONE_HOT, INPUT_MODE_INDEX):
+            one_hot_mb = n * args.max_len * num_chars * 4 / 2**20
+            if mode == INPUT_MODE_ONE_HOT and one_hot_mb > args.max_one_hot_mb:
+                print(f'{n:>8} {mode:>8} {one_hot_mb:>12.2f} {"пропуск":>16}')
+                continue
+            seconds, x = _timed(encode_for_rnn, texts, dict(info, input_mode=mode))
+            print(f'{n:>8} {mode:>8} {x.nbytes / 2**20:>12.2f} {seconds:>16.3f}')
+            del x
+
+    if args.predict_size <= 0:
+        return
+
+    from mapocr_toolkit.rnn.rnn_model import (
+        create_char_level_embedding_lstm_model, create_char_level_lstm_model,
+    )
+
+    texts = make_texts(args.predict_size, args.max_len, args.seed)
+    models = {
+        INPUT_MODE_ONE_HOT: create_char_level_lstm_model(args.max_len, num_chars),
+        INPUT_MODE_INDEX: create_char_level_embedding_lstm_model(args.max_len, num_chars),
+    }
+
+    print(f'\n[INFO] predict на {args.predict_size} текстах, batch_size={args.batch_size}')
+    for mode, model in models.items():
+        x = encode_for_rnn(texts, dict(info, input_mode=mode))
+        model.predict(x[:args.batch_size], batch_size=args.batch_size, verbose=0)  # прогрев графа
+        seconds, _ = _timed(lambda: model.predict(x, batch_size=args.batch_size, verbose=0))
+        per_batch_ms = seconds / max(1, -(-len(x) // args.batch_size)) * 1000
+        print(f'  {mode:>8}: {seconds:.3f} s всего, {per_batch_ms:.2f} ms на батч, '
+              f'{len(x) / seconds:.0f} текстов/с')
+
+
+if __name__ == '__main__':
+    main()
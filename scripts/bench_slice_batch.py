@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+scripts/bench_slice_batch.py
+сравнивает пропускную способность slice_paddle.py при разном числе окон
+в одном вызове ocr.predict (--batch-size): окна/с и строки/с.
+
+берутся первые --max-windows окон листа, перед замером каждого размера
+батча делается прогревочный прогон (загрузка моделей, аллокации paddle)
+
+запуск из корня репозитория:
+    python scripts/bench_slice_batch.py data/raw_tifs/sheet.tif
+    python scripts/bench_slice_batch.py data/raw_tifs/sheet.tif --batch-sizes 1 4 16 --max-windows 48
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+SCRIPT_DIR   = Path(__file__).resolve().parent
+PROJECT_ROOT = SCRIPT_DIR.parent
+for path in (PROJECT_ROOT, SCRIPT_DIR):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+from mapocr_toolkit.image_processing.tile_reader import open_tile_reader
+from mapocr_toolkit.utils.sliding_window import compute_windows
+
+import slice_paddle
+
+
+def _run(ocr, reader, tif_path: str, windows: list, batch_size: int) -> tuple[float, int]:
+    """время прогона окон и число распознанных строк"""
+    n_lines = 0
+    t0 = time.perf_counter()
+    for _, _, (_, texts, _) in slice_paddle.iter_window_results(
+            windows, tif_path, reader, ocr=ocr, batch_size=batch_size):
+        n_lines += len(texts)
+    return time.perf_counter() - t0, n_lines
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Бенчмарк батчевого OCR окон в slice_paddle')
+    parser.add_argument('tif', help='путь к листу карты')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--max-windows', type=int, default=32,
+                        help='сколько первых окон листа прогонять на каждый размер батча')
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+
+    with open_tile_reader(args.tif) as reader:
+        windows = compute_windows(reader.height, reader.width,
+                                  slice_paddle.SLICE_SIZE, slice_paddle.OVERLAP)
+        windows = windows[:args.max_windows]
+        print(f'[INFO] {args.tif}: {reader.width}x{reader.height}, окон в замере: {len(windows)}')
+
+        print(f'{"батч":>6} {"время, с":>9} {"окон/с":>8} {"строк/с":>9} {"строк":>7} {"ускорение":>10}')
+        print('-' * 54)
+        base = None
+        for batch_size in args.batch_sizes:
+            ocr = slice_paddle.create_ocr(batch_size=batch_size)
+            _run(ocr, reader, args.tif, windows[:batch_size], batch_size)
+
+            elapsed, n_lines = _run(ocr, reader, args.tif, windows, batch_size)
+            base = base or elapsed
+            print(f'{batch_size:>6} {elapsed:>9.2f} {len(windows) / elapsed:>8.2f} '
+                  f'{n_lines / elapsed:>9.1f} {n_lines:>7} {base / elapsed:>9.2f}x')
+            del ocr
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+scripts/bench_text_encoder.py
+сравнивает кодирование текстов для RNN: прежний цикл по символам с np.pad
+на каждую строку и векторный texts_to_padded_sequences (таблица кодов
+символов + UTF-32 буфер массива <U{max_len}).
+
+тексты синтетические, как в bench_rnn_inputs.py: кириллица + латиница,
+в основном короткие подписи с редкими длинными строками
+
+запуск из корня репозитория:
+    python scripts/bench_text_encoder.py
+    python scripts/bench_text_encoder.py --sizes 10000 1000000 --max-reference 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+SCRIPT_DIR   = Path(__file__).resolve().parent
+PROJECT_ROOT = SCRIPT_DIR.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from mapocr_toolkit.utils.rnn_preprocessor import (
+    PAD_CHAR, build_char_lut, create_char_vocabulary, texts_to_padded_sequences,
+)
+
+ALPHABET = ('абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+            'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ'
+            'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+            '0123456789 .,-()«»"\'!?:;')
+
+
+def make_texts(n: int, max_len: int, seed: int = 42) -> list[str]:
+    """в основном короткие подписи, хвост до max_len; строки собираются из кодов пачкой"""
+    rng = np.random.default_rng(seed)
+    codes = np.array([ord(c) for c in ALPHABET], dtype=np.uint32)
+    lengths = np.clip(rng.lognormal(2.3, 0.6, n).astype(int), 1, max_len)
+    lengths[rng.integers(0, n, max(1, n // 1000))] = max_len
+    chars = codes[rng.integers(0, len(codes), (n, max_len))]
+    chars[np.arange(max_len) >= lengths[:, None]] = 0
+    return chars.view(f'<U{max_len}').ravel().tolist()
+
+
+def encode_loop(text_list, char_to_int_map, max_len):
+    """прежняя реализация: словарь на каждый символ и np.pad на каждую строку"""
+    sequences = []
+    pad_index = char_to_int_map[PAD_CHAR]
+
+    for text in text_list:
+        encoded_sequence = [char_to_int_map.get(char, pad_index) for char in text]
+        current_len = len(encoded_sequence)
+        if current_len > max_len:
+            padded_sequence_np = np.array(encoded_sequence[:max_len])
+        elif current_len < max_len:
+            padding_size = max_len - current_len
+            padded_sequence_np = np.pad(np.array(encoded_sequence), (0, padding_size),
+                                        mode='constant', constant_values=pad_index)
+        else:
+            padded_sequence_np = np.array(encoded_sequence)
+        sequences.append(padded_sequence_np)
+    return np.array(sequences)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description='Бенчмарк кодирования текстов: цикл по символам против таблицы кодов',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help='количество строк в каждом прогоне')
+    parser.add_argument('--max-len', type=int, default=80)
+    parser.add_argument('--max-reference', type=int, default=1_000_000,
+                        help='выше этого размера прежний цикл не запускаем')
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+
+    char_to_int, _, num_chars = create_char_vocabulary(make_texts(2_000, args.max_len, args.seed) + [ALPHABET])
+    lut = build_char_lut(char_to_int)
+    print(f'[INFO] словарь: {num_chars} символов, таблица кодов: {len(lut)} элементов')
+
+    header = f"{'N':>9} {'цикл, s':>10} {'таблица, s':>11} {'ускорение':>10} {'совпадает':>10}"
+    print(header)
+    print('-' * len(header))
+    for n in args.sizes:
+        texts = make_texts(n, args.max_len, args.seed + n)
+        # как в prepare_rnn_data: max_len - самая длинная строка набора
+        max_len = max(len(text) for text in texts)
+
+        start = time.perf_counter()
+        fast = texts_to_padded_sequences(texts, char_to_int, max_len, lut=lut)
+        fast_s = time.perf_counter() - start
+
+        if n > args.max_reference:
+            print(f'{n:>9} {"-":>10} {fast_s:>11.3f} {"-":>10} {"-":>10}')
+            continue
+
+        start = time.perf_counter()
+        reference = encode_loop(texts, char_to_int, max_len)
+        loop_s = time.perf_counter() - start
+
+        same = np.array_equal(reference, fast)
+        print(f'{n:>9} {loop_s:>10.3f} {fast_s:>11.3f} {loop_s / fast_s:>9.1f}x {str(same):>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+scripts/denoise_sheet.py
+очистка большого листа карты или страницы PDF RandomForest-денойзером
+(cleaner.pickle) по тайлам в пуле процессов, см.
+mapocr_toolkit/image_processing/tiled_denoise.py.
+
+TIF-листы читаются через open_tile_reader полосами и переводятся в серый,
+остальные форматы - через cv2. результат побитово совпадает с
+clean_image.process_image на целом изображении, швов на стыках тайлов нет.
+
+--scaling прогоняет лист при 1, 2, ... --workers процессах и печатает
+Mpix/s и ускорение относительно одного процесса
+
+запуск из корня репозитория:
+    python scripts/denoise_sheet.py data/raw_tifs/sheet.tif --output sheet_clean.png
+    python scripts/denoise_sheet.py page_1.png --output page_1_clean.png --workers 4 --tile-size 256
+    python scripts/denoise_sheet.py data/raw_tifs/sheet.tif --scaling
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import pickle
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+SCRIPT_DIR   = Path(__file__).resolve().parent
+PROJECT_ROOT = SCRIPT_DIR.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from mapocr_toolkit.image_processing.tile_reader import BAND_ROWS, open_tile_reader
+from mapocr_toolkit.image_processing.tiled_denoise import DEFAULT_TILE_SIZE, denoise_tiled
+
+MODEL_PATH = PROJECT_ROOT / 'cleaner.pickle'
+TIF_SUFFIXES = ('.tif', '.tiff')
+
+
+def read_gray(path: Path) -> np.ndarray:
+    """лист в оттенках серого uint8; TIF - полосами, без полной RGB-копии в памяти"""
+    if path.suffix.lower() not in TIF_SUFFIXES:
+        image = cv2.imread(str(path), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError(f'не удалось прочитать {path}')
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    with open_tile_reader(path) as reader:
+        gray = np.empty((reader.height, reader.width), dtype=np.uint8)
+        for y0 in range(0, reader.height, BAND_ROWS):
+            y1 = min(reader.height, y0 + BAND_ROWS)
+            gray[y0:y1] = cv2.cvtColor(reader.read(0, y0, reader.width, y1), cv2.COLOR_RGB2GRAY)
+    return gray
+
+
+def measure_scaling(gray: np.ndarray, model, tile_size: int, max_workers: int) -> None:
+    mpix = gray.size / 1e6
+    base = None
+    print(f"\n{'процессов':>9} {'время, s':>9} {'Mpix/s':>8} {'ускорение':>10}")
+    for workers in range(1, max_workers + 1):
+        start = time.perf_counter()
+        denoise_tiled(gray, model, tile_size=tile_size, workers=workers)
+        elapsed = time.perf_counter() - start
+        base = base or elapsed
+        print(f'{workers:>9} {elapsed:>9.2f} {mpix / elapsed:>8.2f} {base / elapsed:>9.2f}x')
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description='Тайловая очистка листа карты / страницы RandomForest-денойзером',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument('input', type=Path, help='лист карты (TIF) или изображение страницы')
+    parser.add_argument('--output', type=Path, default=None,
+                        help='куда сохранить очищенный лист (по умолчанию <имя>_clean.png рядом)')
+    parser.add_argument('--model', type=Path, default=MODEL_PATH)
+    parser.add_argument('--tile-size', type=int, default=DEFAULT_TILE_SIZE)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--scaling', action='store_true',
+                        help='замерить скорость при 1..--workers процессах вместо сохранения')
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+
+    for path in (args.input, args.model):
+        if not path.exists():
+            print(f'[ERROR] Файл не найден: {path}')
+            sys.exit(1)
+
+    with open(args.model, 'rb') as f:
+        model = pickle.load(f)
+
+    start = time.perf_counter()
+    gray = read_gray(args.input)
+    print(f'[INFO] {args.input}: {gray.shape[1]}x{gray.shape[0]}, чтение {time.perf_counter() - start:.1f} s')
+
+    if args.scaling:
+        measure_scaling(gray, model, args.tile_size, args.workers)
+        return
+
+    start = time.perf_counter()
+    output = denoise_tiled(gray, model, tile_size=args.tile_size, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    print(f'[INFO] очистка: {elapsed:.1f} s ({gray.size / 1e6 / elapsed:.2f} Mpix/s, '
+          f'{args.workers} процессов, тайл {args.tile_size})')
+
+    out_path = args.output or args.input.with_name(args.input.stem + '_clean.png')
+    if not cv2.imwrite(str(out_path), output):
+        print(f'[ERROR] Не удалось сохранить {out_path}')
+        sys.exit(1)
+    print(f'[INFO] Сохранено: {out_path}')
+
+
+if __name__ == '__main__':
+    main()
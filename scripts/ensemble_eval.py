@@ -10,75 +10,142 @@ CNN + RNN
     python scripts/ensemble_eval.py --strategy weighted --cnn-weight 0.7
     python scripts/ensemble_eval.py --strategy max_confidence
     python scripts/ensemble_eval.py --strategy all
+    python scripts/ensemble_eval.py --backend tflite
 """
 
 import os
 import sys
 import argparse
 import json
+import time
 
 import numpy as np
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 from sklearn.metrics import classification_report, confusion_matrix, ConfusionMatrixDisplay
-import tensorflow as tf
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(current_dir)
 if project_root not in sys.path:
     sys.path.append(project_root)
 
+from mapocr_toolkit.ensemble.client import DEFAULT_URL, EnsembleClient, reorder_columns
+from mapocr_toolkit.ensemble.voting import max_confidence, soft_voting, weighted_voting
 from mapocr_toolkit.utils.data_loader import load_raw_data_paths_and_labels, create_class_maps
-from mapocr_toolkit.utils.cnn_preprocessor import prepare_cnn_data
-from mapocr_toolkit.utils.rnn_preprocessor import prepare_rnn_data
+from mapocr_toolkit.utils.cnn_preprocessor import prepare_cnn_data, split_cnn_items, to_model_input
+from mapocr_toolkit.utils.rnn_preprocessor import INPUT_MODE_ONE_HOT, prepare_rnn_data
+from mapocr_toolkit.utils.tflite_backend import load_classifier, quantized_path
 
 # пути к артефактам обученных моделек
 CNN_MODEL_PATH  = os.path.join(project_root, 'models', 'demo', 'cnn', 'cnn_model.keras')
+CNN_INFO_PATH   = os.path.join(project_root, 'models', 'demo', 'cnn', 'cnn_processing_info.json')
 RNN_MODEL_PATH  = os.path.join(project_root, 'models', 'demo', 'rnn', 'rnn_model.keras')
+RNN_INFO_PATH   = os.path.join(project_root, 'models', 'demo', 'rnn', 'rnn_processing_info.json')
 ENSEMBLE_DIR    = os.path.join(project_root, 'models', 'demo', 'ensemble')
 
 # должны совпадать с train_cnn, train_rnn, иначе val сеты разъедутся
 VAL_SPLIT    = 0.35
 RANDOM_STATE = 42
 
-def soft_voting(p_cnn: np.ndarray, p_rnn: np.ndarray) -> np.ndarray:
+def predict_rnn_timed(rnn_model, x: np.ndarray, dynamic_length: bool,
+                      batch_size: int = 64) -> np.ndarray:
     """
-    Обе модели выдают вектор вероятностей длиной N_классов.
-    Складываем и делим на 2 — победитель тот класс, у которого
-    суммарная вероятность выше.
+    predict RNN с замером задержки. модель без фиксированной длины
+    прогоняется в обоих режимах паддинга, в отчёт идут батчи по длине
     """
-    return (p_cnn + p_rnn) / 2.0
-
-
-def weighted_voting(p_cnn: np.ndarray, p_rnn: np.ndarray,
-                    cnn_weight: float) -> np.ndarray:
+    start = time.perf_counter()
+    p_global = rnn_model.predict(x, batch_size=batch_size, verbose=0)
+    global_s = time.perf_counter() - start
+    print(f"[INFO] RNN global padding (до {x.shape[1]}): {global_s:.3f} s, "
+          f"{global_s / max(1, len(x)) * 1000:.3f} ms/текст")
+    if not dynamic_length:
+        return p_global
+
+    from mapocr_toolkit.utils.rnn_batching import predict_bucketed
+
+    start = time.perf_counter()
+    p_bucket = predict_bucketed(rnn_model, x, batch_size=batch_size)
+    bucket_s = time.perf_counter() - start
+    print(f"[INFO] RNN bucket padding: {bucket_s:.3f} s, "
+          f"{bucket_s / max(1, len(x)) * 1000:.3f} ms/текст, "
+          f"макс. расхождение вероятностей {np.abs(p_global - p_bucket).max():.2e}")
+    return p_bucket
+
+
+def local_predictions(data_items, class_to_int, backend='keras'):
     """
-    Взвешенное среднее CNN получает больший вес, потому что
-    у неё macro F1 = 0.58 против 0.35 у RNN
+    обе модели грузятся в этот процесс; вход готовится prepare_cnn_data / prepare_rnn_data.
+    backend='tflite' - квантованные *_int8.tflite из scripts/quantize_models.py
     """
-    rnn_weight = 1.0 - cnn_weight
-    return cnn_weight * p_cnn + rnn_weight * p_rnn
+    print("[INFO] Preparing CNN data (val_split=0.35, random_state=42)...")
+    (_, _), (x_val_cnn, y_val_cnn), _ = prepare_cnn_data(
+        data_items, class_to_int,
+        val_split_size=VAL_SPLIT,
+        random_state_value=RANDOM_STATE,
+    )
+    y_val_int = np.argmax(y_val_cnn, axis=1)  # истинные метки — одинаковы для обеих моделей
+    print(f"[INFO] CNN val shape: {x_val_cnn.shape}")
+
+    # вход RNN в том виде, на котором обучена модель: index (Embedding) или старый one-hot
+    with open(RNN_INFO_PATH, 'r', encoding='utf-8') as f:
+        rnn_info = json.load(f)
+    rnn_input_mode = rnn_info.get('input_mode', INPUT_MODE_ONE_HOT)
+
+    print(f"[INFO] Preparing RNN data (val_split=0.35, random_state=42, input_mode={rnn_input_mode})...")
+    (_, _), (x_val_rnn, y_val_rnn), _ = prepare_rnn_data(
+        data_items, class_to_int,
+        val_split_size=VAL_SPLIT,
+        random_state_value=RANDOM_STATE,
+        input_mode=rnn_input_mode,
+        max_seq_len_cap=rnn_info.get('max_seq_len'),
+    )
+    print(f"[INFO] RNN val shape: {x_val_rnn.shape}")
+
+    # убеждаемся что val сеты одного размера
+    assert len(y_val_int) == np.argmax(y_val_rnn, axis=1).shape[0], \
+        "Val sets have different sizes! Check VAL_SPLIT and RANDOM_STATE."
+
+    cnn_path, rnn_path = CNN_MODEL_PATH, RNN_MODEL_PATH
+    if backend == 'tflite':
+        cnn_path, rnn_path = str(quantized_path(cnn_path)), str(quantized_path(rnn_path))
+
+    print(f"[INFO] Loading CNN model from {cnn_path}...")
+    cnn_model = load_classifier(cnn_path)
+
+    print(f"[INFO] Loading RNN model from {rnn_path}...")
+    rnn_model = load_classifier(rnn_path)
+
+    # модели без Rescaling внутри (обученные на float32 / 255) ждут нормализованный вход
+    with open(CNN_INFO_PATH, 'r', encoding='utf-8') as f:
+        cnn_info = json.load(f)
+
+    print("[INFO] Running inference...")
+    p_cnn = cnn_model.predict(to_model_input(x_val_cnn, cnn_info), verbose=0)
+    p_rnn = predict_rnn_timed(rnn_model, x_val_rnn, dynamic_length=rnn_info.get('dynamic_length', False))
+
+    return p_cnn, p_rnn, y_val_int
 
 
-def max_confidence(p_cnn: np.ndarray, p_rnn: np.ndarray) -> np.ndarray:
+def server_predictions(url, data_items, class_to_int, class_names):
     """
-    Для каждого примера побеждает та модель, у которой
-    максимальная вероятность выше
+    вероятности с запущенного scripts/ensemble_server.py: тот же val сет, что
+    у prepare_cnn_data (split_cnn_items), кропы сервер читает сам, TF здесь не загружается
     """
-    # np.max по axis=1 — максимум по классам для каждого примера
-    cnn_conf = np.max(p_cnn, axis=1)  # shape: (N,)
-    rnn_conf = np.max(p_rnn, axis=1)  # shape: (N,)
+    client = EnsembleClient(url)
+    _, val_items = split_cnn_items(data_items, val_split_size=VAL_SPLIT, random_state_value=RANDOM_STATE)
+    print(f"[INFO] Inference на сервере {url}: {len(val_items)} val items...")
 
-    # для каждого примера выбираем строку из той модели, где уверенность выше
-    cnn_wins = (cnn_conf >= rnn_conf)
+    start = time.perf_counter()
+    p_cnn, cnn_ok, p_rnn, classes = client.predict([path for path, _, _ in val_items],
+                                                   [text for _, text, _ in val_items])
+    print(f"[INFO] Server inference: {time.perf_counter() - start:.2f} s")
+    if not cnn_ok.all():
+        print(f"[WARNING] {int((~cnn_ok).sum())} кропов сервер не прочитал — для них CNN prior равномерный")
+
+    y_val_int = np.array([class_to_int[label] for _, _, label in val_items])
+    return reorder_columns(p_cnn, classes, class_names), reorder_columns(p_rnn, classes, class_names), y_val_int
 
-    result = np.where(
-        cnn_wins[:, np.newaxis],  # нужна ось чтобы broadcasting сработал по классам
-        p_cnn,
-        p_rnn
-    )
-    return result
 
 def print_report(name: str, y_true: np.ndarray, y_pred: np.ndarray,
                  class_names: list) -> dict:
@@ -145,6 +212,19 @@ def main():
         default=0.65,
         help='Вес CNN при weighted voting (default: 0.65). RNN получит 1 - cnn_weight.',
     )
+    parser.add_argument(
+        '--server',
+        nargs='?',
+        const=DEFAULT_URL,
+        default=None,
+        help=f'Брать вероятности у запущенного scripts/ensemble_server.py (default URL: {DEFAULT_URL})',
+    )
+    parser.add_argument(
+        '--backend',
+        choices=['keras', 'tflite'],
+        default='keras',
+        help='tflite - квантованные модели из scripts/quantize_models.py (без --server)',
+    )
     args = parser.parse_args()
 
     os.makedirs(ENSEMBLE_DIR, exist_ok=True)
@@ -160,36 +240,10 @@ def main():
     class_names = [int_to_class[i] for i in range(num_classes)]
     print(f"[INFO] {len(data_items)} items, {num_classes} classes: {class_names}")
 
-    print("[INFO] Preparing CNN data (val_split=0.35, random_state=42)...")
-    (_, _), (x_val_cnn, y_val_cnn), _ = prepare_cnn_data(
-        data_items, class_to_int,
-        val_split_size=VAL_SPLIT,
-        random_state_value=RANDOM_STATE,
-    )
-    y_val_int = np.argmax(y_val_cnn, axis=1)  # истинные метки — одинаковы для обеих моделей
-    print(f"[INFO] CNN val shape: {x_val_cnn.shape}")
-
-    print("[INFO] Preparing RNN data (val_split=0.35, random_state=42)...")
-    (_, _), (x_val_rnn, y_val_rnn), _ = prepare_rnn_data(
-        data_items, class_to_int,
-        val_split_size=VAL_SPLIT,
-        random_state_value=RANDOM_STATE,
-    )
-    print(f"[INFO] RNN val shape: {x_val_rnn.shape}")
-
-    # убеждаемся что val сеты одного размера
-    assert len(y_val_int) == np.argmax(y_val_rnn, axis=1).shape[0], \
-        "Val sets have different sizes! Check VAL_SPLIT and RANDOM_STATE."
-
-    print(f"[INFO] Loading CNN model from {CNN_MODEL_PATH}...")
-    cnn_model = tf.keras.models.load_model(CNN_MODEL_PATH)
-
-    print(f"[INFO] Loading RNN model from {RNN_MODEL_PATH}...")
-    rnn_model = tf.keras.models.load_model(RNN_MODEL_PATH)
-
-    print("[INFO] Running inference...")
-    p_cnn = cnn_model.predict(x_val_cnn, verbose=0)
-    p_rnn = rnn_model.predict(x_val_rnn, verbose=0)
+    if args.server:
+        p_cnn, p_rnn, y_val_int = server_predictions(args.server, data_items, class_to_int, class_names)
+    else:
+        p_cnn, p_rnn, y_val_int = local_predictions(data_items, class_to_int, args.backend)
 
     y_pred_cnn = np.argmax(p_cnn, axis=1)
     y_pred_rnn = np.argmax(p_rnn, axis=1)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Локальный сервер ансамбля CNN+RNN: модели загружаются один раз, дальше
+visualize_map.py и ensemble_eval.py ходят сюда с --server вместо того,
+чтобы на каждом запуске импортировать TensorFlow и грузить обе модели.
+
+запросы разных клиентов склеиваются в общие батчи (микробатчинг с дедлайном),
+ветки CNN и RNN одного батча считаются параллельно в двух потоках.
+
+Запуск из корня репозитория:
+    python scripts/ensemble_server.py
+    python scripts/ensemble_server.py --port 8766 --max-batch 256 --max-wait-ms 10
+    python scripts/ensemble_server.py --fused models/demo/ensemble/fused
+
+API:
+    GET  /health   -> {"ok": true, "classes": [...], ...}
+    GET  /stats    -> {"latency_ms": {"p50", "p95", "p99"}, "batch_size": {...}, ...}
+    POST /predict  {"items": [{"path": "...", "ocr_text": "..."},
+                              {"image_b64": "...", "ocr_text": "..."}]}
+                   -> {"classes": [...], "cnn": [[...]], "cnn_ok": [...], "rnn": [[...]]}
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+SCRIPT_DIR   = Path(__file__).resolve().parent
+PROJECT_ROOT = SCRIPT_DIR.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from mapocr_toolkit.ensemble.batcher import DEFAULT_MAX_BATCH, DEFAULT_MAX_WAIT_MS, MicroBatcher
+from mapocr_toolkit.ensemble.client import DEFAULT_URL
+from mapocr_toolkit.ensemble.predictor import DEFAULT_BATCH_SIZE, EnsemblePredictor
+
+MODELS_DIR     = PROJECT_ROOT / 'models' / 'demo'
+CNN_MODEL_PATH = MODELS_DIR / 'cnn' / 'cnn_model.keras'
+RNN_MODEL_PATH = MODELS_DIR / 'rnn' / 'rnn_model.keras'
+CNN_INFO_PATH  = MODELS_DIR / 'cnn' / 'cnn_processing_info.json'
+RNN_INFO_PATH  = MODELS_DIR / 'rnn' / 'rnn_processing_info.json'
+
+DEFAULT_PORT = int(DEFAULT_URL.rsplit(':', 1)[1])
+
+
+def check_items(items) -> None:
+    """
+    ValueError на элементах, которые упадут внутри общего батча: там ошибка
+    одного клиента вернула бы 500 всем запросам, склеенным с ним
+    """
+    if not isinstance(items, list):
+        raise ValueError('items должен быть списком')
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValueError(f'items[{i}] должен быть объектом')
+        if not isinstance(item.get('ocr_text'), str):
+            raise ValueError(f'items[{i}].ocr_text должен быть строкой')
+        # path: null - кропа нет, CNN получит равномерный prior (так шлёт client.py)
+        for key in ('image_b64', 'path'):
+            if item.get(key) is not None and not isinstance(item[key], str):
+                raise ValueError(f'items[{i}].{key} должен быть строкой')
+
+
+def make_handler(predictor: EnsemblePredictor, batcher: MicroBatcher, started: float):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *_): pass
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._send_json(200, {
+                    'ok': True,
+                    'classes': predictor.classes,
+                    'uptime_s': round(time.time() - started, 1),
+                    'batches': batcher.batches,
+                    'items': batcher.items,
+                })
+            elif self.path == '/stats':
+                self._send_json(200, batcher.stats())
+            else:
+                self._send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if self.path != '/predict':
+                self._send_json(404, {'error': 'not found'})
+                return
+
+            try:
+                n = int(self.headers.get('Content-Length', 0))
+                items = json.loads(self.rfile.read(n).decode('utf-8'))['items']
+                check_items(items)
+            except (ValueError, KeyError, TypeError) as e:
+                self._send_json(400, {'error': f'некорректный запрос: {e}'})
+                return
+
+            try:
+                result = batcher.submit(items).result()
+            except Exception as e:
+                print(f'[ERROR] predict: {e}')
+                self._send_json(500, {'error': str(e)})
+                return
+
+            # с --fused в ответе есть ещё 'ensemble' - вероятности после голосования в графе
+            self._send_json(200, {'classes': predictor.classes,
+                                  **{key: value.tolist() for key, value in result.items()}})
+
+        def _send_json(self, code, data):
+            body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description='Сервер ансамбля CNN+RNN с микробатчингом',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH,
+                        help='сколько элементов максимум склеивается в один вызов моделей')
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help='сколько первый запрос ждёт попутчиков перед запуском батча')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='batch_size для model.predict внутри батча')
+    parser.add_argument('--sequential-branches', action='store_true',
+                        help='CNN и RNN одного батча по очереди в одном потоке (для сравнения)')
+    parser.add_argument('--fused', type=Path, default=None,
+                        help='SavedModel из scripts/export_fused_ensemble.py вместо двух моделей')
+    parser.add_argument('--cnn-model', type=Path, default=CNN_MODEL_PATH)
+    parser.add_argument('--rnn-model', type=Path, default=RNN_MODEL_PATH)
+    parser.add_argument('--cnn-info', type=Path, default=CNN_INFO_PATH)
+    parser.add_argument('--rnn-info', type=Path, default=RNN_INFO_PATH)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+
+    paths = (args.fused,) if args.fused else (args.cnn_model, args.rnn_model, args.cnn_info, args.rnn_info)
+    for path in paths:
+        if not path.exists():
+            print(f'[ERROR] Файл не найден: {path}')
+            sys.exit(1)
+
+    print('[INFO] Загрузка моделей...')
+    start = time.perf_counter()
+    if args.fused:
+        from mapocr_toolkit.ensemble.fused import FusedEnsemblePredictor
+        predictor = FusedEnsemblePredictor.from_dir(args.fused, batch_size=args.batch_size)
+    else:
+        predictor = EnsemblePredictor.from_paths(args.cnn_model, args.cnn_info, args.rnn_model, args.rnn_info,
+                                                 batch_size=args.batch_size)
+    print(f'[INFO] Модели загружены за {time.perf_counter() - start:.1f} s, классы: {predictor.classes}')
+
+    fn = predictor.predict if args.sequential_branches else predictor.branches
+    batcher = MicroBatcher(fn, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(predictor, batcher, time.time()))
+    print(f'[INFO] Сервер ансамбля: http://{args.host}:{args.port}  (Ctrl+C - остановить)')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print('\n[INFO] Остановка...')
+    finally:
+        server.server_close()
+        batcher.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+scripts/export_fused_ensemble.py
+собирает CNN, RNN и выбранную стратегию голосования в один граф с двумя
+входами (кроп и индексы символов) и сохраняет его одним SavedModel.
+cnn_weight зашивается в граф.
+
+после экспорта fused-граф сверяется с раздельным путём (две модели +
+ensemble/voting.py) на val сете: максимум расхождения вероятностей,
+совпадение argmax и время inference обоих вариантов
+
+запуск из корня репозитория:
+    python scripts/export_fused_ensemble.py
+    python scripts/export_fused_ensemble.py --strategy weighted --cnn-weight 0.7 --out models/demo/ensemble/fused
+    python scripts/export_fused_ensemble.py --check 0
+
+использование:
+    python scripts/visualize_map.py --map ... --fused models/demo/ensemble/fused
+    python scripts/ensemble_server.py --fused models/demo/ensemble/fused
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+SCRIPT_DIR   = Path(__file__).resolve().parent
+PROJECT_ROOT = SCRIPT_DIR.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from mapocr_toolkit.ensemble.voting import DEFAULT_CNN_WEIGHT, STRATEGIES, apply_voting
+from mapocr_toolkit.utils.cnn_preprocessor import split_cnn_items
+from mapocr_toolkit.utils.data_loader import load_raw_data_paths_and_labels
+
+MODELS_DIR     = PROJECT_ROOT / 'models' / 'demo'
+CNN_MODEL_PATH = MODELS_DIR / 'cnn' / 'cnn_model.keras'
+RNN_MODEL_PATH = MODELS_DIR / 'rnn' / 'rnn_model.keras'
+CNN_INFO_PATH  = MODELS_DIR / 'cnn' / 'cnn_processing_info.json'
+RNN_INFO_PATH  = MODELS_DIR / 'rnn' / 'rnn_processing_info.json'
+FUSED_DIR      = MODELS_DIR / 'ensemble' / 'fused'
+
+# тот же val сет, что в train_cnn / train_rnn / ensemble_eval
+VAL_SPLIT    = 0.35
+RANDOM_STATE = 42
+
+
+def _load_json(path: Path) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def check_against_separate(separate, fused, items: list[dict], strategy: str, cnn_weight: float) -> None:
+    """fused-граф против двух predict + голосования в NumPy на одних и тех же элементах"""
+    separate.predict(items[:separate.batch_size])  # прогрев графов обеих реализаций
+    fused.predict(items[:fused.batch_size])
+
+    separate_s, parts = _timed(separate.predict, items)
+    fused_s, result = _timed(fused.predict, items)
+    reference = apply_voting(strategy, parts['cnn'], parts['rnn'], cnn_weight)
+
+    diff = float(np.abs(reference - result['ensemble']).max())
+    same = float((reference.argmax(axis=1) == result['ensemble'].argmax(axis=1)).mean())
+    n = len(items)
+    print(f'[INFO] сверка на {n} val items: макс. расхождение {diff:.2e}, argmax совпадает у {same:.2%}')
+    print(f'[INFO] две модели + NumPy: {separate_s:.2f} s ({separate_s / n * 1000:.2f} ms/элемент)')
+    print(f'[INFO] fused-граф:         {fused_s:.2f} s ({fused_s / n * 1000:.2f} ms/элемент), '
+          f'ускорение {separate_s / max(fused_s, 1e-9):.2f}x')
+    if diff > 1e-4:
+        print('[WARNING] fused-граф расходится с раздельным путём больше 1e-4')
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description='Экспорт ансамбля CNN+RNN одним SavedModel',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument('--strategy', choices=STRATEGIES, default='weighted')
+    parser.add_argument('--cnn-weight', type=float, default=DEFAULT_CNN_WEIGHT,
+                        help='вес CNN для weighted, зашивается в граф')
+    parser.add_argument('--out', type=Path, default=FUSED_DIR, help='папка SavedModel')
+    parser.add_argument('--check', type=int, default=512,
+                        help='на скольких val items сверить с раздельным путём (0 - не сверять)')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--cnn-model', type=Path, default=CNN_MODEL_PATH)
+    parser.add_argument('--rnn-model', type=Path, default=RNN_MODEL_PATH)
+    parser.add_argument('--cnn-info', type=Path, default=CNN_INFO_PATH)
+    parser.add_argument('--rnn-info', type=Path, default=RNN_INFO_PATH)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+
+    for path in (args.cnn_model, args.rnn_model, args.cnn_info, args.rnn_info):
+        if not path.exists():
+            print(f'[ERROR] Файл не найден: {path}')
+            sys.exit(1)
+
+    import tensorflow as tf
+    from mapocr_toolkit.ensemble.fused import FusedEnsemblePredictor, build_fused_model, export_fused_model
+    from mapocr_toolkit.ensemble.predictor import EnsemblePredictor
+
+    cnn_info, rnn_info = _load_json(args.cnn_info), _load_json(args.rnn_info)
+    cnn_model = tf.keras.models.load_model(str(args.cnn_model))
+    rnn_model = tf.keras.models.load_model(str(args.rnn_model))
+
+    model = build_fused_model(cnn_model, rnn_model, cnn_info, rnn_info, args.strategy, args.cnn_weight)
+    model.summary()
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    export_fused_model(model, args.out, cnn_info, rnn_info, args.strategy, args.cnn_weight)
+    size_mb = sum(p.stat().st_size for p in args.out.rglob('*') if p.is_file()) / 2**20
+    print(f'[INFO] SavedModel: {args.out} ({size_mb:.1f} MB), strategy={args.strategy}, '
+          f'cnn_weight={args.cnn_weight}')
+
+    if args.check <= 0:
+        return
+
+    data_items, _ = load_raw_data_paths_and_labels()
+    if not data_items:
+        print('[WARNING] Датасет не загружен - сверка с раздельным путём пропущена')
+        return
+    # val сет CNN: делятся только прочитанные кропы, как в prepare_cnn_data
+    _, val_items = split_cnn_items(data_items, val_split_size=VAL_SPLIT, random_state_value=RANDOM_STATE)
+    items = [{'path': path, 'ocr_text': text} for path, text, _ in val_items[:args.check]]
+
+    separate = EnsemblePredictor(cnn_model, rnn_model, cnn_info, rnn_info, batch_size=args.batch_size)
+    fused = FusedEnsemblePredictor.from_dir(args.out, batch_size=args.batch_size)
+    check_against_separate(separate, fused, items, args.strategy, args.cnn_weight)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,15 @@
 import pandas as pd
 import os
+import sys
 import shutil
 import re
 
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from mapocr_toolkit.utils.dataset_io import is_parquet, read_dataset, sibling_parquet, write_dataset
+
 # Настройки
 # INPUT_CSV = os.path.join('data', 'dataset_v1.csv')
 INPUT_CSV = os.path.join('data', 'dataset_paddle.csv')
@@ -43,14 +50,16 @@ def is_valid_text(text):
     return True
 
 def clean_dataset():
-    if not os.path.exists(INPUT_CSV):
+    # если рядом с CSV лежит Parquet-версия, читаем её
+    input_path = sibling_parquet(INPUT_CSV)
+    if not os.path.exists(input_path):
         print("Файл CSV не найден!")
         return
 
     if not os.path.exists(GARBAGE_DIR):
         os.makedirs(GARBAGE_DIR)
 
-    df = pd.read_csv(INPUT_CSV, sep=';')
+    df = read_dataset(input_path)
     print(f"Всего записей: {len(df)}")
 
     valid_rows = []
@@ -73,8 +82,10 @@ def clean_dataset():
                 except Exception as e:
                     print(f"Ошибка перемещения {filename}: {e}")
 
-    new_df = pd.DataFrame(valid_rows)
-    new_df.to_csv(OUTPUT_CSV, index=False, sep=';', encoding='utf-8-sig')
+    new_df = pd.DataFrame(valid_rows, columns=df.columns)
+    write_dataset(new_df, OUTPUT_CSV)
+    if is_parquet(input_path):
+        write_dataset(new_df, os.path.splitext(OUTPUT_CSV)[0] + '.parquet')
 
     print(f"\nГотово!")
     print(f"Осталось полезных записей: {len(valid_rows)}")
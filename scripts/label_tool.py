@@ -10,6 +10,7 @@
 """
 
 import os
+import sys
 import json
 import threading
 import webbrowser
@@ -17,6 +18,12 @@ import pandas as pd
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from mapocr_toolkit.utils.dataset_io import is_parquet, read_dataset, sibling_parquet, write_dataset
+
 # ============================================================
 #  НАСТРОЙКИ
 # ============================================================
@@ -69,14 +76,20 @@ CLASS_META = {
 # ============================================================
 #  ДАННЫЕ
 # ============================================================
+# если рядом с CSV лежит Parquet-версия не старше него, читаем её и прогресс пишем в оба формата
+INPUT_PATH = sibling_parquet(CSV_INPUT)
+PARQUET_OUTPUT = os.path.splitext(CSV_OUTPUT)[0] + '.parquet' if is_parquet(INPUT_PATH) else None
+
+
 def load_data() -> pd.DataFrame:
-    df = pd.read_csv(CSV_INPUT, sep=';', encoding='utf-8-sig')
+    df = read_dataset(INPUT_PATH, categorical=False)
     if 'label' not in df.columns:
         df['label'] = ''
 
     # Если уже есть прогресс — подгрузить
-    if os.path.exists(CSV_OUTPUT):
-        df_prev = pd.read_csv(CSV_OUTPUT, sep=';', encoding='utf-8-sig')
+    prev_path = sibling_parquet(CSV_OUTPUT)
+    if os.path.exists(prev_path):
+        df_prev = read_dataset(prev_path, categorical=False)
         if 'label' in df_prev.columns:
             lmap = df_prev.set_index('filename')['label'].to_dict()
             df['label'] = df['filename'].map(lmap).fillna(df['label'])
@@ -86,7 +99,9 @@ def load_data() -> pd.DataFrame:
 df = load_data()
 
 def save_data():
-    df.to_csv(CSV_OUTPUT, index=False, sep=';', encoding='utf-8-sig')
+    write_dataset(df, CSV_OUTPUT)
+    if PARQUET_OUTPUT:
+        write_dataset(df, PARQUET_OUTPUT)
 
 # ============================================================
 #  HTML
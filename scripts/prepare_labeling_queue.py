@@ -1,5 +1,7 @@
 """Подготовка CSV для ручной разметки на основе dataset_CLEANED_v2.csv.
 
+Вход и выход могут быть .csv или .parquet (формат по расширению).
+
 Скрипт:
 1) добавляет колонку `label`, если её нет;
 2) добавляет колонку `priority_for_labeling` на основе confidence;
@@ -9,10 +11,17 @@
 from __future__ import annotations
 
 import argparse
+import sys
 from pathlib import Path
 
 import pandas as pd
 
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from mapocr_toolkit.utils.dataset_io import read_dataset, write_dataset
+
 
 DEFAULT_INPUT = Path('data/dataset_CLEANED_v2.csv')
 DEFAULT_OUTPUT = Path('data/dataset_CLEANED_v2_labeled.csv')
@@ -20,8 +29,8 @@ DEFAULT_OUTPUT = Path('data/dataset_CLEANED_v2_labeled.csv')
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description='Подготовка очереди для ручной разметки')
-    parser.add_argument('--input', type=Path, default=DEFAULT_INPUT, help='Путь до исходного CSV')
-    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT, help='Куда сохранить CSV для разметки')
+    parser.add_argument('--input', type=Path, default=DEFAULT_INPUT, help='Путь до исходного CSV или Parquet')
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT, help='Куда сохранить CSV (или .parquet) для разметки')
     parser.add_argument(
         '--confidence-threshold',
         type=float,
@@ -43,7 +52,7 @@ def main() -> None:
     if not args.input.exists():
         raise FileNotFoundError(f'Входной файл не найден: {args.input}')
 
-    df = pd.read_csv(args.input, sep=';', encoding='utf-8-sig')
+    df = read_dataset(args.input, categorical=False)
 
     required_columns = {'filename', 'ocr_text', 'confidence'}
     missing = required_columns - set(df.columns)
@@ -64,7 +73,7 @@ def main() -> None:
         df = df.head(args.limit)
 
     args.output.parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(args.output, sep=';', index=False, encoding='utf-8-sig')
+    write_dataset(df, args.output)
 
     total = len(df)
     priority = int(df['priority_for_labeling'].sum())
@@ -5,6 +5,12 @@ import pytesseract
 from PIL import Image
 import sys
 
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from mapocr_toolkit.image_processing.patches import predict_patches
+
 RAW_IMAGES_DIR = "data/raw_demo_images"
 RAW_TEXT_DIR = "data/raw_demo_text"
 MODEL_PATH = "models/cleaner.pickle" 
@@ -20,30 +26,18 @@ def load_cleaning_model(model_path):
 
 def clean_image_rfr(image_cv, model, blur_and_threshold_func):
     gray = cv2.cvtColor(image_cv, cv2.COLOR_BGR2GRAY)
-    orig_shape = gray.shape 
-    
+
     gray_padded = cv2.copyMakeBorder(gray, 2, 2, 2, 2, cv2.BORDER_REPLICATE)
     gray_processed = blur_and_threshold_func(gray_padded) 
 
-    roi_features = [
-        gray_processed[y_p:y_p + 5, x_p:x_p + 5].flatten()
-        for y_p in range(gray_processed.shape[0] - 4) 
-        for x_p in range(gray_processed.shape[1] - 4)
-    ]
-
-    if not roi_features:
+    if gray.size == 0:
         print(f"[WARNING] Could not extract ROI features for image {image_cv.shape}. Returning original grayscale image")
         return gray
 
-    pixels = model.predict(roi_features)
-    
-    cleaned_image_flat = (pixels * 255).astype("uint8")
-    
-    if cleaned_image_flat.size != (orig_shape[0] * orig_shape[1]):
-        print(f"[WARNING] Prediction size {cleaned_image_flat.size} does not match original area {orig_shape[0] * orig_shape[1]}. Cannot reshape correctly")
-        return gray 
+    # тот же путь, что в clean_image.process_image: окна - view, predict полосами строк
+    pixels = predict_patches(model, gray_processed)
 
-    cleaned_image_cv = cleaned_image_flat.reshape(orig_shape)
+    cleaned_image_cv = (pixels * 255).astype("uint8")
     return cleaned_image_cv
 
 def recognize_text_from_image_cv(image_cv_gray, lang, config):
@@ -52,8 +46,6 @@ def recognize_text_from_image_cv(image_cv_gray, lang, config):
     return text.strip()
 
 def main_process():
-    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    sys.path.append(project_root)
     try:
         from mapocr_toolkit.image_processing.blur_and_threshold import blur_and_threshold
     except ImportError:
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+scripts/quantize_models.py
+post-training квантование CNN, RNN и CRNN в TFLite для CPU-машин разметки.
+
+CNN и CRNN - полный int8 (веса и активации), диапазоны активаций калибруются
+на случайной выборке кропов из data/dataset_crops_paddle. RNN по умолчанию -
+dynamic range (веса int8, LSTM считает во float), --rnn-mode int8 калибрует
+её на OCR-текстах датасета.
+
+рядом с каждой моделью пишется <имя>_int8.tflite; дальше
+    python scripts/ensemble_eval.py --backend tflite
+    python scripts/visualize_map.py --map ... --backend tflite
+
+на val сете (тот же split, что в train_* и ensemble_eval; у CNN / CRNN - только
+прочитанные кропы, как в prepare_cnn_data) печатается таблица
+float против квантованной: accuracy, macro F1, задержка на один элемент,
+время на элемент в батче и размер файла; она же сохраняется в JSON
+
+запуск из корня репозитория:
+    python scripts/quantize_models.py
+    python scripts/quantize_models.py --models cnn crnn --calibration-size 500 --num-threads 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from sklearn.metrics import accuracy_score, f1_score
+
+SCRIPT_DIR   = Path(__file__).resolve().parent
+PROJECT_ROOT = SCRIPT_DIR.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from mapocr_toolkit.utils.cnn_preprocessor import split_cnn_items, to_model_input
+from mapocr_toolkit.utils.crop_cache import load_crops
+from mapocr_toolkit.utils.data_loader import RAW_IMAGES_DIR, load_raw_data_paths_and_labels, split_data_items
+from mapocr_toolkit.utils.rnn_preprocessor import INPUT_MODE_INDEX, INPUT_MODE_ONE_HOT, encode_for_rnn
+from mapocr_toolkit.utils.tflite_backend import TFLiteClassifier, quantized_path
+
+MODELS_DIR  = PROJECT_ROOT / 'models' / 'demo'
+REPORT_PATH = MODELS_DIR / 'quantization_report.json'
+
+# имя -> (файл модели, processing_info, вход)
+MODEL_SPECS = {
+    'cnn':  (MODELS_DIR / 'cnn' / 'cnn_model.keras', MODELS_DIR / 'cnn' / 'cnn_processing_info.json', 'image'),
+    'rnn':  (MODELS_DIR / 'rnn' / 'rnn_model.keras', MODELS_DIR / 'rnn' / 'rnn_processing_info.json', 'text'),
+    'crnn': (MODELS_DIR / 'crnn' / 'crnn_model.keras', MODELS_DIR / 'crnn' / 'crnn_processing_info.json', 'image'),
+}
+
+VAL_SPLIT    = 0.35
+RANDOM_STATE = 42
+
+
+def _load_json(path: Path) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _labels(items: list, info: dict) -> tuple[list, np.ndarray]:
+    """элементы с классами, которые модель знает (у CRNN свой набор), и их индексы"""
+    class_to_int = info['class_to_int_map']
+    kept = [item for item in items if item[2] in class_to_int]
+    return kept, np.array([class_to_int[label] for _, _, label in kept], dtype=np.int64)
+
+
+def image_inputs(items: list, info: dict) -> tuple[np.ndarray, np.ndarray]:
+    items, y = _labels(items, info)
+    crops, ok = load_crops([path for path, _, _ in items], tuple(info.get('target_size', (60, 200))), cache_dir=None)
+    return to_model_input(np.asarray(crops)[ok], info), y[ok]
+
+
+def text_inputs(items: list, info: dict) -> tuple[np.ndarray, np.ndarray]:
+    items, y = _labels(items, info)
+    return encode_for_rnn([text for _, text, _ in items], info), y
+
+
+def input_spec(kind: str, info: dict):
+    import tensorflow as tf
+
+    if kind == 'image':
+        return tuple(info.get('target_size', (60, 200))) + (3,), tf.float32
+    if info.get('input_mode', INPUT_MODE_ONE_HOT) == INPUT_MODE_INDEX:
+        return (int(info['max_seq_len']),), tf.int32
+    return (int(info['max_seq_len']), int(info['num_chars_vocab'])), tf.float32
+
+
+def measure(predict_batch, x: np.ndarray, y: np.ndarray, batch_size: int, latency_size: int) -> dict:
+    """accuracy / macro F1 по всему x, медиана задержки одного элемента, время на элемент в батче"""
+    predict_batch(x[:batch_size])  # прогрев
+
+    start = time.perf_counter()
+    probs = np.concatenate([predict_batch(x[i:i + batch_size]) for i in range(0, len(x), batch_size)])
+    batch_ms = (time.perf_counter() - start) / max(1, len(x)) * 1000
+
+    single = []
+    for i in range(min(latency_size, len(x))):
+        start = time.perf_counter()
+        predict_batch(x[i:i + 1])
+        single.append((time.perf_counter() - start) * 1000)
+
+    y_pred = probs.argmax(axis=1)
+    return {
+        'accuracy': float(accuracy_score(y, y_pred)),
+        'macro_f1': float(f1_score(y, y_pred, average='macro', zero_division=0)),
+        'latency_ms': float(np.median(single)) if single else 0.0,
+        'batch_ms_per_item': batch_ms,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description='int8-квантование CNN / RNN / CRNN в TFLite и сравнение с float',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument('--models', nargs='+', choices=list(MODEL_SPECS), default=list(MODEL_SPECS))
+    parser.add_argument('--crops-dir', default=RAW_IMAGES_DIR, help='откуда брать кропы для калибровки')
+    parser.add_argument('--calibration-size', type=int, default=300)
+    parser.add_argument('--rnn-mode', choices=['dynamic', 'int8'], default='dynamic')
+    parser.add_argument('--num-threads', type=int, default=None, help='потоки TFLite (по умолчанию - решает рантайм)')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--latency-size', type=int, default=200,
+                        help='на скольких элементах мерить задержку batch=1')
+    parser.add_argument('--report', type=Path, default=REPORT_PATH)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+
+    import tensorflow as tf
+    from mapocr_toolkit.utils.quantization import calibration_crops, calibration_paths, convert_to_tflite
+
+    print('[INFO] Loading dataset...')
+    data_items, _ = load_raw_data_paths_and_labels()
+    if not data_items:
+        print('[ERROR] No data items loaded.')
+        sys.exit(1)
+    # RNN делит все элементы (prepare_rnn_data), CNN и CRNN - только прочитанные кропы
+    train_items, val_items = split_data_items(data_items, VAL_SPLIT, RANDOM_STATE)
+    image_val_items = None
+
+    report = {}
+    for name in args.models:
+        model_path, info_path, kind = MODEL_SPECS[name]
+        if not model_path.exists() or not info_path.exists():
+            print(f'[WARNING] {name}: нет {model_path.name} или {info_path.name}, пропуск')
+            continue
+
+        print(f'\n[INFO] {name}: {model_path}')
+        info = _load_json(info_path)
+        # в CRNN есть Lambda (squeeze) - её байткод грузится только с safe_mode=False
+        load_kwargs = {'safe_mode': False, 'custom_objects': {'tf': tf}} if name == 'crnn' else {}
+        model = tf.keras.models.load_model(str(model_path), **load_kwargs)
+
+        if kind == 'image':
+            mode = 'int8'
+            if image_val_items is None:
+                _, image_val_items = split_cnn_items(data_items, val_split_size=VAL_SPLIT,
+                                                     random_state_value=RANDOM_STATE)
+            x, y = image_inputs(image_val_items, info)
+            paths = calibration_paths(args.crops_dir, args.calibration_size, RANDOM_STATE)
+            calibration = to_model_input(calibration_crops(paths, tuple(info.get('target_size', (60, 200)))), info)
+            print(f'[INFO] калибровка на {len(calibration)} кропах из {args.crops_dir}')
+        else:
+            mode = args.rnn_mode
+            x, y = text_inputs(val_items, info)
+            sample = train_items[:args.calibration_size]
+            calibration = encode_for_rnn([text for _, text, _ in sample], info)
+
+        if len(x) == 0:
+            print(f'[WARNING] {name}: пустой val сет, пропуск')
+            continue
+
+        shape, dtype = input_spec(kind, info)
+        start = time.perf_counter()
+        tflite_bytes = convert_to_tflite(model, shape, mode,
+                                         representative=lambda: (calibration[i:i + 1] for i in range(len(calibration))),
+                                         input_dtype=dtype)
+        out_path = quantized_path(model_path)
+        out_path.write_bytes(tflite_bytes)
+        print(f'[INFO] {mode}: {out_path} за {time.perf_counter() - start:.1f} s')
+
+        tflite = TFLiteClassifier(out_path, num_threads=args.num_threads)
+        report[name] = {
+            'mode': mode,
+            'val_items': int(len(x)),
+            'float': {'size_mb': os.path.getsize(model_path) / 2**20,
+                      **measure(lambda batch: np.asarray(model(batch, training=False)),
+                                x, y, args.batch_size, args.latency_size)},
+            'quantized': {'size_mb': tflite.size_bytes / 2**20,
+                          **measure(tflite.predict_on_batch, x, y, args.batch_size, args.latency_size)},
+        }
+
+    if not report:
+        print('[ERROR] Ни одна модель не квантована.')
+        sys.exit(1)
+
+    header = (f"{'модель':<6} {'вариант':<10} {'MB':>7} {'accuracy':>9} {'macro F1':>9} "
+              f"{'1 элем., ms':>12} {'в батче, ms':>12}")
+    print('\n' + header)
+    print('-' * len(header))
+    for name, row in report.items():
+        for variant in ('float', 'quantized'):
+            r = row[variant]
+            label = 'float32' if variant == 'float' else row['mode']
+            print(f"{name:<6} {label:<10} {r['size_mb']:>7.2f} {r['accuracy']:>9.4f} {r['macro_f1']:>9.4f} "
+                  f"{r['latency_ms']:>12.3f} {r['batch_ms_per_item']:>12.3f}")
+        f, q = row['float'], row['quantized']
+        print(f"{'':<6} {'разница':<10} {q['size_mb'] / f['size_mb']:>6.2f}x {q['accuracy'] - f['accuracy']:>+9.4f} "
+              f"{q['macro_f1'] - f['macro_f1']:>+9.4f} {f['latency_ms'] / max(q['latency_ms'], 1e-9):>11.2f}x "
+              f"{f['batch_ms_per_item'] / max(q['batch_ms_per_item'], 1e-9):>11.2f}x")
+
+    args.report.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.report, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=4)
+    print(f'\n[INFO] Отчёт: {args.report}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,30 @@
+import argparse
+import multiprocessing as mp
 import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import cv2
 import numpy as np
 import pandas as pd
 from paddleocr import PaddleOCR
-from PIL import Image
 from tqdm import tqdm
 import logging
-import math
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from mapocr_toolkit.image_processing.blur_and_threshold import ink_density
+from mapocr_toolkit.image_processing.tile_reader import open_tile_reader
+from mapocr_toolkit.utils.dataset_io import read_dataset, write_dataset
+from mapocr_toolkit.utils.ocr_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_MB, OcrCache, window_key
+from mapocr_toolkit.utils.run_manifest import RunManifest
+from mapocr_toolkit.utils.sliding_window import compute_windows
+from mapocr_toolkit.utils.tile_dedup import StreamingDeduplicator
 
 # Глушим логи Paddle
 logging.getLogger("ppocr").setLevel(logging.ERROR)
@@ -16,6 +34,8 @@ os.environ["FLAGS_allocator_strategy"] = 'auto_growth'
 INPUT_DIR = os.path.join('data', 'raw_tifs')
 OUTPUT_IMG_DIR = os.path.join('data', 'dataset_crops_paddle')
 OUTPUT_CSV = os.path.join('data', 'dataset_paddle.csv')
+# журнал законченных окон: по нему перезапуск продолжает прогон, а CSV собирается заново
+MANIFEST_PATH = os.path.join('data', 'dataset_paddle.manifest.jsonl')
 
 PADDING = 10
 CONFIDENCE_THRESHOLD = 0.6
@@ -24,23 +44,343 @@ CONFIDENCE_THRESHOLD = 0.6
 SLICE_SIZE = 2000
 OVERLAP = 400
 
-# Инициализация PaddleOCR v3
-ocr = PaddleOCR(
-    lang='ru',
-    text_det_limit_side_len=SLICE_SIZE + 100,
-    text_det_limit_type='max',
-    use_doc_orientation_classify=False,  # не определять угол поворота документа
-    use_doc_unwarping=False,             # не выпрямлять геометрические искажения
-    use_textline_orientation=False,      # не поворачивать отдельные строки текста
-)
+IOU_THRESHOLD = 0.5
+CSV_COLUMNS = ['filename', 'ocr_text', 'confidence', 'global_box', 'source_map']
+
+# сколько окон на одного воркера может стоять в очереди (--workers)
+QUEUE_PER_WORKER = 2
+
+# сколько окон уходит в один вызов ocr.predict (--batch-size)
+BATCH_SIZE = 1
+# размер батча распознавания строк внутри PaddleOCR; при батче окон
+# строки со всех окон распознаются пачками побольше
+REC_BATCH_PER_WINDOW = 8
+
+# окна с долей "чернил" ниже порога не отдаются в OCR (поля, лес, вода).
+# 0 - пре-фильтр выключен; подпись в одно короткое слово даёт ~5e-5,
+# порог лучше подбирать через --dry-run-skip
+SKIP_BLANK_THRESHOLD = 0.0
+# масштаб уменьшенной копии окна, на которой считается плотность
+INK_SCALE = 0.25
+
 # =============================================
 
-def process_tiffs():
+# параметры движка, от которых зависит ответ: они же входят в ключ кэша OCR
+OCR_CONFIG = {
+    'lang': 'ru',
+    'text_det_limit_side_len': SLICE_SIZE + 100,
+    'text_det_limit_type': 'max',
+    'use_doc_orientation_classify': False,  # не определять угол поворота документа
+    'use_doc_unwarping': False,             # не выпрямлять геометрические искажения
+    'use_textline_orientation': False,      # не поворачивать отдельные строки текста
+}
+
+
+def create_ocr(cpu_threads=None, batch_size=1):
+    """Инициализация PaddleOCR v3. В режиме --workers у каждого процесса свой экземпляр"""
+    kwargs = dict(OCR_CONFIG)
+    if cpu_threads:
+        kwargs['cpu_threads'] = cpu_threads
+    if batch_size > 1:
+        kwargs['text_recognition_batch_size'] = REC_BATCH_PER_WINDOW * batch_size
+    return PaddleOCR(**kwargs)
+
+
+def ocr_cache_config():
+    """настройки движка для ключа кэша, вместе с версией paddleocr"""
+    import paddleocr
+    return dict(OCR_CONFIG, paddleocr=getattr(paddleocr, '__version__', ''))
+
+
+def _append_csv(records, csv_path, write_header):
+    # дописываем финальные записи сразу, не копим весь датасет в памяти
+    df = pd.DataFrame(records, columns=CSV_COLUMNS)
+    df.to_csv(csv_path, mode='a', header=write_header, index=False, sep=';', encoding='utf-8-sig')
+
+
+def parse_ocr_result(res_obj):
+    """сырой ответ PaddleOCR по окну -> (boxes, texts, scores) из обычных списков,
+    чтобы результат можно было вернуть из воркера"""
+    # Извлечение данных
+    data = {}
+    if hasattr(res_obj, 'json'):
+        raw_json = res_obj.json
+        if isinstance(raw_json, dict):
+            data = raw_json.get('res', raw_json)
+
+    # rec_boxes — правильные координаты в формате [x_min, y_min, x_max, y_max]
+    # dt_polys — координаты ПОСЛЕ внутреннего поворота, не подходят для кропа
+    boxes  = data.get('rec_boxes', [])
+    texts  = data.get('rec_texts', data.get('rec_text', []))
+    scores = data.get('rec_scores', data.get('rec_score', []))
+
+    if not len(boxes) or not len(texts):
+        return [], [], []
+    return np.asarray(boxes).tolist(), list(texts), np.asarray(scores, dtype=object).tolist()
+
+
+def run_window_ocr(ocr, slice_img, x_start, y_start):
+    """распознавание одного окна; при ошибке печатает её и возвращает None"""
+    try:
+        results = list(ocr.predict(slice_img))
+    except Exception as e:
+        print(f"\n[SLICE ERROR] Слайс y={y_start} x={x_start}: {type(e).__name__}: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+    if not results:
+        return [], [], []
+    return parse_ocr_result(results[0])
+
+
+def run_batch_ocr(ocr, slice_imgs, windows):
+    """
+    распознавание нескольких окон одним вызовом predict: детекция идёт по
+    списку окон, а строки со всех окон распознаются общими батчами.
+    если батч упал, окна перепрогоняются по одному, чтобы ошибку получило
+    только проблемное окно
+    """
+    if len(slice_imgs) == 1:
+        return [run_window_ocr(ocr, slice_imgs[0], windows[0][0], windows[0][1])]
+
+    try:
+        results = list(ocr.predict(list(slice_imgs)))
+        if len(results) == len(slice_imgs):
+            return [parse_ocr_result(res) for res in results]
+        print(f"\n[WARNING] predict вернул {len(results)} результатов на {len(slice_imgs)} окон, повтор по одному")
+    except Exception as e:
+        print(f"\n[WARNING] Батч из {len(slice_imgs)} окон упал ({type(e).__name__}: {e}), повтор по одному")
+
+    return [run_window_ocr(ocr, img, w[0], w[1]) for img, w in zip(slice_imgs, windows)]
+
+
+# ── режим --workers: у каждого процесса свой OCR и свой TileReader ──────────
+
+_worker_ocr = None
+_worker_reader = None
+_worker_cache = None
+_worker_cache_config = None
+
+
+def _init_worker(cpu_threads, batch_size, cache_path=None):
+    global _worker_ocr, _worker_cache, _worker_cache_config
+    logging.getLogger("ppocr").setLevel(logging.ERROR)
+    _worker_ocr = create_ocr(cpu_threads=cpu_threads, batch_size=batch_size)
+    if cache_path:
+        # воркер только читает кэш; запись и LRU - в главном процессе
+        _worker_cache = OcrCache(cache_path)
+        _worker_cache_config = ocr_cache_config()
+
+
+def _worker_ocr_windows(tiff_path, windows):
+    """
+    задача воркера: по координатам окон сам читает пиксели, ищет их в кэше
+    и распознаёт промахи. возвращает (key, result, hit) по каждому окну -
+    окно декодируется и хэшируется один раз, здесь, а не ещё и в главном процессе
+    """
+    global _worker_reader
+    if _worker_reader is None or str(_worker_reader.path) != tiff_path:
+        if _worker_reader is not None:
+            _worker_reader.close()
+        _worker_reader = open_tile_reader(tiff_path)
+
+    slice_imgs = [_worker_reader.read(*window) for window in windows]
+    if _worker_cache is None:
+        keys, cached = [None] * len(windows), [None] * len(windows)
+    else:
+        keys = [window_key(img, _worker_cache_config) for img in slice_imgs]
+        cached = [_worker_cache.get(key, touch=False) for key in keys]
+
+    miss = [i for i, result in enumerate(cached) if result is None]
+    fresh = run_batch_ocr(_worker_ocr, [slice_imgs[i] for i in miss], [windows[i] for i in miss]) if miss else []
+    fresh = iter(fresh)
+    return [(key, result, True) if result is not None else (key, next(fresh), False)
+            for key, result in zip(keys, cached)]
+
+
+def iter_window_results(windows, tiff_path, reader, ocr=None, pool=None, max_pending=1, batch_size=1,
+                        cache=None):
+    """
+    (window_idx, window, (boxes, texts, scores)) строго в порядке окон.
+    окна уходят в OCR пачками по batch_size. с пулом в очереди держится не
+    больше max_pending пачек: воркеры получают только координаты, а
+    результаты забираются по порядку, поэтому имена кропов и CSV не зависят
+    ни от числа воркеров, ни от размера батча.
+
+    с cache окна сначала ищутся в кэше по хэшу пикселей, в OCR уходят только
+    промахи: без пула - в этом процессе, с пулом - в воркере, который и так
+    декодирует окно (он отдаёт ключи, а запись в кэш остаётся здесь).
+    окно, на котором движок упал, отдаётся с None вместо результата и не кэшируется
+    """
+    batches = [list(range(i, min(i + batch_size, len(windows))))
+               for i in range(0, len(windows), batch_size)]
+    cache_config = ocr_cache_config() if cache is not None else None
+
+    def lookup(slice_imgs):
+        if cache is None:
+            return [None] * len(slice_imgs), [None] * len(slice_imgs)
+        keys = [window_key(img, cache_config) for img in slice_imgs]
+        return keys, [cache.get(key) for key in keys]
+
+    def merge(keys, cached, fresh):
+        fresh = iter(fresh)
+        merged = []
+        for key, result in zip(keys, cached):
+            if result is None:
+                result = next(fresh)
+                if result is not None and cache is not None:
+                    cache.put(key, result)
+            merged.append(result)
+        return merged
+
+    if pool is None:
+        for batch in batches:
+            batch_windows = [windows[i] for i in batch]
+            slice_imgs = [reader.read(*window) for window in batch_windows]
+            keys, cached = lookup(slice_imgs)
+
+            miss = [i for i, result in enumerate(cached) if result is None]
+            fresh = run_batch_ocr(ocr, [slice_imgs[i] for i in miss], [batch_windows[i] for i in miss]) if miss else []
+            yield from zip(batch, batch_windows, merge(keys, cached, fresh))
+        return
+
+    in_flight = deque()
+    next_batch = 0
+    try:
+        while next_batch < len(batches) or in_flight:
+            while next_batch < len(batches) and len(in_flight) < max_pending:
+                batch = batches[next_batch]
+                future = pool.submit(_worker_ocr_windows, tiff_path, [windows[i] for i in batch])
+                in_flight.append((batch, future))
+                next_batch += 1
+
+            batch, future = in_flight.popleft()
+            merged = []
+            for key, result, hit in future.result():
+                if cache is not None and key is not None:
+                    cache.record_lookup(key, hit)
+                    if not hit and result is not None:
+                        cache.put(key, result)
+                merged.append(result)
+            yield from zip(batch, [windows[i] for i in batch], merged)
+    finally:
+        # при прерывании не ждём пачки, которые ещё не начались
+        for _, future in in_flight:
+            future.cancel()
+
+
+def screen_windows(reader, windows, threshold):
+    """плотность чернил по каждому окну и маска окон, которые можно не распознавать"""
+    scores = np.array([ink_density(reader.read(*window), scale=INK_SCALE) for window in windows])
+    return scores, scores < threshold
+
+
+def dry_run_screen(tiff_files, threshold):
+    """только пре-фильтр: какие окна были бы пропущены, без OCR и без записи CSV"""
+    total_windows = 0
+    total_skipped = 0
+
+    for tiff_file in tiff_files:
+        tiff_path = os.path.join(INPUT_DIR, tiff_file)
+        with open_tile_reader(tiff_path) as reader:
+            windows = compute_windows(reader.height, reader.width, SLICE_SIZE, OVERLAP)
+            t0 = time.perf_counter()
+            scores, skip = screen_windows(reader, windows, threshold)
+            elapsed = time.perf_counter() - t0
+
+        print(f"\n===== {tiff_file}: пропуск {int(skip.sum())}/{len(windows)} окон "
+              f"(порог {threshold:g}, проверка {elapsed:.1f} с) =====")
+        for (x_start, y_start, x_end, y_end), score, sk in zip(windows, scores, skip):
+            if sk:
+                print(f"  [SKIP] x={x_start}-{x_end} y={y_start}-{y_end} плотность={score:.2e}")
+
+        total_windows += len(windows)
+        total_skipped += int(skip.sum())
+
+    print(f"\n[INFO] Было бы пропущено окон: {total_skipped} из {total_windows}")
+
+
+def extract_window_records(ocr_data, slice_img, x_start, y_start, tiff_file, counter_start):
+    """фильтрует распознанное в одном окне, режет и сохраняет кропы"""
+    records = []
+    counter = counter_start
+    boxes, texts, scores = ocr_data
+
+    if not boxes or not texts:
+        return records
+
+    for i in range(len(texts)):
+        try:
+            # rec_boxes формат: [x_min, y_min, x_max, y_max]
+            box = np.array(boxes[i])
+            if box.size != 4:
+                continue
+            x_min, y_min, x_max, y_max = box.astype(np.int32)
+
+            text = texts[i]
+            score = scores[i]
+            if isinstance(score, list):
+                score = score[0]
+
+            if float(score) < CONFIDENCE_THRESHOLD:
+                continue
+            if len(str(text).strip()) < 2:
+                continue
+
+            # Вырезаем из слайса с отступом
+            x_min_p = max(0, x_min - PADDING)
+            y_min_p = max(0, y_min - PADDING)
+            x_max_p = min(slice_img.shape[1], x_max + PADDING)
+            y_max_p = min(slice_img.shape[0], y_max + PADDING)
+
+            crop = slice_img[y_min_p:y_max_p, x_min_p:x_max_p]
+            if crop.size == 0:
+                continue
+
+            # Глобальные координаты на исходной карте
+            global_box = [
+                [int(x_min + x_start), int(y_min + y_start)],
+                [int(x_max + x_start), int(y_max + y_start)],
+            ]
+
+            # Сохраняем
+            crop_bgr = cv2.cvtColor(crop, cv2.COLOR_RGB2BGR)
+            crop_filename = f"{os.path.splitext(tiff_file)[0]}_x{x_start}_y{y_start}_{counter}.jpg"
+            save_path = os.path.join(OUTPUT_IMG_DIR, crop_filename)
+            cv2.imwrite(save_path, crop_bgr)
+
+            records.append({
+                'filename':   crop_filename,
+                'ocr_text':   text,
+                'confidence': round(float(score), 4),
+                'global_box': global_box,
+                'source_map': tiff_file,
+            })
+            counter += 1
+
+        except Exception:
+            continue
+
+    return records
+
+
+def manifest_config():
+    """параметры, от которых зависят записи окон: с другими журнал не годится"""
+    return {
+        'slice_size': SLICE_SIZE,
+        'overlap': OVERLAP,
+        'confidence_threshold': CONFIDENCE_THRESHOLD,
+        'padding': PADDING,
+    }
+
+
+def process_tiffs(workers=1, batch_size=BATCH_SIZE, skip_blank_threshold=SKIP_BLANK_THRESHOLD, dry_run=False,
+                  manifest_path=MANIFEST_PATH, fresh=False, use_cache=True, cache_size_mb=DEFAULT_MAX_MB,
+                  parquet=False):
     if not os.path.exists(OUTPUT_IMG_DIR):
         os.makedirs(OUTPUT_IMG_DIR)
 
-    dataset_records = []
-
     if not os.path.exists(INPUT_DIR):
         print(f"[ERROR] Папка {INPUT_DIR} не найдена!")
         return
@@ -48,154 +388,237 @@ def process_tiffs():
     tiff_files = [f for f in os.listdir(INPUT_DIR) if f.lower().endswith(('.tif', '.tiff'))]
     print(f"Найдено файлов: {len(tiff_files)}. Режим: Sliding Window.")
 
-    global_counter = 0
+    if dry_run:
+        dry_run_screen(tiff_files, skip_blank_threshold)
+        return
+
+    try:
+        manifest = RunManifest(manifest_path, manifest_config(), fresh=fresh)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return
+    if manifest.finished_windows:
+        print(f"[INFO] Продолжаем прогон по журналу {manifest_path}: "
+              f"готово окон {manifest.finished_windows}")
+
+    # CSV каждый раз собирается целиком: готовые окна проигрываются из журнала.
+    # пишем во временный файл и подменяем в конце, чтобы не затереть старый CSV впустую
+    partial_csv = OUTPUT_CSV + '.part'
+    if os.path.exists(partial_csv):
+        os.remove(partial_csv)
+
+    # кэш открывается до пула: воркеры читают ту же базу
+    cache = OcrCache(DEFAULT_CACHE_PATH, max_mb=cache_size_mb) if use_cache else None
+    if cache is not None:
+        print(f"[INFO] Кэш OCR: {DEFAULT_CACHE_PATH} ({cache.size_bytes / 2**20:.1f} из {cache_size_mb} МБ)")
+
+    pool = None
+    if workers > 1:
+        # spawn, а не fork: paddle не переживает fork уже инициализированного процесса
+        cpu_threads = max(1, (os.cpu_count() or workers) // workers)
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(cpu_threads, batch_size, DEFAULT_CACHE_PATH if use_cache else None),
+        )
+        ocr = None
+        print(f"[INFO] Воркеров: {workers}, потоков OCR на воркер: {cpu_threads}")
+    else:
+        ocr = create_ocr(batch_size=batch_size)
+    print(f"[INFO] Окон в одном вызове predict: {batch_size}")
+
+    global_counter = manifest.next_counter
+    saved_count = 0
+    removed_total = 0
+    skipped_total = 0
+    saved_seconds_total = 0.0
+
+    def save(final_records):
+        nonlocal saved_count
+        if final_records:
+            _append_csv(final_records, partial_csv, write_header=(saved_count == 0))
+            saved_count += len(final_records)
 
     for tiff_file in tiff_files:
         tiff_path = os.path.join(INPUT_DIR, tiff_file)
         print(f"\n===== Обработка: {tiff_file} =====")
 
+        dedup = None
+        reader = None
         try:
-            Image.MAX_IMAGE_PIXELS = None
-            pil_img = Image.open(tiff_path).convert('RGB')
-            full_img = np.array(pil_img)
-
-            h, w, _ = full_img.shape
-            print(f"Размер: {w}x{h}")
-
-            stride = SLICE_SIZE - OVERLAP
-            y_steps = math.ceil((h - OVERLAP) / stride) if h > SLICE_SIZE else 1
-            x_steps = math.ceil((w - OVERLAP) / stride) if w > SLICE_SIZE else 1
-            total_steps = y_steps * x_steps
-
-            pbar = tqdm(total=total_steps, desc="Фрагменты")
-
-            for y_idx in range(y_steps):
-                for x_idx in range(x_steps):
-                    y_start = y_idx * stride
-                    x_start = x_idx * stride
-
-                    y_end = min(y_start + SLICE_SIZE, h)
-                    x_end = min(x_start + SLICE_SIZE, w)
-
-                    if (y_end - y_start) < SLICE_SIZE and y_start > 0:
-                        y_start = max(0, y_end - SLICE_SIZE)
-                    if (x_end - x_start) < SLICE_SIZE and x_start > 0:
-                        x_start = max(0, x_end - SLICE_SIZE)
-
-                    slice_img = full_img[y_start:y_end, x_start:x_end]
-
-                    # === РАСПОЗНАВАНИЕ ===
-                    try:
-                        results = list(ocr.predict(slice_img))
-                    except Exception as e:
-                        print(f"\n[SLICE ERROR] Слайс y={y_start} x={x_start}: {type(e).__name__}: {e}")
-                        import traceback
-                        traceback.print_exc()
-                        pbar.update(1)
-                        continue
-
-                    if not results:
-                        pbar.update(1)
-                        continue
-
-                    res_obj = results[0]
-
-                    # Извлечение данных
-                    data = {}
-                    if hasattr(res_obj, 'json'):
-                        raw_json = res_obj.json
-                        if isinstance(raw_json, dict):
-                            data = raw_json.get('res', raw_json)
-
-                    # rec_boxes — правильные координаты в формате [x_min, y_min, x_max, y_max]
-                    # dt_polys — координаты ПОСЛЕ внутреннего поворота, не подходят для кропа
-                    boxes  = data.get('rec_boxes', [])
-                    texts  = data.get('rec_texts', data.get('rec_text', []))
-                    scores = data.get('rec_scores', data.get('rec_score', []))
-
-                    if not boxes or not texts:
-                        pbar.update(1)
-                        continue
-
-                    for i in range(len(texts)):
-                        try:
-                            # rec_boxes формат: [x_min, y_min, x_max, y_max]
-                            box = np.array(boxes[i])
-                            if box.size != 4:
-                                continue
-                            x_min, y_min, x_max, y_max = box.astype(np.int32)
-
-                            text = texts[i]
-                            score = scores[i]
-                            if isinstance(score, list):
-                                score = score[0]
-
-                            if float(score) < CONFIDENCE_THRESHOLD:
-                                continue
-                            if len(str(text).strip()) < 2:
-                                continue
-
-                            # Вырезаем из слайса с отступом
-                            x_min_p = max(0, x_min - PADDING)
-                            y_min_p = max(0, y_min - PADDING)
-                            x_max_p = min(slice_img.shape[1], x_max + PADDING)
-                            y_max_p = min(slice_img.shape[0], y_max + PADDING)
-
-                            crop = slice_img[y_min_p:y_max_p, x_min_p:x_max_p]
-                            if crop.size == 0:
-                                continue
-
-                            # Глобальные координаты на исходной карте
-                            global_box = [
-                                [x_min + x_start, y_min + y_start],
-                                [x_max + x_start, y_max + y_start],
-                            ]
-
-                            # Сохраняем
-                            crop_bgr = cv2.cvtColor(crop, cv2.COLOR_RGB2BGR)
-                            crop_filename = f"{os.path.splitext(tiff_file)[0]}_x{x_start}_y{y_start}_{global_counter}.jpg"
-                            save_path = os.path.join(OUTPUT_IMG_DIR, crop_filename)
-                            cv2.imwrite(save_path, crop_bgr)
-
-                            dataset_records.append({
-                                'filename':   crop_filename,
-                                'ocr_text':   text,
-                                'confidence': round(float(score), 4),
-                                'global_box': global_box,
-                                'source_map': tiff_file,
-                            })
-                            global_counter += 1
-
-                        except Exception:
-                            continue
-
+            finished = manifest.map_windows(tiff_file)
+            if manifest.is_map_done(tiff_file):
+                # карта уже распознана: растр не нужен, только размер для сетки окон
+                reader = None
+                w, h = manifest.map_size(tiff_file)
+            else:
+                # лист не декодируется целиком: читаем только текущее окно
+                reader = open_tile_reader(tiff_path)
+                h, w = reader.height, reader.width
+                print(f"Размер: {w}x{h} (чтение окнами: {reader.backend})")
+
+            windows = compute_windows(h, w, SLICE_SIZE, OVERLAP)
+            # дедупликация от перекрытия скользящего окна — по ходу, окно за окном
+            dedup = StreamingDeduplicator(windows, iou_threshold=IOU_THRESHOLD, method='grid')
+
+            # готовые окна проигрываем из журнала через ту же дедупликацию
+            for window_idx in sorted(finished):
+                save(dedup.add_window(window_idx, finished[window_idx]))
+
+            if reader is None:
+                print(f"[INFO] {tiff_file}: карта уже обработана, записи взяты из журнала")
+                continue
+
+            todo = [i for i in range(len(windows)) if i not in finished]
+            if finished:
+                print(f"[INFO] {tiff_file}: из журнала окон {len(finished)}, осталось {len(todo)}")
+
+            pbar = tqdm(total=len(windows), desc="Фрагменты")
+            pbar.update(len(finished))
+
+            # пустые окна сразу отмечаем обработанными, в OCR идут только остальные
+            ocr_indices = todo
+            n_skipped = 0
+            if skip_blank_threshold > 0:
+                t_screen = time.perf_counter()
+                _, skip = screen_windows(reader, [windows[i] for i in todo], skip_blank_threshold)
+                t_screen = time.perf_counter() - t_screen
+                for window_idx in np.array(todo, dtype=int)[skip]:
+                    manifest.window_done(tiff_file, window_idx, [], global_counter)
+                    save(dedup.add_window(int(window_idx), []))
+                ocr_indices = [i for i, sk in zip(todo, skip) if not sk]
+                n_skipped = len(todo) - len(ocr_indices)
+                pbar.update(n_skipped)
+
+            results = iter_window_results(
+                [windows[i] for i in ocr_indices], tiff_path, reader, ocr=ocr, pool=pool,
+                max_pending=QUEUE_PER_WORKER * workers, batch_size=batch_size, cache=cache,
+            )
+            hits_before = cache.hits if cache is not None else 0
+            t_start = time.perf_counter()
+            n_lines = 0
+            failed = []
+            for local_idx, (x_start, y_start, x_end, y_end), ocr_data in results:
+                window_idx = ocr_indices[local_idx]
+                if ocr_data is None:
+                    # движок упал - это не "нет текста": окно не идёт ни в журнал,
+                    # ни в дедупликацию, перезапуск распознает его снова
+                    failed.append(window_idx)
                     pbar.update(1)
+                    continue
+
+                window_records = []
+                n_lines += len(ocr_data[1])
+
+                if ocr_data[0]:
+                    # пиксели нужны только для кропов, берём окно из своего ридера
+                    slice_img = reader.read(x_start, y_start, x_end, y_end)
+                    window_records = extract_window_records(
+                        ocr_data, slice_img, x_start, y_start, tiff_file, global_counter,
+                    )
+                    global_counter += len(window_records)
+
+                # сначала журнал, потом CSV: окно из журнала не распознаётся повторно
+                manifest.window_done(tiff_file, window_idx, window_records, global_counter)
+                save(dedup.add_window(window_idx, window_records))
+                pbar.update(1)
 
             pbar.close()
+            if failed:
+                print(f"[WARNING] {tiff_file}: OCR упал на {len(failed)} окнах, "
+                      f"повторный запуск распознает их заново")
+            else:
+                manifest.map_done(tiff_file, w, h)
+
+            elapsed = max(time.perf_counter() - t_start, 1e-9)
+            n_ocr = len(ocr_indices)
+            print(f"[INFO] {tiff_file}: {n_ocr / elapsed:.2f} окон/с, "
+                  f"{n_lines / elapsed:.1f} строк/с ({n_ocr} окон, {n_lines} строк за {elapsed:.1f} с)")
+            if cache is not None:
+                print(f"[INFO] {tiff_file}: из кэша OCR окон {cache.hits - hits_before}/{n_ocr}")
+
+            if skip_blank_threshold > 0:
+                # экономия - по средней цене окна на этом же листе
+                saved_seconds = (elapsed / n_ocr * n_skipped if n_ocr else 0.0) - t_screen
+                skipped_total += n_skipped
+                saved_seconds_total += saved_seconds
+                print(f"[INFO] {tiff_file}: пропущено пустых окон {n_skipped}/{len(windows)}, "
+                      f"сэкономлено ~{saved_seconds:.1f} с (проверка заняла {t_screen:.1f} с)")
 
         except KeyboardInterrupt:
-            print("\n[STOP] Прервано. Сохраняем...")
+            print(f"\n[STOP] Прервано. Сохраняем... Повторный запуск продолжит по журналу {manifest_path}")
             break
         except Exception as e:
             print(f"\n[CRITICAL ERROR] {tiff_file}: {e}")
             import traceback
             traceback.print_exc()
-    
-    # дедупликация от перекрытия скользящего окна
-    if dataset_records:
-        from mapocr_toolkit.utils.nms import nms_filter
-        before = len(dataset_records)
-        dataset_records = nms_filter(dataset_records, iou_threshold=0.5)
-        print(f'[NMS] удалено дублей: {before - len(dataset_records)} '
-              f'(осталось: {len(dataset_records)})')
-
-    if dataset_records:
-        df = pd.DataFrame(dataset_records)
-        df.to_csv(OUTPUT_CSV, index=False, sep=';', encoding='utf-8-sig')
-        print(f"\nГОТОВО! Сохранено: {len(dataset_records)} шт.")
+        finally:
+            # и при ошибке на карте: иначе memmap / файл листа остаётся открытым
+            if reader is not None:
+                reader.close()
+            if dedup is not None:
+                save(dedup.finish())
+                removed_total += dedup.removed
+                print(f'[NMS] {tiff_file}: удалено дублей: {dedup.removed}')
+
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+    if cache is not None:
+        print(f"[INFO] Кэш OCR: попаданий {cache.hits}, промахов {cache.misses}, "
+              f"размер {cache.size_bytes / 2**20:.1f} МБ")
+        cache.close()
+
+    print(f'[NMS] всего удалено дублей: {removed_total}')
+    if skip_blank_threshold > 0:
+        print(f'[INFO] всего пропущено пустых окон: {skipped_total}, сэкономлено ~{saved_seconds_total:.1f} с')
+
+    if saved_count:
+        os.replace(partial_csv, OUTPUT_CSV)
+        print(f"\nГОТОВО! Сохранено: {saved_count} шт.")
         print(f"Таблица: {OUTPUT_CSV}")
+
+        if parquet:
+            # типизированная копия: боксы колонками x1..y2, без разбора строк при чтении
+            parquet_path = os.path.splitext(OUTPUT_CSV)[0] + '.parquet'
+            write_dataset(read_dataset(OUTPUT_CSV), parquet_path)
+            print(f"Parquet: {parquet_path}")
     else:
         print("\nНичего не сохранено.")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description='Нарезка TIF-карт на фрагменты текста через PaddleOCR')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='число процессов OCR, у каждого свой экземпляр PaddleOCR (1 = без пула)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help='сколько окон отдавать в один вызов ocr.predict')
+    parser.add_argument('--skip-blank-threshold', type=float, default=SKIP_BLANK_THRESHOLD,
+                        help='не распознавать окна с плотностью чернил ниже порога (0 = не пропускать)')
+    parser.add_argument('--dry-run-skip', action='store_true',
+                        help='только показать, какие окна были бы пропущены, без OCR')
+    parser.add_argument('--manifest', default=MANIFEST_PATH,
+                        help='журнал законченных окон для продолжения прерванного прогона')
+    parser.add_argument('--fresh', action='store_true',
+                        help='удалить журнал и распознать все карты заново')
+    parser.add_argument('--parquet', action='store_true',
+                        help='дополнительно сохранить датасет в типизированный Parquet рядом с CSV')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='не использовать кэш ответов OCR по содержимому окна')
+    parser.add_argument('--cache-size-mb', type=float, default=DEFAULT_MAX_MB,
+                        help='предельный размер кэша OCR, старые записи вытесняются (LRU)')
+    return parser.parse_args()
+
+
 if __name__ == '__main__':
-    process_tiffs()
\ No newline at end of file
+    args = parse_args()
+    process_tiffs(
+        workers=max(1, args.workers),
+        batch_size=max(1, args.batch_size),
+        skip_blank_threshold=args.skip_blank_threshold,
+        dry_run=args.dry_run_skip,
+        manifest_path=args.manifest,
+        fresh=args.fresh,
+        use_cache=not args.no_cache,
+        cache_size_mb=args.cache_size_mb,
+        parquet=args.parquet,
+    )
\ No newline at end of file
@@ -1,9 +1,19 @@
 import os
+import sys
 import pytesseract
 from PIL import Image
 import pandas as pd
 from tqdm import tqdm
 
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from mapocr_toolkit.image_processing.tile_reader import open_tile_reader
+from mapocr_toolkit.utils.sliding_window import compute_windows
+from mapocr_toolkit.utils.tile_dedup import StreamingDeduplicator
+
 INPUT_DIR = os.path.join('data', 'raw_tifs')
 OUTPUT_IMG_DIR = os.path.join('data', 'dataset_crops')
 OUTPUT_CSV = os.path.join('data', 'dataset_v1.csv')
@@ -13,6 +23,10 @@ PADDING = 10
 # минимальная уверенность тессеракта (из ютуба)
 CONFIDENCE_THRESHOLD = 40 
 
+# тессеракт гоняем по окнам, как slice_paddle, чтобы не держать весь лист в памяти
+SLICE_SIZE = 2000
+OVERLAP = 400
+
 # tif 100 мб каждый файл, ограничения не нужны
 Image.MAX_IMAGE_PIXELS = None
 # =============================================
@@ -36,53 +50,66 @@ def process_tiffs():
         print(f"\nОбработка файла: {tiff_file} (это может занять время...)")
         
         try:
-            # Загружаем изображение
-            img = Image.open(tiff_path)
-            # Конвертируем в RGB, если вдруг там CMYK или Grayscale
-            img = img.convert('RGB')
-            
-            # 1. Прогоняем Tesseract, чтобы получить данные о боксах (data mining)
-            # output_type=dict дает словарь со списками координат, текста и conf
-            data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT, lang='rus+eng')
-            
-            n_boxes = len(data['text'])
-            
-            # Проходимся по всем найденным элементам
-            for i in tqdm(range(n_boxes), desc=f"Анализ {tiff_file}"):
-                # Берем только если уверенность > порога и текст не пустой
-                text = data['text'][i].strip()
-                conf = int(data['conf'][i]) if data['conf'][i] != '-1' else 0
-                
-                if conf > CONFIDENCE_THRESHOLD and len(text) > 1:
-                    (x, y, w, h) = (data['left'][i], data['top'][i], data['width'][i], data['height'][i])
-                    
-                    # Добавляем отступы (padding)
-                    x_new = max(0, x - PADDING)
-                    y_new = max(0, y - PADDING)
-                    w_new = w + 2 * PADDING
-                    h_new = h + 2 * PADDING
-                    
-                    # Вырезаем кусочек
-                    crop = img.crop((x_new, y_new, x_new + w_new, y_new + h_new))
-                    
-                    # Генерируем имя файла: mapname_counter.jpg
-                    crop_filename = f"{os.path.splitext(tiff_file)[0]}_{global_crop_counter}.jpg"
-                    crop_path = os.path.join(OUTPUT_IMG_DIR, crop_filename)
-                    
-                    # Сохраняем картинку
-                    crop.save(crop_path, "JPEG", quality=95)
-                    
-                    # Записываем в список для CSV
-                    # label оставляем пустым, ты его заполнишь руками
-                    dataset_records.append({
-                        'filename': crop_filename,
-                        'ocr_text': text,
-                        'label': '', 
-                        'source_map': tiff_file
-                    })
-                    
-                    global_crop_counter += 1
-                    
+            # читаем лист окнами, целиком он в память не загружается
+            reader = open_tile_reader(tiff_path)
+            windows = compute_windows(reader.height, reader.width, SLICE_SIZE, OVERLAP)
+            # дубли из полос перекрытия убираем по ходу
+            dedup = StreamingDeduplicator(windows, method='grid')
+
+            for window_idx, (x_start, y_start, x_end, y_end) in enumerate(tqdm(windows, desc=f"Анализ {tiff_file}")):
+                img = Image.fromarray(reader.read(x_start, y_start, x_end, y_end))
+
+                # 1. Прогоняем Tesseract, чтобы получить данные о боксах (data mining)
+                # output_type=dict дает словарь со списками координат, текста и conf
+                data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT, lang='rus+eng')
+
+                n_boxes = len(data['text'])
+                window_records = []
+
+                # Проходимся по всем найденным элементам
+                for i in range(n_boxes):
+                    # Берем только если уверенность > порога и текст не пустой
+                    text = data['text'][i].strip()
+                    conf = int(data['conf'][i]) if data['conf'][i] != '-1' else 0
+
+                    if conf > CONFIDENCE_THRESHOLD and len(text) > 1:
+                        (x, y, w, h) = (data['left'][i], data['top'][i], data['width'][i], data['height'][i])
+
+                        # Добавляем отступы (padding)
+                        x_new = max(0, x - PADDING)
+                        y_new = max(0, y - PADDING)
+                        w_new = w + 2 * PADDING
+                        h_new = h + 2 * PADDING
+
+                        # Вырезаем кусочек
+                        crop = img.crop((x_new, y_new, x_new + w_new, y_new + h_new))
+
+                        # Генерируем имя файла: mapname_counter.jpg
+                        crop_filename = f"{os.path.splitext(tiff_file)[0]}_{global_crop_counter}.jpg"
+                        crop_path = os.path.join(OUTPUT_IMG_DIR, crop_filename)
+
+                        # Сохраняем картинку
+                        crop.save(crop_path, "JPEG", quality=95)
+
+                        # Записываем в список для CSV
+                        # label оставляем пустым, ты его заполнишь руками
+                        # global_box и confidence нужны только для дедупликации
+                        window_records.append({
+                            'filename': crop_filename,
+                            'ocr_text': text,
+                            'label': '',
+                            'source_map': tiff_file,
+                            'global_box': [[x + x_start, y + y_start], [x + w + x_start, y + h + y_start]],
+                            'confidence': conf,
+                        })
+
+                        global_crop_counter += 1
+
+                dataset_records.extend(dedup.add_window(window_idx, window_records))
+
+            dataset_records.extend(dedup.finish())
+            reader.close()
+
         except Exception as e:
             print(f"[ERROR] Ошибка при обработке {tiff_file}: {e}")
 
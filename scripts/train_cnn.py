@@ -1,6 +1,7 @@
 import os
 import sys
 import json
+import argparse
 
 import numpy as np
 import matplotlib
@@ -19,6 +20,7 @@ if project_root not in sys.path:
 from mapocr_toolkit.utils.data_loader import load_raw_data_paths_and_labels, create_class_maps
 from mapocr_toolkit.utils.cnn_preprocessor import prepare_cnn_data
 from mapocr_toolkit.cnn.cnn_model import create_cnn_model
+from mapocr_toolkit.utils.tf_pipeline import ThroughputLogger, build_train_val, dataset_labels
 
 EPOCHS = 10
 BATCH_SIZE = 32
@@ -27,35 +29,30 @@ BATCH_SIZE = 32
 CITY_MAJOR_TARGET = 70
 
 
-def main():
-    print("[INFO] Starting CNN training process")
-    print("[INFO] Loading data paths and raw labels...")
-
-    data_items, raw_unique_labels = load_raw_data_paths_and_labels()
-
-    if not data_items:
-        print("[ERROR] No data items loaded")
-        return
+def parse_args():
+    parser = argparse.ArgumentParser(description='Обучение CNN-классификатора')
+    parser.add_argument('--tf-data', action='store_true',
+                        help='Потоковый вход tf.data вместо массивов в памяти: '
+                             'декодирование на лету, балансировка классов выборкой, аугментация батчами')
+    parser.add_argument('--tf-data-cache', default=None,
+                        help="Кэш декодированных кропов для --tf-data: 'memory' или префикс пути к файлам")
+    return parser.parse_args()
 
-    print(f"[INFO] Loaded {len(data_items)} data items")
-    print(f"[INFO] Found {len(raw_unique_labels)} unique labels: {raw_unique_labels}")
-
-    class_to_int, int_to_class = create_class_maps(raw_unique_labels)
-    num_classes = len(class_to_int)
-    print("[INFO] Created class mappings")
-    print(f"[INFO] Number of classes: {num_classes}")
 
+def prepare_array_data(data_items, class_to_int):
+    """прежний путь: датасет массивами uint8 + city_major, раздутый аугментацией"""
     print("[INFO] Preparing CNN data...")
     cnn_data_result = prepare_cnn_data(data_items, class_to_int)
 
     if cnn_data_result is None or not cnn_data_result[0] or cnn_data_result[0][0].size == 0:
         print("[ERROR] Failed to prepare CNN data or no data available after preprocessing")
-        return
+        return None
 
     (x_train, y_train), (x_val, y_val), processing_info = cnn_data_result
 
     print(f"[INFO] Training data shape: X={x_train.shape}, y={y_train.shape}")
     print(f"[INFO] Validation data shape: X={x_val.shape}, y={y_val.shape}")
+    print(f"[INFO] Dataset size in memory: {(x_train.nbytes + x_val.nbytes) / 2**20:.1f} MB ({x_train.dtype})")
 
     # датасет несбалансирован: settlement 82.6%, city_major 0.4%
     # без весов модель просто угадывает settlement всегда
@@ -84,37 +81,89 @@ def main():
         # horizontal_flip намеренно не использую - текст станет зеркальным
     )
 
-    augmented_images = []
-    augmented_labels = []
     needed = CITY_MAJOR_TARGET - len(x_city_major)
+    # генератор отдаёт float32 в диапазоне 0..255, храним сразу uint8
+    x_aug = np.empty((max(needed, 0),) + x_train.shape[1:], dtype=np.uint8)
+    y_aug = np.empty((max(needed, 0),) + y_train.shape[1:], dtype=y_train.dtype)
 
     # генерит бесконечный поток батчей, нужное количество берём
     aug_iterator = aug_gen.flow(x_city_major, y_city_major, batch_size=1, shuffle=True)
-    for _ in range(needed):
+    for i in range(needed):
         img_batch, lbl_batch = next(aug_iterator)
-        augmented_images.append(img_batch[0])
-        augmented_labels.append(lbl_batch[0])
-
-    x_aug = np.array(augmented_images)
-    y_aug = np.array(augmented_labels)
+        x_aug[i] = np.clip(np.rint(img_batch[0]), 0, 255)
+        y_aug[i] = lbl_batch[0]
 
-    # дописываем аугментированные примеры в тренировочный сет
+    # дописываем аугментированные примеры в тренировочный сет - одна копия uint8.
+    # перетасовку массива не делаем: fit(shuffle=True) мешает индексы каждую эпоху,
+    # так что аугментированные и так не идут пачкой в конце
     x_train = np.concatenate([x_train, x_aug], axis=0)
     y_train = np.concatenate([y_train, y_aug], axis=0)
 
-    # перетасовываем, чтобы аугментированные не шли пачкой в конце батча
-    shuffle_idx = np.random.permutation(len(x_train))
-    x_train = x_train[shuffle_idx]
-    y_train = y_train[shuffle_idx]
-
     # пересчитываем веса - теперь city_major стало ~70, его вес должен упасть
     y_train_int_aug = np.argmax(y_train, axis=1)
     weights_aug = compute_class_weight('balanced', classes=np.unique(y_train_int_aug), y=y_train_int_aug)
     class_weight_dict = dict(enumerate(weights_aug))
-    print(f"[INFO] x_train after augmentation: {x_train.shape}")
+    print(f"[INFO] x_train after augmentation: {x_train.shape}, {x_train.nbytes / 2**20:.1f} MB")
     print(f"[INFO] Updated class weights: {class_weight_dict}")
 
-    input_shape = x_train.shape[1:]
+    fit_kwargs = dict(
+        x=x_train, y=y_train,
+        validation_data=(x_val, y_val),
+        batch_size=BATCH_SIZE,
+        class_weight=class_weight_dict,
+        shuffle=True,
+    )
+    return fit_kwargs, x_val, np.argmax(y_val, axis=1), len(x_train), processing_info
+
+
+def prepare_stream_data(data_items, class_to_int, cache):
+    """--tf-data: потоки train/val, балансировка выборкой вместо class_weight и копий city_major"""
+    print("[INFO] Building tf.data pipeline...")
+    if cache == 'memory':
+        cache = ''
+    (train_ds, steps_per_epoch), val_ds, processing_info = build_train_val(
+        data_items, class_to_int, batch_size=BATCH_SIZE, cache=cache,
+    )
+    print(f"[INFO] Steps per epoch: {steps_per_epoch}, batch size: {BATCH_SIZE}")
+
+    fit_kwargs = dict(
+        x=train_ds,
+        validation_data=val_ds,
+        steps_per_epoch=steps_per_epoch,
+    )
+    return fit_kwargs, val_ds, dataset_labels(val_ds), steps_per_epoch * BATCH_SIZE, processing_info
+
+
+def main():
+    args = parse_args()
+
+    print("[INFO] Starting CNN training process")
+    print("[INFO] Loading data paths and raw labels...")
+
+    data_items, raw_unique_labels = load_raw_data_paths_and_labels()
+
+    if not data_items:
+        print("[ERROR] No data items loaded")
+        return
+
+    print(f"[INFO] Loaded {len(data_items)} data items")
+    print(f"[INFO] Found {len(raw_unique_labels)} unique labels: {raw_unique_labels}")
+
+    class_to_int, int_to_class = create_class_maps(raw_unique_labels)
+    num_classes = len(class_to_int)
+    print("[INFO] Created class mappings")
+    print(f"[INFO] Number of classes: {num_classes}")
+
+    if args.tf_data:
+        prepared = prepare_stream_data(data_items, class_to_int, args.tf_data_cache)
+    else:
+        prepared = prepare_array_data(data_items, class_to_int)
+    if prepared is None:
+        return
+    fit_kwargs, val_input, y_val_int, train_size, processing_info = prepared
+
+    target_h, target_w = processing_info['target_size']
+    input_shape = (target_h, target_w, 3)
     print(f"[INFO] Determined input shape for CNN model: {input_shape}")
 
     print("[INFO] Creating CNN model...")
@@ -127,23 +176,20 @@ def main():
         restore_best_weights=True,
         verbose=1,
     )
+    throughput = ThroughputLogger(BATCH_SIZE, samples_per_epoch=train_size)
 
     print("[INFO] Training the model...")
     history = model.fit(
-        x_train, y_train,
-        validation_data=(x_val, y_val),
         epochs=EPOCHS,  
-        batch_size=BATCH_SIZE,
-        class_weight=class_weight_dict,
-        callbacks=[early_stopping],
+        callbacks=[early_stopping, throughput],
+        **fit_kwargs,
     )
     print("[INFO] Training finished")
 
     print("[INFO] Evaluating model on validation set...")
 
-    y_pred_probs = model.predict(x_val)
+    y_pred_probs = model.predict(val_input)
     y_pred_int = np.argmax(y_pred_probs, axis=1)
-    y_val_int = np.argmax(y_val, axis=1)
 
     class_names = [int_to_class[i] for i in range(num_classes)]
 
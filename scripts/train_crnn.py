@@ -72,6 +72,11 @@ def parse_args() -> argparse.Namespace:
                    help=f'Эпох на этапе 1 (default: {EPOCHS_PHASE1})')
     p.add_argument('--epochs2', type=int, default=EPOCHS_PHASE2,
                    help=f'Эпох на этапе 2 (default: {EPOCHS_PHASE2})')
+    p.add_argument('--tf-data', action='store_true',
+                   help='Потоковый вход tf.data вместо массивов в памяти '
+                        '(балансировка классов выборкой, аугментация батчами)')
+    p.add_argument('--tf-data-cache', default=None,
+                   help="Кэш декодированных кропов для --tf-data: 'memory' или префикс пути к файлам")
     return p.parse_args()
 
 
@@ -99,22 +104,20 @@ def augment_city_major(x_train, y_train, city_major_idx, target=CITY_MAJOR_TARGE
 
     needed = target - current
     it = aug.flow(x_cm, y_cm, batch_size=1, shuffle=True)
-    aug_imgs, aug_lbls = [], []
-    for _ in range(needed):
+    # генератор отдаёт float32 0..255, храним сразу в uint8 как весь датасет
+    x_aug = np.empty((needed,) + x_train.shape[1:], dtype=np.uint8)
+    y_aug = np.empty((needed,) + y_train.shape[1:], dtype=y_train.dtype)
+    for i in range(needed):
         img_b, lbl_b = next(it)
-        aug_imgs.append(img_b[0])
-        aug_lbls.append(lbl_b[0])
-
-    x_aug = np.array(aug_imgs)
-    y_aug = np.array(aug_lbls)
+        x_aug[i] = np.clip(np.rint(img_b[0]), 0, 255)
+        y_aug[i] = lbl_b[0]
 
+    # одна копия при склейке; перемешивание - индексами в fit(shuffle=True),
+    # а не перестановкой всего массива
     x_out = np.concatenate([x_train, x_aug], axis=0)
     y_out = np.concatenate([y_train, y_aug], axis=0)
-
-    # перемешиваем, чтобы аугментированные не шли пачкой в конце
-    idx = np.random.permutation(len(x_out))
     print(f'[INFO] city_major после аугментации: {target}')
-    return x_out[idx], y_out[idx]
+    return x_out, y_out
 
 
 def compute_weights(y_int):
@@ -142,6 +145,7 @@ def main():
         freeze_cnn_backbone,
         transfer_weights_from_cnn,
     )
+    from mapocr_toolkit.utils.tf_pipeline import ThroughputLogger
 
     os.makedirs(SAVE_DIR, exist_ok=True)
 
@@ -157,25 +161,55 @@ def main():
     class_names = [int_to_class[i] for i in range(num_classes)]
     print(f'[INFO] {len(data_items)} примеров, {num_classes} классов: {class_names}')
 
-    (x_train, y_train), (x_val, y_val), proc_info = prepare_cnn_data(
-        data_items, class_to_int,
-        val_split_size=VAL_SPLIT,
-        random_state_value=RANDOM_STATE,
-    )
-    print(f'[INFO] train: {x_train.shape}, val: {x_val.shape}')
-
-    # city_major всего 9 реальных примеров, без аугментации модель его просто не увидит
-    city_major_idx = class_to_int.get('city_major', -1)
-    if city_major_idx >= 0:
-        x_train, y_train = augment_city_major(x_train, y_train, city_major_idx)
-
-    # пересчитываем веса после аугментации
-    y_train_int = np.argmax(y_train, axis=1)
-    class_weight_dict = compute_weights(y_train_int)
-    print(f'[INFO] веса классов: {class_weight_dict}')
-
-    y_val_int = np.argmax(y_val, axis=1)
-    input_shape = x_train.shape[1:]
+    if args.tf_data:
+        from mapocr_toolkit.utils.tf_pipeline import build_train_val, dataset_labels
+
+        # city_major добирается выборкой из потока с весом, а не копиями через ImageDataGenerator
+        cache = '' if args.tf_data_cache == 'memory' else args.tf_data_cache
+        (train_ds, steps_per_epoch), val_ds, proc_info = build_train_val(
+            data_items, class_to_int,
+            val_split_size=VAL_SPLIT,
+            random_state_value=RANDOM_STATE,
+            batch_size=BATCH_SIZE,
+            cache=cache,
+        )
+        print(f'[INFO] tf.data: {steps_per_epoch} шагов на эпоху по {BATCH_SIZE}')
+        fit_kwargs = dict(x=train_ds, validation_data=val_ds, steps_per_epoch=steps_per_epoch)
+        val_input = val_ds
+        y_val_int = dataset_labels(val_ds)
+        train_size = steps_per_epoch * BATCH_SIZE
+    else:
+        (x_train, y_train), (x_val, y_val), proc_info = prepare_cnn_data(
+            data_items, class_to_int,
+            val_split_size=VAL_SPLIT,
+            random_state_value=RANDOM_STATE,
+        )
+        print(f'[INFO] train: {x_train.shape}, val: {x_val.shape}')
+        print(f'[INFO] датасет в памяти: {(x_train.nbytes + x_val.nbytes) / 2**20:.1f} MB ({x_train.dtype})')
+
+        # city_major всего 9 реальных примеров, без аугментации модель его просто не увидит
+        city_major_idx = class_to_int.get('city_major', -1)
+        if city_major_idx >= 0:
+            x_train, y_train = augment_city_major(x_train, y_train, city_major_idx)
+
+        # пересчитываем веса после аугментации
+        y_train_int = np.argmax(y_train, axis=1)
+        class_weight_dict = compute_weights(y_train_int)
+        print(f'[INFO] веса классов: {class_weight_dict}')
+
+        fit_kwargs = dict(
+            x=x_train, y=y_train,
+            validation_data=(x_val, y_val),
+            batch_size=BATCH_SIZE,
+            class_weight=class_weight_dict,
+            shuffle=True,
+        )
+        val_input = x_val
+        y_val_int = np.argmax(y_val, axis=1)
+        train_size = len(x_train)
+
+    target_h, target_w = proc_info['target_size']
+    input_shape = (target_h, target_w, 3)
 
     # создаём модель
     print('\n[INFO] создание CRNN модели...')
@@ -215,12 +249,9 @@ def main():
     ]
 
     history1 = model.fit(
-        x_train, y_train,
-        validation_data=(x_val, y_val),
         epochs=args.epochs1,
-        batch_size=BATCH_SIZE,
-        class_weight=class_weight_dict,
-        callbacks=callbacks_phase1,
+        callbacks=callbacks_phase1 + [ThroughputLogger(BATCH_SIZE, samples_per_epoch=train_size)],
+        **fit_kwargs,
     )
 
     # размораживаем верхние Conv-блоки (conv3, conv4, conv5)
@@ -254,17 +285,14 @@ def main():
     ]
 
     history2 = model.fit(
-        x_train, y_train,
-        validation_data=(x_val, y_val),
         epochs=args.epochs2,
-        batch_size=BATCH_SIZE,
-        class_weight=class_weight_dict,
-        callbacks=callbacks_phase2,
+        callbacks=callbacks_phase2 + [ThroughputLogger(BATCH_SIZE, samples_per_epoch=train_size)],
+        **fit_kwargs,
     )
 
     # смотрим что получилось
     print('\n[INFO] оценка на валидации (703 примера)...')
-    y_pred_probs = model.predict(x_val, verbose=0)
+    y_pred_probs = model.predict(val_input, verbose=0)
     y_pred_int   = np.argmax(y_pred_probs, axis=1)
 
     print('\n[RESULTS] classification report:')
@@ -1,5 +1,7 @@
 import os
 import sys
+import argparse
+import time
 import numpy as np
 from tensorflow import keras
 from keras.callbacks import EarlyStopping
@@ -17,8 +19,10 @@ if project_root not in sys.path:
     sys.path.append(project_root)
 
 from mapocr_toolkit.utils.data_loader import load_raw_data_paths_and_labels, create_class_maps
-from mapocr_toolkit.utils.rnn_preprocessor import prepare_rnn_data
-from mapocr_toolkit.rnn.rnn_model import create_char_level_lstm_model
+from mapocr_toolkit.utils.rnn_preprocessor import INPUT_MODE_INDEX, INPUT_MODES, prepare_rnn_data
+from mapocr_toolkit.rnn.rnn_model import create_char_level_embedding_lstm_model, create_char_level_lstm_model
+from mapocr_toolkit.utils.rnn_batching import BucketedSequence, predict_bucketed
+from mapocr_toolkit.utils.tf_pipeline import ThroughputLogger
 
 
 EPOCHS = 30
@@ -26,8 +30,31 @@ BATCH_SIZE = 8
 PATIENCE_EARLY_STOPPING = 10
 VAL_SPLIT = 0.35  # было 0.2, выравниваем с CNN для сопоставимости разбивок
 
+# global - всё дополняется до самой длинной строки датасета,
+# bucket - батчи по длине с паддингом до длины батча (только для input_mode=index)
+PADDING_GLOBAL = 'global'
+PADDING_BUCKET = 'bucket'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Обучение RNN-классификатора по OCR-тексту')
+    parser.add_argument('--input-mode', choices=INPUT_MODES, default=INPUT_MODE_INDEX,
+                        help='index - int32 индексы символов и Embedding, '
+                             'one_hot - прежний плотный one-hot вход (default: %(default)s)')
+    parser.add_argument('--padding', choices=(PADDING_GLOBAL, PADDING_BUCKET), default=PADDING_BUCKET,
+                        help='bucket - батчи по длине, паддинг до длины батча; '
+                             'global - до максимума датасета (default: %(default)s)')
+    parser.add_argument('--max-seq-len', type=int, default=None,
+                        help='Жёсткий потолок длины текста, длиннее обрезается (default: максимум датасета)')
+    args = parser.parse_args()
+    if args.padding == PADDING_BUCKET and args.input_mode != INPUT_MODE_INDEX:
+        parser.error('--padding bucket работает только с --input-mode index')
+    return args
+
 
 def main():
+    args = parse_args()
+
     print("[INFO] Starting RNN training process")
     print("[INFO] Loading data paths and raw labels...")
 
@@ -46,7 +73,8 @@ def main():
     print(f"[INFO] Number of classes: {num_classes}")
 
     print("[INFO] Preparing RNN data...")
-    rnn_data_result = prepare_rnn_data(data_items, class_to_int, VAL_SPLIT, 42)
+    rnn_data_result = prepare_rnn_data(data_items, class_to_int, VAL_SPLIT, 42,
+                                       input_mode=args.input_mode, max_seq_len_cap=args.max_seq_len)
 
     if rnn_data_result is None:
         print("[ERROR] Failed to prepare RNN data. Exiting.")
@@ -60,6 +88,8 @@ def main():
 
     print(f"[INFO] Training data shape: X={x_train.shape}, y={y_train.shape}")
     print(f"[INFO] Validation data shape: X={x_val.shape}, y={y_val.shape}")
+    print(f"[INFO] Input mode: {args.input_mode}, "
+          f"X in memory: {(x_train.nbytes + x_val.nbytes) / 2**20:.2f} MB ({x_train.dtype})")
 
     max_seq_len = processing_info['max_seq_len']
     num_chars_vocab = processing_info['num_chars_vocab']
@@ -74,9 +104,16 @@ def main():
     print(f"[INFO] Class weights: {class_weight_dict}")
 
     print("[INFO] Creating RNN model...")
-    model = create_char_level_lstm_model(max_seq_len,
-                                         num_chars_vocab,
-                                         num_classes)
+    dynamic_length = args.padding == PADDING_BUCKET
+    processing_info['dynamic_length'] = dynamic_length
+    if args.input_mode == INPUT_MODE_INDEX:
+        # для батчей по длине вход модели без фиксированной длины
+        model = create_char_level_embedding_lstm_model(None if dynamic_length else max_seq_len,
+                                                       num_chars_vocab, num_classes)
+    else:
+        model = create_char_level_lstm_model(max_seq_len,
+                                             num_chars_vocab,
+                                             num_classes)
     model.summary()
 
     early_stopping = EarlyStopping(monitor='val_loss',
@@ -84,15 +121,25 @@ def main():
                                    restore_best_weights=True,
                                    verbose=1)
 
-    print("[INFO] Training the RNN model...")
-    history = model.fit(
-        x_train, y_train,
-        validation_data=(x_val, y_val),
-        epochs=EPOCHS,
-        batch_size=BATCH_SIZE,
-        callbacks=[early_stopping],
-        class_weight=class_weight_dict,
-    )
+    throughput = ThroughputLogger(BATCH_SIZE, samples_per_epoch=len(x_train))
+
+    print(f"[INFO] Training the RNN model (padding: {args.padding})...")
+    if dynamic_length:
+        history = model.fit(
+            BucketedSequence(x_train, y_train, BATCH_SIZE, class_weight=class_weight_dict, seed=42),
+            validation_data=BucketedSequence(x_val, y_val, BATCH_SIZE, shuffle=False),
+            epochs=EPOCHS,
+            callbacks=[early_stopping, throughput],
+        )
+    else:
+        history = model.fit(
+            x_train, y_train,
+            validation_data=(x_val, y_val),
+            epochs=EPOCHS,
+            batch_size=BATCH_SIZE,
+            callbacks=[early_stopping, throughput],
+            class_weight=class_weight_dict,
+        )
     print("[INFO] RNN training finished")
 
     if early_stopping.stopped_epoch > 0:
@@ -105,7 +152,14 @@ def main():
 
     print("[INFO] Evaluating model on validation set...")
 
-    y_pred_probs = model.predict(x_val)
+    start = time.perf_counter()
+    if dynamic_length:
+        y_pred_probs = predict_bucketed(model, x_val, batch_size=64)
+    else:
+        y_pred_probs = model.predict(x_val, batch_size=64, verbose=0)
+    infer_seconds = time.perf_counter() - start
+    print(f"[INFO] Inference ({args.padding} padding): {infer_seconds:.2f} s, "
+          f"{infer_seconds / len(x_val) * 1000:.3f} ms per text")
     y_pred_int = np.argmax(y_pred_probs, axis=1)
     y_val_int = np.argmax(y_val, axis=1)
 
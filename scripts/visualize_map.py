@@ -8,6 +8,9 @@ scripts/visualize_map.py  —  Issue #12
     python scripts/visualize_map.py --map img20250920_20532456.tif \\
         --scale 0.12 --cnn-weight 0.65 --output outputs/map_annotated.html
 
+один граф вместо двух моделей (scripts/export_fused_ensemble.py)
+    python scripts/visualize_map.py --map img20250920_20532456.tif --fused models/demo/ensemble/fused
+
 диагностика
     python scripts/visualize_map.py --map img20250920_20532456.tif --diagnose
 """
@@ -15,26 +18,27 @@ scripts/visualize_map.py  —  Issue #12
 from __future__ import annotations
 
 import argparse
-import ast
-import json
-import re
 import sys
+import time
 from collections import Counter
 from pathlib import Path
 from typing import Optional
 
 import numpy as np
 import plotly.graph_objects as go
-from PIL import Image
-from tqdm import tqdm
 
 SCRIPT_DIR   = Path(__file__).resolve().parent
 PROJECT_ROOT = SCRIPT_DIR.parent
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
-import tensorflow as tf
-from keras.preprocessing.image import load_img, img_to_array
+# TensorFlow импортируется только в локальном режиме (без --server), внутри EnsemblePredictor
+from mapocr_toolkit.ensemble.client import DEFAULT_URL, EnsembleClient
+from mapocr_toolkit.ensemble.voting import weighted_voting
+from mapocr_toolkit.image_processing.tile_reader import open_tile_reader
+from mapocr_toolkit.utils.boxes import parse_boxes
+from mapocr_toolkit.utils.dataset_io import box_array, read_dataset, sibling_parquet
+from mapocr_toolkit.utils.tflite_backend import quantized_path
 
 CNN_MODEL_PATH = PROJECT_ROOT / 'models' / 'demo' / 'cnn' / 'cnn_model.keras'
 RNN_MODEL_PATH = PROJECT_ROOT / 'models' / 'demo' / 'rnn' / 'rnn_model.keras'
@@ -55,160 +59,65 @@ CLASS_COLORS: dict[str, str] = {
 }
 DEFAULT_COLOR = '#cccccc'
 
-CNN_TARGET_H = 60
-CNN_TARGET_W = 200
-
-def _parse_global_box(raw: str) -> Optional[tuple[int, int, int, int]]:
-    if not isinstance(raw, str) or not raw.strip():
-        return None
-
-    s = raw.strip()
-
-    s = re.sub(r'np\.\w+\((-?\d+)\)', r'\1', s)
-
-    # парсим уже чистый пайтон список 
-    try:
-        pts = ast.literal_eval(s)
-
-        # формат [[x1, y1], [x2, y2]]
-        if (isinstance(pts, list) and len(pts) == 2
-                and isinstance(pts[0], (list, tuple)) and len(pts[0]) == 2
-                and isinstance(pts[1], (list, tuple)) and len(pts[1]) == 2):
-            return int(pts[0][0]), int(pts[0][1]), int(pts[1][0]), int(pts[1][1])
-
-        # формат [x1, y1, x2, y2]
-        if isinstance(pts, list) and len(pts) == 4:
-            return int(pts[0]), int(pts[1]), int(pts[2]), int(pts[3])
-
-    except (ValueError, SyntaxError, TypeError):
-        pass
-
-    # только если оба предыдущих шага не сработали
-    try:
-        nums = [int(m) for m in re.findall(r'-?\d+', s)]
-        if len(nums) == 4:
-            return nums[0], nums[1], nums[2], nums[3]
-    except Exception:
-        pass
-
-    return None
-
 
 def _diagnose_box_format(df, n_samples: int = 5) -> None:
     if 'global_box' not in df.columns:
         print('[WARN] Колонка global_box отсутствует в CSV!')
         return
     print('\n[ДИАГНОСТИКА] Примеры значений global_box:')
-    for val in df['global_box'].dropna().head(n_samples):
-        parsed = _parse_global_box(str(val))
-        status = 'OK' if parsed else 'ОШИБКА'
-        print(f'  [{status}]  raw={repr(str(val)[:80])}')
-        print(f'         ->  parsed={parsed}')
+    samples = [str(val) for val in df['global_box'].dropna().head(n_samples)]
+    boxes, valid = parse_boxes(samples)
+    for val, box, ok in zip(samples, boxes.tolist(), valid):
+        status = 'OK' if ok else 'ОШИБКА'
+        print(f'  [{status}]  raw={repr(val[:80])}')
+        print(f'         ->  parsed={tuple(box) if ok else None}')
     print()
 
-def _read_csv(csv_path: Path):
-    import pandas as pd
-    for sep in (';', ','):
-        try:
-            df = pd.read_csv(csv_path, sep=sep, encoding='utf-8-sig')
-            if len(df.columns) > 1:
-                return df
-        except Exception:
-            continue
-    raise ValueError(f'Не удалось прочитать CSV: {csv_path}')
-
-
-def _encode_text_for_rnn(
-    text: str,
-    char_to_int: dict[str, int],
-    max_seq_len: int,
-    num_chars: int,
-) -> np.ndarray:
-    
-    pad_idx = char_to_int.get('\0', 0)
-    encoded = [char_to_int.get(c, pad_idx) for c in str(text).strip()]
-
-    if len(encoded) >= max_seq_len:
-        encoded = encoded[:max_seq_len]
-    else:
-        encoded += [pad_idx] * (max_seq_len - len(encoded))
-
-    x = np.zeros((1, max_seq_len, num_chars), dtype='float32')
-    for t, idx in enumerate(encoded):
-        if 0 <= idx < num_chars:
-            x[0, t, idx] = 1.0
-    return x
-
-
-def _load_crop_for_cnn(image_path: Path) -> Optional[np.ndarray]:
-    try:
-        img = load_img(str(image_path), target_size=(CNN_TARGET_H, CNN_TARGET_W))
-        return (img_to_array(img) / 255.0).astype('float32')
-    except Exception as e:
-        print(f'[WARNING] Не удалось загрузить кроп {image_path.name}: {e}')
-        return None
-
-
 def run_ensemble_inference(
     records: list[dict],
-    cnn_model,
-    rnn_model,
-    cnn_info: dict,
-    rnn_info: dict,
+    predictor=None,
+    client: Optional[EnsembleClient] = None,
     cnn_weight: float = 0.65,
-    batch_size: int = 64,
 ) -> list[str]:
-    int_to_class: dict[int, str] = {
-        int(k): v for k, v in cnn_info['int_to_class'].items()
-    }
-    char_to_int: dict[str, int] = rnn_info['char_to_int_map']
-    max_seq_len: int             = int(rnn_info['max_seq_len'])
-    num_chars: int               = int(rnn_info['num_chars_vocab'])
-    num_classes: int             = len(int_to_class)
-
+    """
+    класс для каждой записи: локально через EnsemblePredictor или через
+    сервер ансамбля (client) - вероятности те же, смешивание здесь
+    """
     n = len(records)
 
     if n == 0:
         print('[WARNING] Нет записей для inference.')
         return []
 
-    # загрузка кропов 
-    print('[INFO] Загрузка кропов для CNN...')
-    cnn_inputs: list[Optional[np.ndarray]] = []
-    for rec in tqdm(records, desc='  кропы'):
-        crop_path = CROPS_DIR / rec['filename']
-        cnn_inputs.append(_load_crop_for_cnn(crop_path))
-
-    p_cnn = np.full((n, num_classes), 1.0 / num_classes, dtype='float32')
-
-    valid_idx = [i for i, x in enumerate(cnn_inputs) if x is not None]
-    if valid_idx:
-        print('[INFO] CNN inference...')
-        cnn_batch = np.stack([cnn_inputs[i] for i in valid_idx])
-        preds = cnn_model.predict(cnn_batch, batch_size=batch_size, verbose=0)
-        for out_i, src_i in enumerate(valid_idx):
-            p_cnn[src_i] = preds[out_i]
+    paths = [CROPS_DIR / rec['filename'] for rec in records]
+    texts = [rec['ocr_text'] for rec in records]
+
+    p_fused = None
+    start = time.perf_counter()
+    if client is not None:
+        print(f'[INFO] CNN + RNN inference на сервере {client.url}...')
+        p_cnn, cnn_ok, p_rnn, classes = client.predict(paths, texts)
     else:
+        print('[INFO] CNN + RNN inference...')
+        result = predictor.predict([{'path': str(path), 'ocr_text': text} for path, text in zip(paths, texts)])
+        p_cnn, cnn_ok, p_rnn, classes = result['cnn'], result['cnn_ok'], result['rnn'], predictor.classes
+        p_fused = result.get('ensemble')
+    print(f'[INFO] Inference: {time.perf_counter() - start:.2f} s на {n} записей')
+
+    missing = n - int(cnn_ok.sum())
+    if missing == n:
         print('[WARNING] Ни одного кропа не загружено — CNN использует равномерный prior.')
-
-    missing = n - len(valid_idx)
-    if missing:
+    elif missing:
         print(f'[WARNING] {missing} кропов не найдено — для них CNN prior = равномерный.')
 
-    # кодирование текстов 
-    print('[INFO] Кодирование текстов для RNN...')
-    rnn_batch = np.zeros((n, max_seq_len, num_chars), dtype='float32')
-    for i, rec in enumerate(records):
-        encoded = _encode_text_for_rnn(rec['ocr_text'], char_to_int, max_seq_len, num_chars)
-        rnn_batch[i] = encoded[0]
-
-    print('[INFO] RNN inference...')
-    p_rnn = rnn_model.predict(rnn_batch, batch_size=batch_size, verbose=0)
-
-    p_ensemble = cnn_weight * p_cnn + (1.0 - cnn_weight) * p_rnn
+    if p_fused is not None:
+        # голосование уже посчитано в fused-графе с зашитым весом
+        p_ensemble = p_fused
+    else:
+        p_ensemble = weighted_voting(p_cnn, p_rnn, cnn_weight)
 
     predicted_indices = np.argmax(p_ensemble, axis=1)
-    return [int_to_class.get(int(idx), 'unknown') for idx in predicted_indices]
+    return [classes[int(idx)] if 0 <= idx < len(classes) else 'unknown' for idx in predicted_indices]
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -320,11 +229,21 @@ def parse_args() -> argparse.Namespace:
                         help='Куда сохранить HTML.')
     parser.add_argument('--batch-size', type=int, default=64,
                         help='Размер батча при инференсе')
+    parser.add_argument('--server', nargs='?', const=DEFAULT_URL, default=None,
+                        help='Считать на запущенном scripts/ensemble_server.py '
+                             f'(без загрузки TF и моделей), по умолчанию {DEFAULT_URL}')
+    parser.add_argument('--backend', choices=['keras', 'tflite'], default='keras',
+                        help='tflite - квантованные *_int8.tflite из scripts/quantize_models.py')
+    parser.add_argument('--fused', type=Path, default=None,
+                        help='Папка SavedModel из scripts/export_fused_ensemble.py: обе модели и '
+                             'голосование одним графом (--cnn-weight берётся из экспорта)')
     parser.add_argument('--diagnose', action='store_true',
                         help='Показать примеры raw global_box и выйти без построения карты.')
     parser.add_argument('--iou-threshold', type=float, default=0.5,
                         help='порог IoU для NMS-дедупликации боксов (0.5 по умолчанию)',
     )
+    parser.add_argument('--nms-method', choices=['grid', 'vectorized', 'python'], default='grid',
+                        help='движок NMS: grid — индекс по сетке для целых листов')
     return parser.parse_args()
 
 
@@ -337,63 +256,80 @@ def main() -> None:
         print(f'[ERROR] TIF не найден: {tif_path}')
         sys.exit(1)
 
-    for path, label in [
-        (LABELS_CSV,     'dataset_LABELED.csv'),
-        (CNN_MODEL_PATH, 'cnn_model.keras'),
-        (RNN_MODEL_PATH, 'rnn_model.keras'),
-        (CNN_INFO_PATH,  'cnn_processing_info.json'),
-        (RNN_INFO_PATH,  'rnn_processing_info.json'),
-    ]:
+    cnn_path, rnn_path = CNN_MODEL_PATH, RNN_MODEL_PATH
+    if args.backend == 'tflite':
+        cnn_path, rnn_path = quantized_path(CNN_MODEL_PATH), quantized_path(RNN_MODEL_PATH)
+
+    # с --server модели лежат у сервера, локально нужен только датасет
+    required = [(LABELS_CSV, 'dataset_LABELED.csv')]
+    if args.fused and not args.server:
+        required += [(args.fused, 'fused SavedModel')]
+    elif not args.server:
+        required += [
+            (cnn_path, cnn_path.name),
+            (rnn_path, rnn_path.name),
+            (CNN_INFO_PATH,  'cnn_processing_info.json'),
+            (RNN_INFO_PATH,  'rnn_processing_info.json'),
+        ]
+    for path, label in required:
         if not path.exists():
             print(f'[ERROR] Файл не найден: {path}  ({label})')
             sys.exit(1)
 
-    print(f'[INFO] Загрузка {LABELS_CSV.name}...')
-    df = _read_csv(LABELS_CSV)
-    print(f'[INFO] Колонки в CSV: {list(df.columns)}')
+    # Parquet-версия рядом с CSV читается только для нужной карты и без разбора строк
+    labels_path = sibling_parquet(str(LABELS_CSV))
+    print(f'[INFO] Загрузка {Path(labels_path).name}...')
 
     if args.diagnose:
+        df = read_dataset(labels_path)
+        print(f'[INFO] Колонки в CSV: {list(df.columns)}')
         _diagnose_box_format(df, n_samples=10)
         sys.exit(0)
 
-    required_cols = {'filename', 'ocr_text', 'global_box', 'source_map'}
-    missing_cols  = required_cols - set(df.columns)
-    if missing_cols:
-        print(f'[ERROR] В CSV нет колонок: {sorted(missing_cols)}')
+    df_map = read_dataset(labels_path, filters=[('source_map', '==', map_name)])
+    print(f'[INFO] Колонки в CSV: {list(df_map.columns)}')
+
+    has_box = 'global_box' in df_map.columns or {'x1', 'y1', 'x2', 'y2'}.issubset(df_map.columns)
+    missing_cols = {'filename', 'ocr_text', 'source_map'} - set(df_map.columns)
+    if missing_cols or not has_box:
+        print(f'[ERROR] В CSV нет колонок: {sorted(missing_cols | ({"global_box"} if not has_box else set()))}')
         sys.exit(1)
 
-    df_map = df[df['source_map'] == map_name].copy()
     if df_map.empty:
+        available = read_dataset(labels_path, columns=['source_map'])['source_map']
         print(f'[ERROR] В CSV нет записей для карты "{map_name}".')
-        print(f'        Доступные карты: {sorted(df["source_map"].dropna().unique())}')
+        print(f'        Доступные карты: {sorted(available.dropna().unique())}')
         sys.exit(1)
 
     print(f'[INFO] Найдено {len(df_map)} записей для карты "{map_name}".')
 
-    _diagnose_box_format(df_map, n_samples=3)
+    if 'global_box' in df_map.columns:
+        _diagnose_box_format(df_map, n_samples=3)
+
+    boxes, valid = box_array(df_map)
+    skipped = int((~valid).sum())
+    confidence = (df_map['confidence'].astype(float).to_numpy() if 'confidence' in df_map.columns
+                  else np.zeros(len(df_map)))
 
     records: list[dict] = []
-    skipped = 0
-    for _, row in df_map.iterrows():
-        box = _parse_global_box(str(row['global_box']))
-        if box is None:
-            skipped += 1
+    for (x1, y1, x2, y2), ok, filename, ocr_text, conf in zip(
+            boxes.tolist(), valid, df_map['filename'], df_map['ocr_text'], confidence):
+        if not ok:
             continue
-        x1, y1, x2, y2 = box
-        
+
         # global_box и confidence нужны для nms
         records.append({
-            'filename': str(row['filename']).strip(),
-            'ocr_text': str(row['ocr_text']),
-            'global_box': str(row['global_box']),
-            'confidence': float(row['confidence']) if 'confidence' in df_map.columns else 0.0,
+            'filename': str(filename).strip(),
+            'ocr_text': str(ocr_text),
+            'global_box': [[x1, y1], [x2, y2]],
+            'confidence': float(conf),
             'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2,
         })
     
     # внедряем nms
     from mapocr_toolkit.utils.nms import nms_filter
     before = len(records)
-    records = nms_filter(records, iou_threshold=args.iou_threshold)
+    records = nms_filter(records, iou_threshold=args.iou_threshold, method=args.nms_method)
     removed = before - len(records)
     if removed:
         print(f'[NMS] удалено дублей: {removed} '
@@ -409,20 +345,30 @@ def main() -> None:
         print(f'        python scripts/visualize_map.py --map {map_name} --diagnose')
         sys.exit(1)
 
-    print('[INFO] Загрузка CNN модели...')
-    cnn_model = tf.keras.models.load_model(str(CNN_MODEL_PATH))
-    print('[INFO] Загрузка RNN модели...')
-    rnn_model = tf.keras.models.load_model(str(RNN_MODEL_PATH))
+    predictor, client = None, None
+    if args.server:
+        client = EnsembleClient(args.server)
+        try:
+            print(f"[INFO] Сервер ансамбля: {args.server}, классы: {client.health()['classes']}")
+        except ConnectionError as e:
+            print(f'[ERROR] {e}')
+            sys.exit(1)
+    elif args.fused:
+        from mapocr_toolkit.ensemble.fused import FusedEnsemblePredictor
+
+        print(f'[INFO] Загрузка fused-ансамбля из {args.fused}...')
+        predictor = FusedEnsemblePredictor.from_dir(args.fused, batch_size=args.batch_size)
+        print(f'[INFO] strategy={predictor.strategy}, cnn_weight={predictor.cnn_weight} (из экспорта)')
+    else:
+        from mapocr_toolkit.ensemble.predictor import EnsemblePredictor
 
-    with open(CNN_INFO_PATH, encoding='utf-8') as f:
-        cnn_info = json.load(f)
-    with open(RNN_INFO_PATH, encoding='utf-8') as f:
-        rnn_info = json.load(f)
+        print('[INFO] Загрузка CNN и RNN моделей...')
+        predictor = EnsemblePredictor.from_paths(cnn_path, CNN_INFO_PATH, rnn_path, RNN_INFO_PATH,
+                                                 batch_size=args.batch_size)
 
     predicted_classes = run_ensemble_inference(
-        records, cnn_model, rnn_model, cnn_info, rnn_info,
+        records, predictor=predictor, client=client,
         cnn_weight=args.cnn_weight,
-        batch_size=args.batch_size,
     )
 
     for rec, cls in zip(records, predicted_classes):
@@ -435,17 +381,16 @@ def main() -> None:
         print(f'  {cls:<14} {cnt:>4}  {bar}')
 
     print(f'\n[INFO] Загрузка TIF: {tif_path} ...')
-    Image.MAX_IMAGE_PIXELS = None
-    pil_img = Image.open(tif_path).convert('RGB')
-    orig_w, orig_h = pil_img.size
-    print(f'[INFO] Оригинальный размер: {orig_w}x{orig_h} px.')
+    # лист уменьшается полосами, полная копия карты в память не попадает
+    with open_tile_reader(tif_path) as reader:
+        orig_w, orig_h = reader.width, reader.height
+        print(f'[INFO] Оригинальный размер: {orig_w}x{orig_h} px (чтение: {reader.backend}).')
 
-    new_w = max(1, int(orig_w * args.scale))
-    new_h = max(1, int(orig_h * args.scale))
-    print(f'[INFO] Масштабированный: {new_w}x{new_h} px (scale={args.scale:.0%}).')
+        new_w = max(1, int(orig_w * args.scale))
+        new_h = max(1, int(orig_h * args.scale))
+        print(f'[INFO] Масштабированный: {new_w}x{new_h} px (scale={args.scale:.0%}).')
 
-    pil_img_small = pil_img.resize((new_w, new_h), Image.LANCZOS)
-    img_array = np.array(pil_img_small)
+        img_array = reader.read_scaled(args.scale)
 
     print('[INFO] Построение интерактивной визуализации...')
     fig = build_plotly_figure(img_array, records, scale=args.scale, map_name=map_name)
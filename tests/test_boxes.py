@@ -0,0 +1,60 @@
+# тесты для разбора global_box mapocr_toolkit/utils/boxes.py
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+
+def test_formats_and_invalid_mask():
+    """все форматы global_box из CSV и записей в памяти, невалидные - по маске"""
+    from mapocr_toolkit.utils.boxes import parse_boxes
+
+    values = [
+        '[[np.int32(10), np.int32(20)], [np.int32(110), np.int32(60)]]',
+        '[[1, 2], [30, 40]]',
+        '[5, 6, 70, 80]',
+        '[[1.7, 2], [3, -4]]',
+        [[7, 8], [9, 10]],
+        (1, 2, 3, 4),
+        'не бокс',
+        '[1, 2, 3]',
+        '',
+        None,
+        float('nan'),
+    ]
+    boxes, valid = parse_boxes(values)
+
+    assert valid.tolist() == [True] * 6 + [False] * 5
+    assert boxes[:6].tolist() == [
+        [10, 20, 110, 60], [1, 2, 30, 40], [5, 6, 70, 80],
+        [1, 2, 3, -4], [7, 8, 9, 10], [1, 2, 3, 4],
+    ]
+    assert not boxes[~valid].any()
+
+
+def test_matches_per_row_parse_on_large_column():
+    """колонка целиком разбирается так же, как по одной строке"""
+    from mapocr_toolkit.utils.boxes import parse_box, parse_boxes
+
+    rng = np.random.default_rng(0)
+    raw = rng.integers(-50, 20000, size=(2000, 4))
+    values = [f'[[np.int32({a}), np.int32({b})], [np.int32({c}), np.int32({d})]]' for a, b, c, d in raw]
+    values[::7] = ['мусор'] * len(values[::7])
+
+    boxes, valid = parse_boxes(values)
+    for i, v in enumerate(values):
+        box = parse_box(v)
+        assert (box is not None) == valid[i]
+        if box is not None:
+            assert list(box) == boxes[i].tolist() == raw[i].tolist()
+
+
+def test_exponent_is_invalid_not_truncated():
+    """1e3 не превращается в 1: строка с экспонентой помечается невалидной"""
+    from mapocr_toolkit.utils.boxes import parse_box, parse_boxes
+
+    boxes, valid = parse_boxes(['[1e3, 2, 3, 4]', '[[1, 2], [3, 4.5E+2]]', '[1, 2, 3, 4]'])
+    assert valid.tolist() == [False, False, True]
+    assert boxes[2].tolist() == [1, 2, 3, 4] and not boxes[:2].any()
+    assert parse_box('[[1.0e1, 2], [3, 4]]') is None
@@ -0,0 +1,93 @@
+# тесты для декодирования кропов mapocr_toolkit/utils/crop_cache.py
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+from PIL import Image
+
+
+def _make_crops(folder, n=5):
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(n):
+        h, w = rng.integers(20, 90), rng.integers(40, 300)
+        path = os.path.join(folder, f'crop_{i}.jpg')
+        Image.fromarray(rng.integers(0, 255, (h, w, 3), dtype=np.uint8)).save(path)
+        paths.append(path)
+    # серый кроп тоже приводится к RGB
+    gray = os.path.join(folder, 'gray.png')
+    Image.fromarray(rng.integers(0, 255, (30, 80), dtype=np.uint8)).save(gray)
+    return paths + [gray]
+
+
+def test_matches_keras_style_decode(tmp_path):
+    """RGB + resize NEAREST, битый файл помечается в маске"""
+    from mapocr_toolkit.utils.crop_cache import load_crops
+    paths = _make_crops(str(tmp_path)) + [str(tmp_path / 'missing.jpg')]
+
+    crops, ok = load_crops(paths, target_size=(60, 200), cache_dir=None, workers=3)
+    assert crops.shape == (len(paths), 60, 200, 3) and crops.dtype == np.uint8
+    assert ok.tolist() == [True] * (len(paths) - 1) + [False]
+
+    for path, crop in zip(paths[:-1], crops):
+        expected = np.asarray(Image.open(path).convert('RGB').resize((200, 60), Image.NEAREST))
+        assert np.array_equal(crop, expected)
+
+
+def test_cache_reused_and_invalidated_by_mtime(tmp_path):
+    from mapocr_toolkit.utils.crop_cache import load_crops
+    paths = _make_crops(str(tmp_path))
+    cache_dir = str(tmp_path / 'cache')
+
+    first, _ = load_crops(paths, cache_dir=cache_dir)
+    second, ok = load_crops(paths, cache_dir=cache_dir)
+    assert isinstance(second, np.memmap) and ok.all()
+    assert np.array_equal(first, second)
+
+    # новый файл на месте старого - кэш пересобирается
+    Image.new('RGB', (50, 20), (255, 0, 0)).save(paths[0])
+    os.utime(paths[0], ns=(1, 1))
+    third, _ = load_crops(paths, cache_dir=cache_dir)
+    expected = np.asarray(Image.open(paths[0]).convert('RGB').resize((200, 60), Image.NEAREST))
+    assert np.array_equal(third[0], expected) and not np.array_equal(third[0], first[0])
+
+
+def test_other_sets_kept_until_size_cap(tmp_path):
+    """наборы кропов одного размера не вытесняют друг друга, пока кэш влезает в max_mb"""
+    from mapocr_toolkit.utils.crop_cache import load_crops
+    paths = _make_crops(str(tmp_path))
+    cache_dir = str(tmp_path / 'cache')
+
+    def entries():
+        return sorted(f for f in os.listdir(cache_dir) if f.endswith('.ok.npy'))
+
+    load_crops(paths[:3], cache_dir=cache_dir)
+    load_crops(paths[3:], cache_dir=cache_dir)
+    load_crops(paths[:3], cache_dir=cache_dir)
+    assert len(entries()) == 2
+
+    # по 3 кропа ~0.1 МБ, все 6 - ~0.2 МБ: при пределе 0.3 МБ остаётся только свежая запись
+    newest = load_crops(paths, cache_dir=cache_dir, max_mb=0.3)[0]
+    assert len(entries()) == 1 and os.path.basename(newest.filename).startswith(entries()[0][:-7])
+
+
+def test_cnn_split_skips_unreadable_crops(tmp_path):
+    """split_cnn_items даёт тот же val сет, что prepare_cnn_data, даже с нечитаемым кропом"""
+    from mapocr_toolkit.utils.cnn_preprocessor import prepare_cnn_data, split_cnn_items
+    from mapocr_toolkit.utils.crop_cache import load_crops
+    from mapocr_toolkit.utils.data_loader import split_data_items
+    paths = _make_crops(str(tmp_path), n=19) + [str(tmp_path / 'missing.jpg')]
+    paths.insert(3, paths.pop())
+    items = [(path, f'текст {i}', 'a' if i % 2 else 'b') for i, path in enumerate(paths)]
+
+    train_items, val_items = split_cnn_items(items, cache_dir=None)
+    (x_train, y_train), (x_val, y_val), _ = prepare_cnn_data(items, {'a': 0, 'b': 1}, cache_dir=None)
+
+    assert len(train_items) == len(x_train) and len(val_items) == len(x_val)
+    assert all(path != paths[3] for path, _, _ in train_items + val_items)
+    assert [1 - int(label == 'a') for _, _, label in val_items] == np.argmax(y_val, axis=1).tolist()
+    assert [1 - int(label == 'a') for _, _, label in train_items] == np.argmax(y_train, axis=1).tolist()
+    assert np.array_equal(load_crops([path for path, _, _ in val_items], cache_dir=None)[0], x_val)
+    # общий split по всем элементам уже другой
+    assert split_data_items(items)[1] != val_items
@@ -0,0 +1,81 @@
+# тесты для чтения/записи датасета mapocr_toolkit/utils/dataset_io.py
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pandas as pd
+import pytest
+
+
+def _frame():
+    return pd.DataFrame({
+        'filename': ['a_0.jpg', 'a_1.jpg', 'b_0.jpg'],
+        'ocr_text': ['Ока', 'мусор', 'Псков'],
+        'confidence': [0.91, 0.42, 0.88],
+        'global_box': ['[[np.int32(10), np.int32(20)], [np.int32(110), np.int32(60)]]',
+                       'не бокс', '[5, 6, 70, 80]'],
+        'source_map': ['a.tif', 'a.tif', 'b.tif'],
+        'label': ['hydro', '', 'city_major'],
+    })
+
+
+def test_typed_boxes_and_csv_export_roundtrip(tmp_path):
+    """global_box раскладывается в x1..y2, а CSV-экспорт возвращает строку бокса"""
+    from mapocr_toolkit.utils.dataset_io import read_dataset, to_typed, write_dataset
+
+    typed = to_typed(_frame())
+    assert 'global_box' not in typed.columns
+    assert typed.loc[0, ['x1', 'y1', 'x2', 'y2']].tolist() == [10, 20, 110, 60]
+    assert typed.loc[2, ['x1', 'y1', 'x2', 'y2']].tolist() == [5, 6, 70, 80]
+    assert typed['x1'].isna().tolist() == [False, True, False]
+    assert isinstance(typed['source_map'].dtype, pd.CategoricalDtype)
+
+    path = tmp_path / 'out.csv'
+    write_dataset(typed, path)
+    back = read_dataset(path)
+    assert back['global_box'].tolist()[0] == '[[10, 20], [110, 60]]'
+    assert back['global_box'].isna().tolist() == [False, True, False]
+
+
+def test_csv_filters(tmp_path):
+    from mapocr_toolkit.utils.dataset_io import read_dataset
+
+    path = tmp_path / 'in.csv'
+    _frame().to_csv(path, sep=';', index=False, encoding='utf-8-sig')
+
+    df = read_dataset(path, filters=[('source_map', '==', 'a.tif'), ('confidence', '>=', 0.5)])
+    assert df['filename'].tolist() == ['a_0.jpg']
+
+    with pytest.raises(ValueError):
+        read_dataset(path, filters=[('confidence', '~', 1)])
+
+
+def test_parquet_roundtrip_with_pushdown(tmp_path):
+    pytest.importorskip('pyarrow')
+    from mapocr_toolkit.utils.dataset_io import box_array, read_dataset, write_dataset
+
+    path = tmp_path / 'ds.parquet'
+    write_dataset(_frame(), path)
+
+    df = read_dataset(path, filters=[('source_map', '==', 'b.tif')])
+    assert df['filename'].tolist() == ['b_0.jpg']
+    boxes, valid = box_array(df)
+    assert boxes.tolist() == [[5, 6, 70, 80]] and valid.tolist() == [True]
+
+
+def test_sibling_parquet_ignores_stale_copy(tmp_path):
+    """Parquet рядом с CSV берётся, только если он не старше CSV"""
+    from mapocr_toolkit.utils.dataset_io import sibling_parquet
+
+    csv_path, parquet_path = tmp_path / 'ds.csv', tmp_path / 'ds.parquet'
+    csv_path.write_text('filename\n')
+    assert sibling_parquet(str(csv_path)) == str(csv_path)
+
+    parquet_path.write_bytes(b'')
+    os.utime(csv_path, (1000, 1000))
+    os.utime(parquet_path, (2000, 2000))
+    assert sibling_parquet(str(csv_path)) == str(parquet_path)
+
+    # CSV пересобран без --parquet: старая копия не читается
+    os.utime(csv_path, (3000, 3000))
+    assert sibling_parquet(str(csv_path)) == str(csv_path)
@@ -0,0 +1,107 @@
+# тесты для микробатчинга запросов к ансамблю mapocr_toolkit/ensemble/batcher.py
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import threading
+
+import numpy as np
+
+
+def _fake_predict(calls):
+    def fn(items):
+        calls.append(len(items))
+        values = np.array([item['value'] for item in items], dtype=np.float32)
+        return {'cnn': values[:, None] * np.ones((1, 3), dtype=np.float32), 'rnn': -values}
+    return fn
+
+
+def test_concurrent_requests_share_batch():
+    """запросы из разных потоков склеиваются, каждому возвращаются только его строки"""
+    from mapocr_toolkit.ensemble.batcher import MicroBatcher
+    calls = []
+    batcher = MicroBatcher(_fake_predict(calls), max_batch=64, max_wait_ms=200)
+    results = {}
+
+    def worker(k):
+        items = [{'value': k * 10 + i} for i in range(k + 1)]
+        results[k] = batcher.submit(items).result(timeout=5)
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+
+    assert sum(calls) == 10 and len(calls) < 4
+    for k, result in results.items():
+        expected = np.arange(k + 1) + k * 10
+        assert result['cnn'].shape == (k + 1, 3)
+        assert np.array_equal(result['rnn'], -expected)
+
+
+def test_oversized_request_runs_alone():
+    """запрос больше max_batch не режется и не ждёт попутчиков"""
+    from mapocr_toolkit.ensemble.batcher import MicroBatcher
+    calls = []
+    batcher = MicroBatcher(_fake_predict(calls), max_batch=4, max_wait_ms=1)
+    big = batcher.submit([{'value': i} for i in range(10)])
+    small = batcher.submit([{'value': 100}])
+
+    assert np.array_equal(big.result(timeout=5)['rnn'], -np.arange(10))
+    assert small.result(timeout=5)['rnn'].tolist() == [-100]
+    batcher.close()
+    assert calls == [10, 1]
+
+
+def test_branches_run_concurrently_and_merge():
+    """ветки CNN и RNN идут в разных потоках (барьер иначе не пройти), dict объединяются"""
+    from mapocr_toolkit.ensemble.batcher import MicroBatcher
+    barrier = threading.Barrier(2, timeout=5)
+
+    def cnn(items):
+        barrier.wait()
+        return {'cnn': np.ones((len(items), 2)), 'cnn_ok': np.ones(len(items), dtype=bool)}
+
+    def rnn(items):
+        barrier.wait()
+        return {'rnn': np.zeros((len(items), 2))}
+
+    batcher = MicroBatcher([cnn, rnn], max_batch=8, max_wait_ms=1)
+    result = batcher.submit([{}, {}, {}]).result(timeout=5)
+    stats = batcher.stats()
+    batcher.close()
+
+    assert set(result) == {'cnn', 'cnn_ok', 'rnn'} and result['rnn'].shape == (3, 2)
+    assert stats['requests'] == 1 and stats['batch_size']['max'] == 3
+    assert 0 < stats['latency_ms']['p50'] <= stats['latency_ms']['p99']
+
+
+def test_empty_submit_sets_exception_on_future():
+    """ошибка ветки на пустом запросе не вылетает из submit, а приходит через Future"""
+    import pytest
+    from mapocr_toolkit.ensemble.batcher import MicroBatcher
+
+    def broken(items):
+        raise RuntimeError('ветка упала')
+
+    batcher = MicroBatcher(broken, max_batch=8, max_wait_ms=1)
+    future = batcher.submit([])
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        future.result(timeout=1)
+
+
+def test_server_rejects_malformed_items():
+    """кривые элементы отсекаются до общего батча, корректные и path=None проходят"""
+    import pytest
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+    from ensemble_server import check_items
+
+    check_items([{'path': '/tmp/a.jpg', 'ocr_text': 'Ока'}, {'path': None, 'ocr_text': ''},
+                 {'image_b64': 'AAAA', 'ocr_text': 'Псков'}])
+    for bad in ({'items': []}, ['строка'], [{'path': 'a.jpg', 'ocr_text': 5}],
+                [{'path': 'a.jpg'}], [{'path': 3, 'ocr_text': 'Ока'}], [{'image_b64': [], 'ocr_text': 'x'}]):
+        with pytest.raises(ValueError):
+            check_items(bad)
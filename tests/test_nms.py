@@ -95,4 +95,47 @@ def test_string_format_parsed_correctly():
         {'global_box': '[[12, 10], [112, 50]]', 'confidence': 0.80},
     ]
     result = nms_filter(records, iou_threshold=0.5)
-    assert len(result) == 1
\ No newline at end of file
+    assert len(result) == 1
+
+def test_vectorized_matches_python_reference():
+    """векторный движок оставляет те же боксы в том же порядке, что и попарный цикл"""
+    import random
+    from mapocr_toolkit.utils.nms import _nms_python, _nms_vectorized
+    rnd = random.Random(0)
+    records = []
+    for _ in range(300):
+        x, y = rnd.randint(0, 2000), rnd.randint(0, 2000)
+        w, h = rnd.randint(20, 200), rnd.randint(10, 50)
+        records.append({'global_box': [[x, y], [x + w, y + h]],
+                        'confidence': round(rnd.uniform(0.5, 1.0), 2)})
+    records.append({'global_box': 'мусор', 'confidence': 0.99})
+    for thr in (0.0, 0.3, 0.5):
+        assert _nms_vectorized(records, thr) == _nms_python(records, thr)
+
+
+def test_grid_matches_python_reference():
+    """NMS по сетке даёт тот же результат, включая большие и вырожденные боксы"""
+    import random
+    from mapocr_toolkit.utils.nms import nms_filter
+    rnd = random.Random(1)
+    records = []
+    for _ in range(300):
+        x, y = rnd.randint(-50, 2000), rnd.randint(-50, 2000)
+        w, h = rnd.randint(0, 200), rnd.randint(0, 50)
+        records.append({'global_box': [[x, y], [x + w, y + h]],
+                        'confidence': round(rnd.uniform(0.5, 1.0), 2)})
+    # легенда через весь лист и бокс без площади
+    records.append({'global_box': [[0, 0], [2000, 1500]], 'confidence': 0.95})
+    records.append({'global_box': [[500, 500], [500, 600]], 'confidence': 0.97})
+    records.append({'global_box': None, 'confidence': 0.99})
+    for thr in (0.0, 0.3, 0.5, 0.9):
+        expected = nms_filter(records, thr, method='python')
+        assert nms_filter(records, thr, method='grid') == expected
+
+
+def test_unknown_method_raises():
+    """неизвестный метод — понятная ошибка"""
+    import pytest
+    from mapocr_toolkit.utils.nms import nms_filter
+    with pytest.raises(ValueError):
+        nms_filter([{'global_box': [[0, 0], [1, 1]], 'confidence': 0.9}], method='rtree')
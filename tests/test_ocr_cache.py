@@ -0,0 +1,54 @@
+# тесты для кэша ответов OCR mapocr_toolkit/utils/ocr_cache.py
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+CONFIG = {'lang': 'ru', 'text_det_limit_side_len': 2100}
+
+
+def test_roundtrip_and_persistence(tmp_path):
+    """ответ достаётся по тем же пикселям и настройкам, в том числе после переоткрытия"""
+    from mapocr_toolkit.utils.ocr_cache import OcrCache, window_key
+    path = str(tmp_path / 'cache.sqlite')
+    img = np.random.default_rng(0).integers(0, 255, (64, 64, 3), dtype=np.uint8)
+    value = ([[1, 2, 30, 40]], ['Ока'], [0.93])
+
+    with OcrCache(path) as cache:
+        key = window_key(img, CONFIG)
+        assert cache.get(key) is None
+        cache.put(key, value)
+
+    with OcrCache(path) as cache:
+        assert cache.get(window_key(img.copy(), CONFIG)) == value
+        assert cache.hits == 1
+
+
+def test_key_depends_on_pixels_and_config():
+    from mapocr_toolkit.utils.ocr_cache import window_key
+    img = np.zeros((32, 32, 3), dtype=np.uint8)
+    changed = img.copy()
+    changed[5, 5, 0] = 1
+
+    assert window_key(img, CONFIG) != window_key(changed, CONFIG)
+    assert window_key(img, CONFIG) != window_key(img, dict(CONFIG, lang='en'))
+    assert window_key(img, CONFIG) != window_key(img.reshape(16, 64, 3), CONFIG)
+
+
+def test_lru_eviction(tmp_path):
+    """при переполнении вытесняются записи, к которым дольше всего не обращались"""
+    from mapocr_toolkit.utils.ocr_cache import OcrCache
+    value = ([[0, 0, 10, 10]] * 20, ['x' * 40] * 20, [0.5] * 20)
+
+    with OcrCache(str(tmp_path / 'cache.sqlite'), max_mb=0.01) as cache:
+        keys = [bytes([i]) * 16 for i in range(40)]
+        cache.put(keys[0], value)
+        for key in keys[1:]:
+            cache.get(keys[0])  # первая запись всё время используется
+            cache.put(key, value)
+
+        assert cache.size_bytes <= cache.max_bytes
+        assert cache.get(keys[0]) == value
+        assert cache.get(keys[1]) is None
+        assert cache.get(keys[-1]) == value
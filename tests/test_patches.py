@@ -0,0 +1,113 @@
+# тесты для окон 5x5 денойзера mapocr_toolkit/image_processing/patches.py
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+
+def _rows_loop(train_padded, clean_padded, mask):
+    """прежний обход build_features: окно 5x5 и центр чистого окна, только пиксели из mask"""
+    rows = []
+    for y in range(train_padded.shape[0]):
+        for x in range(train_padded.shape[1]):
+            train_roi = train_padded[y:y + 5, x:x + 5]
+            if train_roi.shape != (5, 5):
+                continue
+            if mask[y, x]:
+                rows.append([clean_padded[y:y + 5, x:x + 5][2, 2]] + list(train_roi.flatten()))
+    return np.array(rows).reshape(-1, 26)
+
+
+def test_sampled_rows_match_pixel_loop():
+    import cv2
+    from mapocr_toolkit.image_processing.patches import pad_replicate, sample_mask, sampled_rows
+    rng = np.random.default_rng(0)
+    train = rng.random((13, 17))
+    clean = rng.random((13, 17))
+
+    padded = pad_replicate(train)
+    assert np.array_equal(padded, cv2.copyMakeBorder(train, 2, 2, 2, 2, cv2.BORDER_REPLICATE))
+
+    mask = sample_mask(clean.shape, 0.3, np.random.default_rng(1))
+    x, y = sampled_rows(padded, clean, mask, dtype=np.float64)
+    expected = _rows_loop(padded, pad_replicate(clean), mask)
+
+    assert x.shape == (mask.sum(), 25)
+    assert np.array_equal(y, expected[:, 0]) and np.array_equal(x, expected[:, 1:])
+    # тот же seed - та же выборка
+    assert np.array_equal(mask, sample_mask(clean.shape, 0.3, np.random.default_rng(1)))
+
+
+def test_shard_writer_roundtrip(tmp_path):
+    from mapocr_toolkit.features.shards import ShardWriter, shard_paths
+    writer = ShardWriter(str(tmp_path), shard_rows=4)
+    for start in (0, 3, 6):
+        writer.add(np.full((3, 25), start, dtype=np.float32), np.arange(start, start + 3, dtype=np.float64))
+    writer.close()
+
+    shards = shard_paths(str(tmp_path))
+    assert [len(np.load(t)) for _, t in shards] == [4, 4, 1]
+    assert np.array_equal(np.concatenate([np.load(t) for _, t in shards]), np.arange(9))
+
+
+def test_load_shards_subset_and_uint8(tmp_path):
+    """reservoir-выборка читает те же строки, что и полная загрузка; uint8 возвращается в [0, 1]"""
+    from mapocr_toolkit.features.shards import ShardWriter, load_shards, quantize_patches, reservoir_indices
+    rng = np.random.default_rng(0)
+    x = rng.random((50, 25))
+    y = np.arange(50, dtype=np.float64)
+
+    writer = ShardWriter(str(tmp_path), shard_rows=16)
+    writer.add(quantize_patches(x), y)
+    writer.close()
+
+    full_x, full_y = load_shards(str(tmp_path), chunk_rows=7)
+    assert full_x.dtype == np.float32 and np.abs(full_x - x).max() <= 0.5 / 255 + 1e-6
+    assert np.array_equal(full_y, y)
+
+    sub_x, sub_y = load_shards(str(tmp_path), subset=10, seed=3, chunk_rows=7)
+    idx = reservoir_indices(50, 10, np.random.default_rng(3), chunk_rows=7)
+    assert len(np.unique(idx)) == 10
+    assert np.array_equal(sub_y, idx) and np.array_equal(sub_x, full_x[idx])
+
+
+def test_predict_patches_matches_roi_list():
+    """полосы по band_pixels дают то же, что прежний список окон float64 в одном predict"""
+    from sklearn.ensemble import RandomForestRegressor
+    from mapocr_toolkit.image_processing.patches import pad_replicate, predict_patches
+    rng = np.random.default_rng(0)
+    model = RandomForestRegressor(n_estimators=3, max_depth=6, random_state=0)
+    model.fit(rng.random((400, 25)), rng.random(400))
+
+    gray = pad_replicate(rng.random((11, 9)))
+    roi_features = [
+        gray[y:y + 5, x:x + 5].flatten()
+        for y in range(gray.shape[0] - 4)
+        for x in range(gray.shape[1] - 4)
+    ]
+    expected = model.predict(roi_features).reshape(11, 9)
+
+    got = predict_patches(model, gray, band_pixels=20)
+    assert got.shape == (11, 9)
+    assert np.array_equal(got, expected)
+
+
+def test_denoise_tiled_matches_whole_image():
+    """тайлы с halo склеиваются без швов: тот же результат, что у целого изображения"""
+    import multiprocessing as mp
+    from sklearn.ensemble import RandomForestRegressor
+    from mapocr_toolkit.image_processing.blur_and_threshold import blur_and_threshold
+    from mapocr_toolkit.image_processing.patches import pad_replicate, predict_patches
+    from mapocr_toolkit.image_processing.tiled_denoise import denoise_tiled
+    rng = np.random.default_rng(0)
+    model = RandomForestRegressor(n_estimators=3, max_depth=8, random_state=0)
+    model.fit(rng.random((2000, 25)), rng.random(2000))
+
+    gray = rng.integers(0, 256, (53, 71), dtype=np.uint8)
+    expected = (predict_patches(model, blur_and_threshold(pad_replicate(gray))) * 255).astype('uint8')
+
+    assert np.array_equal(denoise_tiled(gray, model, tile_size=16, workers=1), expected)
+    assert np.array_equal(denoise_tiled(gray, model, tile_size=5, workers=1, band_pixels=7), expected)
+    if 'fork' in mp.get_all_start_methods():
+        assert np.array_equal(denoise_tiled(gray, model, tile_size=20, workers=2), expected)
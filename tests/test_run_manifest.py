@@ -0,0 +1,61 @@
+# тесты для журнала прогона mapocr_toolkit/utils/run_manifest.py
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+
+CONFIG = {'slice_size': 2000, 'overlap': 400, 'confidence_threshold': 0.6, 'padding': 10}
+
+
+def test_resume_restores_windows_and_maps(tmp_path):
+    """после перезапуска видны готовые окна, законченные карты и счётчик кропов"""
+    from mapocr_toolkit.utils.run_manifest import RunManifest
+    path = str(tmp_path / 'run.jsonl')
+
+    m = RunManifest(path, CONFIG)
+    rec = {'filename': 'a_x0_y0_0.jpg', 'ocr_text': 'Ока', 'global_box': [[1, 2], [30, 40]]}
+    m.window_done('a.tif', 0, [rec], counter=1)
+    m.window_done('a.tif', 1, [], counter=1)
+    m.map_done('a.tif', 3600, 2000)
+    m.window_done('b.tif', 0, [], counter=1)
+
+    m = RunManifest(path, CONFIG)
+    assert m.is_map_done('a.tif') and not m.is_map_done('b.tif')
+    assert m.map_size('a.tif') == (3600, 2000)
+    assert m.map_windows('a.tif') == {0: [rec], 1: []}
+    assert list(m.map_windows('b.tif')) == [0]
+    assert m.next_counter == 1
+
+
+def test_truncated_line_is_skipped(tmp_path):
+    """недописанная при падении строка пропускается и не портит следующую"""
+    from mapocr_toolkit.utils.run_manifest import RunManifest
+    path = str(tmp_path / 'run.jsonl')
+
+    m = RunManifest(path, CONFIG)
+    m.window_done('a.tif', 0, [], counter=0)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"map": "a.tif", "window": 1, "rec')
+
+    m = RunManifest(path, CONFIG)
+    assert list(m.map_windows('a.tif')) == [0]
+    m.window_done('a.tif', 1, [], counter=0)
+
+    m = RunManifest(path, CONFIG)
+    assert sorted(m.map_windows('a.tif')) == [0, 1]
+
+
+def test_config_mismatch_and_fresh(tmp_path):
+    """журнал с другими параметрами не продолжается, --fresh начинает заново"""
+    from mapocr_toolkit.utils.run_manifest import RunManifest
+    path = str(tmp_path / 'run.jsonl')
+
+    RunManifest(path, CONFIG).window_done('a.tif', 0, [], counter=0)
+    other = dict(CONFIG, padding=5)
+
+    with pytest.raises(ValueError):
+        RunManifest(path, other)
+
+    m = RunManifest(path, other, fresh=True)
+    assert m.finished_windows == 0
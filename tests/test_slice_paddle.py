@@ -0,0 +1,113 @@
+# тесты для журнала окон в scripts/slice_paddle.py (PaddleOCR подменяется фейком)
+import sys
+import os
+import types
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import numpy as np
+
+
+class _Result:
+    def __init__(self, texts):
+        boxes = [[2, 2, 30, 12]] * len(texts)
+        self.json = {'res': {'rec_boxes': boxes, 'rec_texts': texts, 'rec_scores': [0.99] * len(texts)}}
+
+
+class _FakeOcr:
+    """падает на окне с x_start == fail_x, на остальных находит одну строку"""
+
+    def __init__(self, fail_x):
+        self.fail_x = fail_x
+        self.calls = []
+
+    def predict(self, img):
+        x_start = int(img[0, 0, 0])
+        self.calls.append(x_start)
+        if x_start == self.fail_x:
+            raise RuntimeError('paddle упал')
+        return [_Result([f'окно{x_start}'])]
+
+
+def _load_slice_paddle(monkeypatch, tmp_path):
+    tqdm = types.ModuleType('tqdm')
+    tqdm.tqdm = lambda *a, **k: types.SimpleNamespace(update=lambda n=1: None, close=lambda: None)
+    monkeypatch.setitem(sys.modules, 'tqdm', tqdm)
+    paddleocr = types.ModuleType('paddleocr')
+    paddleocr.PaddleOCR = None
+    monkeypatch.setitem(sys.modules, 'paddleocr', paddleocr)
+    monkeypatch.delitem(sys.modules, 'slice_paddle', raising=False)
+    import slice_paddle
+
+    monkeypatch.setattr(slice_paddle, 'INPUT_DIR', str(tmp_path / 'tifs'))
+    monkeypatch.setattr(slice_paddle, 'OUTPUT_IMG_DIR', str(tmp_path / 'crops'))
+    monkeypatch.setattr(slice_paddle, 'OUTPUT_CSV', str(tmp_path / 'dataset.csv'))
+    monkeypatch.setattr(slice_paddle, 'SLICE_SIZE', 40)
+    monkeypatch.setattr(slice_paddle, 'OVERLAP', 0)
+    return slice_paddle
+
+
+def test_failed_window_is_not_journaled(monkeypatch, tmp_path):
+    """окно, на котором OCR упал, не считается готовым и распознаётся при перезапуске"""
+    import tifffile
+    from mapocr_toolkit.utils.run_manifest import RunManifest
+    slice_paddle = _load_slice_paddle(monkeypatch, tmp_path)
+
+    # три окна 40x40 в ряд; в левом верхнем пикселе окна - его x_start
+    sheet = np.full((40, 120, 3), 255, dtype=np.uint8)
+    for x in (0, 40, 80):
+        sheet[0, x] = x
+    (tmp_path / 'tifs').mkdir()
+    tifffile.imwrite(str(tmp_path / 'tifs' / 'a.tif'), sheet)
+    manifest_path = str(tmp_path / 'run.jsonl')
+
+    ocr = _FakeOcr(fail_x=40)
+    monkeypatch.setattr(slice_paddle, 'create_ocr', lambda **kwargs: ocr)
+    slice_paddle.process_tiffs(skip_blank_threshold=0, manifest_path=manifest_path, use_cache=False)
+
+    manifest = RunManifest(manifest_path, slice_paddle.manifest_config())
+    assert sorted(manifest.map_windows('a.tif')) == [0, 2]
+    assert not manifest.is_map_done('a.tif')
+
+    ocr = _FakeOcr(fail_x=None)
+    monkeypatch.setattr(slice_paddle, 'create_ocr', lambda **kwargs: ocr)
+    slice_paddle.process_tiffs(skip_blank_threshold=0, manifest_path=manifest_path, use_cache=False)
+
+    assert ocr.calls == [40]
+    manifest = RunManifest(manifest_path, slice_paddle.manifest_config())
+    assert sorted(manifest.map_windows('a.tif')) == [0, 1, 2] and manifest.is_map_done('a.tif')
+    assert len(manifest.map_windows('a.tif')[1]) == 1
+
+
+def test_pool_cache_lookup_happens_in_worker(monkeypatch, tmp_path):
+    """с пулом главный процесс не читает окна: ключи и попадания приходят от воркера"""
+    from concurrent.futures import Future
+    import tifffile
+    from mapocr_toolkit.utils.ocr_cache import OcrCache
+    slice_paddle = _load_slice_paddle(monkeypatch, tmp_path)
+
+    sheet = np.full((40, 80, 3), 255, dtype=np.uint8)
+    sheet[0, 40] = 40
+    path = tmp_path / 'a.tif'
+    tifffile.imwrite(str(path), sheet)
+    windows = [(0, 0, 40, 40), (40, 0, 80, 40)]
+    cache_path = str(tmp_path / 'cache.sqlite')
+
+    class InlinePool:
+        def submit(self, fn, *args):
+            future = Future()
+            future.set_result(fn(*args))
+            return future
+
+    ocr = _FakeOcr(fail_x=None)
+    monkeypatch.setattr(slice_paddle, 'create_ocr', lambda **kwargs: ocr)
+    with OcrCache(cache_path) as cache:
+        slice_paddle._init_worker(1, 1, cache_path)
+        for _ in range(2):
+            results = list(slice_paddle.iter_window_results(
+                windows, str(path), reader=None, pool=InlinePool(), max_pending=2, cache=cache))
+            assert [r[2][1] for r in results] == [['окно255'], ['окно40']]
+        assert ocr.calls == [255, 40]
+        assert (cache.hits, cache.misses) == (2, 2)
+    slice_paddle._worker_cache.close()
+    slice_paddle._worker_reader.close()
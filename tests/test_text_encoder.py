@@ -0,0 +1,40 @@
+# тесты для векторного кодирования текстов mapocr_toolkit/utils/rnn_preprocessor.py
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+
+def _encode_slow(texts, char_to_int, max_len):
+    pad = char_to_int['\0']
+    out = np.full((len(texts), max_len), pad, dtype=np.int32)
+    for row, text in enumerate(texts):
+        for col, char in enumerate(text[:max_len]):
+            out[row, col] = char_to_int.get(char, pad)
+    return out
+
+
+def test_matches_per_char_loop():
+    """обрезка, паддинг, неизвестные символы (в т.ч. вне таблицы кодов) и пустые строки"""
+    from mapocr_toolkit.utils.rnn_preprocessor import create_char_vocabulary, texts_to_padded_sequences
+    char_to_int, _, _ = create_char_vocabulary(['Ока', 'р. Волга', 'Tver 2'])
+    texts = ['Ока', '', 'р. Волга-Волга', 'Tver 2', 'ё?', 'Ок😀а', 'x\0y']
+
+    got = texts_to_padded_sequences(texts, char_to_int, 8)
+    assert got.dtype == np.int32
+    assert np.array_equal(got, _encode_slow(texts, char_to_int, 8))
+
+
+def test_encode_for_rnn_modes():
+    """index - int32 индексы, старая info без input_mode - one-hot по тем же индексам"""
+    from mapocr_toolkit.utils.rnn_preprocessor import create_char_vocabulary, encode_for_rnn
+    char_to_int, _, num_chars = create_char_vocabulary(['Ока', 'Дон'])
+    info = {'char_to_int_map': char_to_int, 'max_seq_len': 5, 'num_chars_vocab': num_chars}
+
+    index = encode_for_rnn([' Дон ', 'Ока'], dict(info, input_mode='index'))
+    one_hot = encode_for_rnn([' Дон ', 'Ока'], info)
+
+    assert index.shape == (2, 5) and one_hot.shape == (2, 5, num_chars)
+    assert np.array_equal(one_hot.argmax(axis=-1), index)
+    assert index[0, 3] == 0  # strip() убрал пробелы, дальше паддинг
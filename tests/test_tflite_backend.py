@@ -0,0 +1,56 @@
+# тесты для TFLiteClassifier mapocr_toolkit/utils/tflite_backend.py (интерпретатор подменяется)
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+
+class _FakeInterpreter:
+    """uint8 вход (N, 4) со scale 0.5, выход uint8 - сумма строки, scale 0.25 / zero_point 10"""
+
+    def __init__(self, model_path=None, num_threads=None):
+        self.shape = np.array([1, 4])
+        self.calls = []
+
+    def allocate_tensors(self):
+        pass
+
+    def get_input_details(self):
+        return [{'index': 0, 'shape': self.shape, 'shape_signature': np.array([-1, 4]),
+                 'dtype': np.uint8, 'quantization': (0.5, 0)}]
+
+    def get_output_details(self):
+        return [{'index': 1, 'shape': np.array([1, 1]), 'dtype': np.uint8, 'quantization': (0.25, 10)}]
+
+    def resize_tensor_input(self, index, shape):
+        self.shape = np.array(shape)
+
+    def set_tensor(self, index, value):
+        assert value.dtype == np.uint8 and tuple(value.shape) == tuple(self.shape)
+        self.x = value
+
+    def invoke(self):
+        self.calls.append(len(self.x))
+
+    def get_tensor(self, index):
+        return (self.x.astype(np.int64).sum(axis=1, keepdims=True) + 10).astype(np.uint8)
+
+
+def test_quantized_io_padding_and_batches(monkeypatch):
+    from mapocr_toolkit.utils import tflite_backend
+    monkeypatch.setattr(tflite_backend, '_interpreter_class', lambda: _FakeInterpreter)
+    model = tflite_backend.TFLiteClassifier('model_int8.tflite')
+
+    # вход квантуется по scale 0.5, короткие строки дополняются нулями до 4
+    x = np.array([[1.0, 2.0], [0.5, 0.0], [3.0, 3.0]], dtype=np.float32)
+    y = model.predict(x, batch_size=2)
+
+    assert model.interpreter.calls == [2, 1]
+    assert y.dtype == np.float32
+    assert np.allclose(y[:, 0], (x.sum(axis=1) / 0.5) * 0.25)
+
+
+def test_quantized_path():
+    from mapocr_toolkit.utils.tflite_backend import quantized_path
+    assert quantized_path('models/demo/cnn/cnn_model.keras').name == 'cnn_model_int8.tflite'
@@ -0,0 +1,93 @@
+# тесты для потоковой дедупликации mapocr_toolkit/utils/tile_dedup.py
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+def _map_records(windows, seed=0):
+    """надписи на листе: каждая попадает во все окна, которые её целиком содержат"""
+    import random
+    rnd = random.Random(seed)
+    per_window = {i: [] for i in range(len(windows))}
+    # сетка надписей с шагом 250 px, чтобы разные надписи не пересекались
+    for gy in range(0, 4800, 250):
+        for gx in range(0, 4800, 250):
+            x, y = gx + rnd.randint(0, 50), gy + rnd.randint(0, 50)
+            w, h = rnd.randint(40, 180), rnd.randint(15, 60)
+            for i, (x0, y0, x1, y1) in enumerate(windows):
+                if x0 <= x and x + w <= x1 and y0 <= y and y + h <= y1:
+                    dx, dy = rnd.randint(-3, 3), rnd.randint(-3, 3)
+                    per_window[i].append({
+                        'filename': f'{i}_{gx}_{gy}.jpg',
+                        'global_box': [[x + dx, y + dy], [x + w + dx, y + h + dy]],
+                        'confidence': round(rnd.uniform(0.6, 1.0), 4),
+                    })
+    return per_window
+
+
+def test_streaming_matches_global_nms():
+    """потоковый режим оставляет тот же набор боксов, что и один глобальный NMS"""
+    from mapocr_toolkit.utils.nms import nms_filter
+    from mapocr_toolkit.utils.sliding_window import compute_windows
+    from mapocr_toolkit.utils.tile_dedup import StreamingDeduplicator
+
+    windows = compute_windows(5000, 5000, slice_size=2000, overlap=400)
+    per_window = _map_records(windows)
+    all_records = [r for i in range(len(windows)) for r in per_window[i]]
+
+    dedup = StreamingDeduplicator(windows, iou_threshold=0.5)
+    streamed = []
+    for i in range(len(windows)):
+        streamed += dedup.add_window(i, per_window[i])
+    streamed += dedup.finish()
+
+    expected = nms_filter(all_records, iou_threshold=0.5)
+    assert sorted(r['filename'] for r in streamed) == sorted(r['filename'] for r in expected)
+    assert dedup.removed == len(all_records) - len(expected)
+
+
+def test_interior_boxes_flushed_immediately():
+    """бокс вне полос перекрытия отдаётся сразу после своего окна"""
+    from mapocr_toolkit.utils.sliding_window import compute_windows
+    from mapocr_toolkit.utils.tile_dedup import StreamingDeduplicator
+
+    windows = compute_windows(3600, 3600, slice_size=2000, overlap=400)
+    dedup = StreamingDeduplicator(windows)
+    interior = {'global_box': [[100, 100], [200, 150]], 'confidence': 0.9}
+    band = {'global_box': [[1700, 100], [1800, 150]], 'confidence': 0.9}
+
+    flushed = dedup.add_window(0, [interior, band])
+    assert flushed == [interior]
+    assert dedup.pending_count == 1
+
+
+def test_empty_windows_still_finalize_pending():
+    """пустые окна тоже закрываются и освобождают отложенные боксы"""
+    from mapocr_toolkit.utils.sliding_window import compute_windows
+    from mapocr_toolkit.utils.tile_dedup import StreamingDeduplicator
+
+    windows = compute_windows(2000, 3600, slice_size=2000, overlap=400)
+    dedup = StreamingDeduplicator(windows)
+    band = {'global_box': [[1700, 100], [1800, 150]], 'confidence': 0.9}
+    assert dedup.add_window(0, [band]) == []
+    assert dedup.add_window(1, []) == [band]
+    assert dedup.finish() == []
+
+
+def test_suppression_chain_across_windows():
+    """бокс, подавленный в одном окне, выживает, если его подавителя убрало следующее окно"""
+    from mapocr_toolkit.utils.nms import nms_filter
+    from mapocr_toolkit.utils.tile_dedup import StreamingDeduplicator
+
+    windows = [(0, 0, 100, 100), (50, 0, 150, 100), (100, 0, 200, 100)]
+    x = {'filename': 'X', 'global_box': [[62, 10], [110, 50]], 'confidence': 0.9}
+    y = {'filename': 'Y', 'global_box': [[55, 10], [100, 50]], 'confidence': 0.8}
+    w = {'filename': 'W', 'global_box': [[70, 10], [120, 50]], 'confidence': 0.95}
+
+    dedup = StreamingDeduplicator(windows, iou_threshold=0.5)
+    streamed = dedup.add_window(0, []) + dedup.add_window(1, [x, y]) + dedup.add_window(2, [w])
+    streamed += dedup.finish()
+
+    expected = nms_filter([x, y, w], iou_threshold=0.5)
+    assert sorted(r['filename'] for r in streamed) == sorted(r['filename'] for r in expected) == ['W', 'Y']
+    assert dedup.removed == 1
@@ -0,0 +1,100 @@
+# тесты для оконного чтения листов mapocr_toolkit/image_processing/tile_reader.py
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+from PIL import Image
+
+
+def _sheet(h=70, w=90, channels=3):
+    rng = np.random.default_rng(0)
+    shape = (h, w) if channels == 1 else (h, w, channels)
+    return rng.integers(0, 256, shape, dtype=np.uint8)
+
+
+def test_tifffile_memmap_and_edge_clipping(tmp_path):
+    """несжатый TIF читается через memmap, окно за краем листа обрезается"""
+    import tifffile
+    from mapocr_toolkit.image_processing.tile_reader import open_tile_reader
+    sheet = _sheet()
+    path = tmp_path / 'sheet.tif'
+    tifffile.imwrite(str(path), sheet)
+
+    with open_tile_reader(path, cache_dir=str(tmp_path / 'cache')) as reader:
+        assert reader.backend == 'tifffile.memmap'
+        assert reader.shape == (70, 90, 3)
+        assert np.array_equal(reader.read(10, 20, 40, 35), sheet[20:35, 10:40])
+
+        edge = reader.read(-5, 60, 200, 100)
+        assert edge.shape == (10, 90, 3) and edge.flags['C_CONTIGUOUS']
+        assert np.array_equal(edge, sheet[60:70])
+    assert not (tmp_path / 'cache').exists()
+
+
+def test_gray_and_rgba_become_rgb(tmp_path):
+    import tifffile
+    from mapocr_toolkit.image_processing.tile_reader import open_tile_reader
+
+    gray = _sheet(channels=1)
+    tifffile.imwrite(str(tmp_path / 'gray.tif'), gray)
+    with open_tile_reader(tmp_path / 'gray.tif') as reader:
+        assert np.array_equal(reader.read(0, 0, 90, 70), np.repeat(gray[..., None], 3, axis=2))
+
+    rgba = _sheet(channels=4)
+    tifffile.imwrite(str(tmp_path / 'rgba.tif'), rgba, photometric='rgb', extrasamples=['unassalpha'])
+    with open_tile_reader(tmp_path / 'rgba.tif') as reader:
+        assert reader.read(0, 0, 90, 70).shape == (70, 90, 3)
+        assert np.array_equal(reader.read(5, 5, 25, 15), rgba[5:15, 5:25, :3])
+
+
+def test_raw_cache_fallback_replaces_stale_cache(tmp_path):
+    """палитровый TIF декодирует PIL в .npy-кэш; кэш прежней версии листа удаляется"""
+    from mapocr_toolkit.image_processing.tile_reader import open_tile_reader
+    cache_dir = tmp_path / 'cache'
+    path = tmp_path / 'palette.tif'
+    Image.fromarray(_sheet()).quantize(16).save(path)
+    expected = np.asarray(Image.open(path).convert('RGB'))
+
+    with open_tile_reader(path, cache_dir=str(cache_dir)) as reader:
+        assert reader.backend == 'raw-cache'
+        assert np.array_equal(reader.read(0, 0, 90, 70), expected)
+    first = sorted(os.listdir(cache_dir))
+    assert len(first) == 1
+
+    Image.fromarray(_sheet()[::-1].copy()).quantize(16).save(path)
+    os.utime(path, ns=(1, 1))
+    with open_tile_reader(path, cache_dir=str(cache_dir)) as reader:
+        assert np.array_equal(reader.read(0, 0, 90, 70), np.asarray(Image.open(path).convert('RGB')))
+    second = sorted(os.listdir(cache_dir))
+    assert len(second) == 1 and second != first
+
+
+def test_read_scaled_has_no_band_seams(monkeypatch, tmp_path):
+    """уменьшение полосами совпадает с resize целого листа"""
+    import tifffile
+    from mapocr_toolkit.image_processing import tile_reader
+    sheet = _sheet(h=301, w=123)
+    tifffile.imwrite(str(tmp_path / 'sheet.tif'), sheet)
+    monkeypatch.setattr(tile_reader, 'BAND_ROWS', 40)
+
+    with tile_reader.open_tile_reader(tmp_path / 'sheet.tif') as reader:
+        for scale in (0.37, 0.5):
+            scaled = reader.read_scaled(scale)
+            expected = np.asarray(Image.fromarray(sheet).resize(scaled.shape[1::-1], Image.LANCZOS))
+            assert scaled.shape == expected.shape
+            assert np.abs(scaled.astype(int) - expected).max() <= 1
+
+
+def test_same_name_sheets_keep_separate_caches(tmp_path):
+    """одноимённые листы из разных папок не считают кэш друг друга устаревшим"""
+    from mapocr_toolkit.image_processing.tile_reader import open_tile_reader
+    cache_dir = str(tmp_path / 'cache')
+    for folder in ('a', 'b'):
+        (tmp_path / folder).mkdir()
+        Image.fromarray(_sheet()).quantize(16).save(tmp_path / folder / 'sheet_01.tif')
+
+    for folder in ('a', 'b', 'a'):
+        with open_tile_reader(tmp_path / folder / 'sheet_01.tif', cache_dir=cache_dir) as reader:
+            assert reader.backend == 'raw-cache'
+    assert len(os.listdir(cache_dir)) == 2